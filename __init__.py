@@ -1,6 +1,6 @@
 from .app import RunApp
 from .proxy import _get_proxy, _get_working_proxies
-from .config import _load_settings
+from .config import _load_settings, get_settings
 
 
-__all__ = ["RunApp", "_get_proxy", "_get_working_proxies", "_load_settings"]
\ No newline at end of file
+__all__ = ["RunApp", "_get_proxy", "_get_working_proxies", "_load_settings", "get_settings"]
\ No newline at end of file
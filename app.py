@@ -1,16 +1,33 @@
-from typing import List, Dict
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Tuple
+import argparse
+import importlib
 import os
 import logging
+import threading
 from datetime import datetime
 import asyncio
-import pandas as pd
 from dotenv import load_dotenv
 from logs import logger
 from scraper import ResponseScraper, DataScraper
 from proxy import test_proxies
-from config import _load_settings
+from proxy_pool import ProxyPool
+from config import ProxySettings, ScrapingSettings, get_settings
+from metrics import REGISTRY, Sample
 from database.models import DatabaseManagerSettings, MotionsElements
-from scraper.data_scraper import CheckNewItems
+from database.crawl_state import CrawlStateStore
+from database.proxy_cache import ProxyHealthCache
+from database.response_cache import ResponseCache
+from scraper.crawl_plan import CrawlTask, load_crawl_plan
+from scraper.incremental import IncrementalCrawl
+from scraper.parse_pool import ParsePool
+from scraper.pipeline import ScrapePipeline
+from scraper.scheduler import CrawlScheduler
+from scraper.sessions import SessionManager
+
+# The aiohttp server is imported only when the metrics endpoint is served
+if TYPE_CHECKING:
+    from aiohttp import web
 
 
 # Load environment variables
@@ -19,20 +36,35 @@ load_dotenv()
 # Load logger settings from .env file
 LOG_DIR_MAIN = os.getenv('LOG_DIR_MAIN')
 
+# Load the paths of the Prometheus text file and the JSON run summary written after every run
+METRICS_FILE = os.getenv('METRICS_FILE')
+RUN_SUMMARY_FILE = os.getenv('RUN_SUMMARY_FILE')
+
 # Create logger object
 logger = logger.get_logger(log_file=LOG_DIR_MAIN, log_level=logging.INFO)
 
+# Heavy modules of the data path, imported on first use and preloaded in the background at the start of a run
+PRELOADED_MODULES: Tuple[str, ...] = ("pandas",)
+
 
 class RunApp:
-    def __init__(self) -> None:
+    def __init__(self, crawl_plan: List[CrawlTask] = None) -> None:
         """
         Initializes a new instance of the class.
 
+        Args:
+            crawl_plan (List[CrawlTask], optional): The categories and page ranges crawled by `crawl`.
+                Loaded from the `crawl_plan` scraping settings if None.
+
         Returns:
             None
 
         Initializes the instance variables `start_page`, `end_page`, `category_id`, `response_scraper`,
-        `num_test_proxies`, `working_proxies`, and `use_proxy` with the given values.
+        `num_test_proxies`, `working_proxies`, `use_proxy`, `min_working_proxies`, `crawl_plan`, `proxy_cache`,
+        `sessions`, and `metrics_endpoint` with the given values.
+
+        The `sessions` attribute is the session manager shared by all runs of the instance, so its pooled
+        connections are reused across categories and runs until `close` is awaited.
         """
         self.start_page: int = 3
         self.end_page: int = 4
@@ -40,7 +72,27 @@ class RunApp:
         self.response_scraper: ResponseScraper = ResponseScraper(self.start_page, self.end_page, self.category_id)
         self.num_test_proxies: int = 50
         self.working_proxies: List = []
-        self.use_proxy: bool = _load_settings()["proxy_settings"]["use_proxy"]
+        proxy_settings: ProxySettings = get_settings().proxy_settings
+        self.use_proxy: bool = proxy_settings.use_proxy
+        self.min_working_proxies: int = proxy_settings.min_working_proxies
+        self.crawl_plan: List[CrawlTask] = crawl_plan
+        self.proxy_cache: ProxyHealthCache = None
+        self.sessions: SessionManager = ResponseScraper._create_session()
+        self.metrics_endpoint: web.AppRunner = None
+
+    @staticmethod
+    def _preload_modules() -> None:
+        """
+        Import the heavy modules of the data path in a background thread.
+
+        The modules are imported lazily, so a run that stops early never loads them. A run that goes on
+        preloads them while the database is prepared and the proxies are tested, instead of on the first page.
+
+        Returns:
+            None
+        """
+        for module in PRELOADED_MODULES:
+            threading.Thread(target=importlib.import_module, args=(module,), name=f"preload-{module}").start()
 
     async def startup(self) -> None:
         """
@@ -50,14 +102,12 @@ class RunApp:
         
         1. Measures the total time of the scraping process.
         2. Tests proxy servers before scraping, if the `use_proxy` flag is set to True.
-        3. Fetches all pages with available proxies or without proxies.
-        4. Raises a `RuntimeError` if no JSON data is found.
-        5. Retrieves the URLs from the JSON response data.
+        3. Fetches the pages with available proxies or without proxies.
+        4. Streams every page through the scrape pipeline as soon as it arrives: the page is parsed, and
+           its rows are compared with the database and saved to the database in micro-batches. Every
+           database call runs in the writer thread of the database, which group commits the inserts.
+        5. Raises a `RuntimeError` if no JSON data is found.
         6. Raises a `RuntimeError` if no URLs are found.
-        7. Measures the time taken to scrape the pages.
-        8. Checks for new items and compares them with the database.
-        9. Prints the DataFrame or raises a `RuntimeError` if no DataFrame is found.
-        10. Saves the DataFrame to a CSV file or database.
         
         Parameters:
             self (RunApp): The instance of the RunApp class.
@@ -66,81 +116,270 @@ class RunApp:
             None
         
         Raises:
-            RuntimeError: If no working proxies are found, if no JSON data is found, if no URLs are found, or if no DataFrame is found.
+            RuntimeError: If no working proxies are found, if no JSON data is found, or if no URLs are found.
             Exception: If an unhandled exception occurs during the scraping process.
         """
         try:
             # Total time of measurement of scraping
             total_start_time: datetime = datetime.now()
+            self._preload_modules()
+            await self._start_metrics_endpoint()
 
-            # Test proxy servers before scraping
-            if self.use_proxy == True:
-                print(f'\t*** Start testing proxies... ***')
-                start_time_test_proxy: datetime = datetime.now()
-                self.working_proxies: List = await test_proxies(self.num_test_proxies)
-                end_time_test_proxy: datetime = datetime.now()
-                logger.info(f"*** Total time to test proxies: {end_time_test_proxy - start_time_test_proxy} ***\n")
-
-                if not self.working_proxies:
-                    raise RuntimeError("No working proxies found.")
-
-            # Fetch all pages with available proxies or without proxies
-            print(f'\t*** Start fetching category ID: {self.category_id}, pages from {self.start_page} to {self.end_page}... ***')
-            start_time_fetch: datetime = datetime.now()
-            json_data: List = await self.response_scraper._fetch_all_pages(self.working_proxies)
-            end_time_fetch: datetime = datetime.now()
-            logger.info(f"*** Total time to fetch: {end_time_fetch - start_time_fetch} ***\n")
-
-            # If no JSON data is found, raise an error
-            if not json_data:
-                raise RuntimeError("No JSON data found.")
+            # Add missing indexes to an existing database, in the writer thread of the database
+            db_manager: DatabaseManagerSettings = DatabaseManagerSettings()
+            await db_manager.run(db_manager.create_indexes, MotionsElements)
 
-            # Get the URLs from the JSON response data
-            print(f'\t*** Start scraping category ID: {self.category_id}, from page {self.start_page} to {self.end_page}... ***')
-            start_time_scrape: datetime = datetime.now()
-            list_urls: Dict = DataScraper()._get_url(json_data)
-            end_time_scrape: datetime = datetime.now()
-            logger.info(f"*** Total time to scrape: {end_time_scrape - start_time_scrape} ***\n")
+            # Test proxy servers before scraping
+            await self._test_proxies(db_manager)
+            self.response_scraper.proxy_pool = ResponseScraper._create_proxy_pool(self.working_proxies)
+            self.response_scraper.parse_pool = ResponseScraper._create_parse_pool()
+            self.response_scraper.response_cache = ResponseScraper._create_response_cache()
 
-            # If no URLs are found, raise an error
-            if not list_urls['mp4_url'] and not list_urls['webm_url']:  # len(list_urls['mp4_url']) and len(list_urls['webm_url']) == 0:   # or not list_urls['mp4_url'] or not list_urls['webm_url']:
-                raise RuntimeError("No parse data found.")
+            # Fetch, parse, check, and save the pages in one streaming pipeline
+            print(f'\t*** Start scraping category ID: {self.category_id}, pages from {self.start_page} to {self.end_page}... ***')
+            pipeline: ScrapePipeline = await db_manager.run(self._create_pipeline, db_manager)
+            pipeline.start()
+            try:
+                pages: int = await self.response_scraper._stream_pages(self.sessions, pipeline.on_page)
+            finally:
+                inserted: int = await pipeline.join()
+                if self.response_scraper.parse_pool is not None:
+                    self.response_scraper.parse_pool.close()
+                if self.response_scraper.response_cache is not None:
+                    await self.response_scraper.response_cache.flush_async()
+            await db_manager.run(db_manager.close_connection)
+            await self._stop_proxy_revalidation()
+            self._log_pool_stats()
 
             # End of measurement of scraping
             total_end_time: datetime = datetime.now()
-            logger.info(f"*** Total time to fetch and scrape pages: {total_end_time - total_start_time} ***\n")
-
-            # Check new items
-            print("\t*** Start checking new items... ***")
-            start_time_check: datetime = datetime.now()
-            df_to_insert = CheckNewItems().compare_details_with_db(list_urls)
-            end_time_check: datetime = datetime.now()
-            logger.info(f"*** Total time to check new items: {end_time_check - start_time_check} ***\n")
-
-            # Print the DataFrame
-            print("\t*** Start creating DataFrame... ***")
-            df: pd.DataFrame = pd.DataFrame(df_to_insert)
-
-            # Print the DataFrame or raise an error if no DataFrame is found
-            if not df.empty:
-                print(df)
-            else:
-                raise RuntimeError("*** No DataFrame found. ***")
-
-            # Save DataFrame to CSV file
-            # df.to_csv(f'async-web-scraper-motionelements/dataset/scraped_data_{self.start_page}-{self.end_page}.csv', index=False, encoding='utf-8-sig')
-            # print("\t*** Data saved to CSV file... ***")
-
-            # Save DataFrame to database
-            DatabaseManagerSettings().insert_data(df, MotionsElements)
-            DatabaseManagerSettings().close_connection()
-            print("\t*** Data saved to database... ***")
+            logger.info(f"*** Total time to fetch, scrape, and save pages: {total_end_time - total_start_time} ***\n")
+
+            # If no JSON data or no URLs are found, raise an error
+            if not pages:
+                raise RuntimeError("No JSON data found.")
+            if not pipeline.parsed_rows:
+                raise RuntimeError("No parse data found.")
+            print(f"\t*** {inserted} new items of {pipeline.parsed_rows} saved to database... ***")
 
         except Exception as e:
             # Handle unhandled exceptions
             logger.error("Error in run_main:", exc_info=True)
+        finally:
+            self._export_metrics()
+
+    @staticmethod
+    def _create_pipeline(db_manager: DatabaseManagerSettings) -> ScrapePipeline:
+        """
+        Create a scrape pipeline into the database configured with the scraping settings.
+
+        Args:
+            db_manager (DatabaseManagerSettings): The manager of the database the rows are inserted into.
+
+        Returns:
+            ScrapePipeline: The pipeline, not started yet.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        return ScrapePipeline(
+            db_manager, MotionsElements,
+            batch_size=scraping_settings.pipeline_batch_size,
+            queue_size=scraping_settings.pipeline_queue_size,
+        )
+
+    async def _test_proxies(self, db_manager: DatabaseManagerSettings) -> None:
+        """
+        Test proxy servers before scraping, if the `use_proxy` flag is set to True.
+
+        Recently validated proxies are reused from the proxy health cache, the stale ones are then
+        re-tested in the background until `_stop_proxy_revalidation` is awaited.
+
+        Args:
+            db_manager (DatabaseManagerSettings): The manager of the database holding the proxy health cache.
+
+        Raises:
+            RuntimeError: If no working proxies are found.
+        """
+        if self.use_proxy == True:
+            print(f'\t*** Start testing proxies... ***')
+            start_time_test_proxy: datetime = datetime.now()
+            self.proxy_cache = await db_manager.run(ProxyHealthCache, db_manager, get_settings().proxy_settings.health_cache_ttl)
+            self.working_proxies: List = await test_proxies(self.num_test_proxies, self.min_working_proxies, self.proxy_cache)
+            end_time_test_proxy: datetime = datetime.now()
+            logger.info(f"*** Total time to test proxies: {end_time_test_proxy - start_time_test_proxy} ***\n")
+
+            if not self.working_proxies:
+                raise RuntimeError("No working proxies found.")
+
+    async def _stop_proxy_revalidation(self) -> None:
+        """
+        Stop the background re-test of stale proxies and save its results.
+        """
+        if self.proxy_cache is not None:
+            await self.proxy_cache.stop_revalidation()
+
+    def _log_pool_stats(self) -> None:
+        """
+        Log the connection pool statistics of every proxy's session, to confirm that connections are reused.
+        """
+        for row in self.sessions.stats():
+            logger.info(
+                f"Connection pool of {row['proxy'] or 'direct requests'}: {row['requests']} requests, {row['open']} open and "
+                f"{row['idle']} idle connections, reuse ratio {row['reuse_ratio']:.0%}, connecting took {row['connect_share']:.1%} of the request time"
+            )
+
+    async def _start_metrics_endpoint(self) -> None:
+        """
+        Serve the metrics on `/metrics` of the `metrics_host` and `metrics_port` scraping settings, unless the port is null.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        if self.metrics_endpoint is None and scraping_settings.metrics_port is not None:
+            self.metrics_endpoint = await REGISTRY.serve(scraping_settings.metrics_host, scraping_settings.metrics_port)
+            logger.info(f"Metrics served on http://{scraping_settings.metrics_host}:{scraping_settings.metrics_port}/metrics")
+
+    def _export_metrics(self) -> None:
+        """
+        Write the metrics to the Prometheus text file `METRICS_FILE` and the JSON run summary `RUN_SUMMARY_FILE`, if they are set.
+        """
+        try:
+            REGISTRY.write(METRICS_FILE, RUN_SUMMARY_FILE)
+        except OSError:
+            logger.error("Metrics could not be written:", exc_info=True)
+
+    async def close(self) -> None:
+        """
+        Close the pooled sessions and their connections, and stop the metrics endpoint.
+        """
+        await self.sessions.close()
+        if self.metrics_endpoint is not None:
+            await self.metrics_endpoint.cleanup()
+            self.metrics_endpoint = None
+
+    async def crawl(self, incremental: bool = False) -> int:
+        """
+        Asynchronously crawls every category of the crawl plan in one event loop.
+
+        All categories share one session manager, one proxy pool, one crawl scheduler, and one scrape
+        pipeline, so startup, proxy testing, and database connection costs are paid once. Each page is
+        parsed as soon as it arrives, and its rows are compared with the database and inserted in micro-batches.
+
+        An incremental crawl fetches every category in the `incremental_sort` order, newest first, and
+        stops at the page holding the category's high-water mark or after `incremental_known_pages`
+        already-known pages in a row, see IncrementalCrawl. After a complete crawl the newest URL of the
+        category is stored as its high-water mark, so the next scheduled run only fetches the delta.
+
+        Args:
+            incremental (bool): Whether to crawl only the items added since the last complete crawl.
+
+        Returns:
+            int: The number of inserted rows.
+
+        Raises:
+            Exception: If an unhandled exception occurs during the crawl, it is logged.
+        """
+        inserted: int = 0
+        collectors: List = []
+        try:
+            total_start_time: datetime = datetime.now()
+            crawl_plan: List[CrawlTask] = self.crawl_plan or load_crawl_plan()
+            self._preload_modules()
+            await self._start_metrics_endpoint()
+
+            # Prepare the database once for the whole crawl, in the writer thread of the database
+            db_manager: DatabaseManagerSettings = DatabaseManagerSettings()
+            await db_manager.run(db_manager.create_indexes, MotionsElements)
+
+            # Test proxy servers once for all categories
+            await self._test_proxies(db_manager)
+
+            # One scheduler, one proxy pool, one parse pool, and one response cache shared by all categories
+            scheduler: CrawlScheduler = ResponseScraper._create_scheduler()
+            proxy_pool: ProxyPool = ResponseScraper._create_proxy_pool(self.working_proxies)
+            parse_pool: ParsePool = ResponseScraper._create_parse_pool()
+            response_cache: ResponseCache = ResponseScraper._create_response_cache()
+
+            # Export the adaptive concurrency limits of the scheduler while it is in use
+            def backoff_samples() -> Iterator[Sample]:
+                for host, limit in scheduler.backoff.limits.items():
+                    yield "scraper_host_concurrency_limit", {"host": host}, limit.limit
+
+            # High-water marks of the categories, only needed by an incremental crawl
+            scraping_settings: ScrapingSettings = get_settings().scraping_settings
+            crawl_state: CrawlStateStore = await db_manager.run(CrawlStateStore, db_manager) if incremental else None
+
+            async def crawl_category(task: CrawlTask) -> None:
+                if not incremental:
+                    response_scraper: ResponseScraper = ResponseScraper(task.start_page, task.end_page, task.category_id, scheduler, proxy_pool, parse_pool, response_cache)
+                    pages: int = await response_scraper._stream_pages(self.sessions, pipeline.on_page)
+                    logger.info(f"*** Category ID: {task.category_id}, pages with data: {pages} ***")
+                    return
+
+                # Fetch the newest pages until the first already-known page
+                sort: str = scraping_settings.incremental_sort
+                high_water_url: Optional[str] = await db_manager.run(crawl_state.high_water_mark, task.category_id, sort)
+                new_pages: IncrementalCrawl = await db_manager.run(lambda: IncrementalCrawl(
+                    task.category_id, task.start_page, db_manager,
+                    high_water_url=high_water_url,
+                    sort=sort,
+                    known_pages_to_stop=scraping_settings.incremental_known_pages,
+                ))
+                response_scraper = ResponseScraper(task.start_page, task.end_page, task.category_id, scheduler, proxy_pool, parse_pool, response_cache, sort)
+                pages = await response_scraper._stream_new_pages(self.sessions, pipeline.on_page, new_pages)
+                logger.info(f"*** Category ID: {task.category_id}, new pages with data: {pages}, stopped at page: {new_pages.last_page} ***")
+
+                # Only a complete crawl moves the high-water mark, otherwise the next run would skip the missing pages
+                if new_pages.complete and new_pages.newest_url is not None:
+                    await db_manager.run(crawl_state.set_high_water_mark, task.category_id, sort, new_pages.newest_url)
+                elif not new_pages.complete:
+                    logger.warning(f"Incremental crawl of category {task.category_id} is incomplete, its high-water mark is kept")
+
+            # Every page of every category is parsed, compared, and inserted by one streaming pipeline
+            print(f'\t*** Start crawling {len(crawl_plan)} categories... ***')
+            pipeline: ScrapePipeline = await db_manager.run(self._create_pipeline, db_manager)
+            pipeline.start()
+            REGISTRY.add_collector(backoff_samples)
+            collectors.append(backoff_samples)
+            categories: List[asyncio.Task] = [asyncio.create_task(crawl_category(task)) for task in crawl_plan]
+            try:
+                await asyncio.gather(*categories)
+            finally:
+                # A failed category stops the others first, so none of them feeds the pipeline after it is joined
+                for category in categories:
+                    category.cancel()
+                await asyncio.gather(*categories, return_exceptions=True)
+                inserted = await pipeline.join()
+                if parse_pool is not None:
+                    parse_pool.close()
+                if response_cache is not None:
+                    await response_cache.flush_async()
+
+            await db_manager.run(db_manager.close_connection)
+            await self._stop_proxy_revalidation()
+            self._log_pool_stats()
+            logger.info(f"*** Total time to crawl {len(crawl_plan)} categories: {datetime.now() - total_start_time}, inserted rows: {inserted} ***\n")
+            print("\t*** Data saved to database... ***")
+
+        except Exception as e:
+            # Handle unhandled exceptions
+            logger.error("Error in crawl:", exc_info=True)
+        finally:
+            self._export_metrics()
+            for collector in collectors:
+                REGISTRY.remove_collector(collector)
+        return inserted
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async web scraper for MotionElements")
+    parser.add_argument("--crawl-plan", action="store_true", help="Crawl all categories of the crawl_plan scraping settings")
+    parser.add_argument("--incremental", action="store_true", help="Crawl the categories of the crawl plan newest first, only until the first already-known page")
+    args = parser.parse_args()
+
+    async def main() -> None:
+        # Run the crawl or the startup coroutine, then close the pooled connections
+        try:
+            await (app.crawl(args.incremental) if args.crawl_plan or args.incremental else app.startup())
+        finally:
+            await app.close()
+
     app = RunApp()  # Create an instance of the RunApp class
-    asyncio.run(app.startup())  # Run the startup coroutine
+    asyncio.run(main())
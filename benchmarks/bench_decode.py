@@ -0,0 +1,50 @@
+"""
+Benchmark of the JSON decoding of one search API page per decoder backend, reported per page.
+
+The "before" row is `json.loads`, which `aiohttp.ClientResponse.json` uses. The "+ extract" column adds the
+extraction of the page into a DataFrame, the work done for every page on the event loop.
+
+Usage:
+    python -m benchmarks.bench_decode --per-page 50 --pages 200
+"""
+import argparse
+import json
+from time import perf_counter
+from typing import Callable, List
+from benchmarks.bench_extract import _make_json_data
+from scraper.data_scraper import DataScraper
+from scraper.json_decoder import _DECODERS, _PREFERRED_BACKENDS
+
+
+def _time_per_page(bodies: List[bytes], function: Callable, repeat: int = 3) -> float:
+    """Return the fastest of `repeat` runs over all bodies, in microseconds per page."""
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = perf_counter()
+        for body in bodies:
+            function(body)
+        best = min(best, perf_counter() - start)
+    return best / len(bodies) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-page", type=int, default=50, help="Items per search API page")
+    parser.add_argument("--pages", type=int, default=200, help="Number of distinct pages decoded per run")
+    args = parser.parse_args()
+
+    bodies: List[bytes] = [json.dumps(page).encode() for page in _make_json_data(args.pages, args.per_page)]
+    data_scraper: DataScraper = DataScraper()
+    print(f"page size: {sum(map(len, bodies)) // len(bodies) / 1024:.1f} KiB")
+    print(f"{'backend':>16} {'decode [us/page]':>17} {'+ extract [us/page]':>20}")
+
+    baseline: float = _time_per_page(bodies, json.loads)
+    rows: list = [("json (before)", json.loads)] + [(name, _DECODERS[name]) for name in _PREFERRED_BACKENDS if name in _DECODERS and name != "json"]
+    for name, decode in rows:
+        decode_time: float = baseline if decode is json.loads else _time_per_page(bodies, decode)
+        total_time: float = _time_per_page(bodies, lambda body: data_scraper._get_frame([decode(body)]))
+        print(f"{name:>16} {decode_time:>17.1f} {total_time:>20.1f}   {baseline / decode_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
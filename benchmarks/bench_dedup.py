@@ -0,0 +1,75 @@
+"""
+Benchmark of the row by row and the set-based comparison of scraped URLs with the database.
+
+Usage:
+    python -m benchmarks.bench_dedup --sizes 1000 10000 100000 --known-ratio 0.95 --rowwise-max 100000
+"""
+import argparse
+import tempfile
+import os
+from time import perf_counter
+import pandas as pd
+from database.models import DatabaseManagerSettings, MotionsElements
+from scraper.data_scraper import CheckNewItems
+
+
+def _make_list_urls(count: int) -> dict:
+    """Build a synthetic `DataScraper._get_url` result with `count` items."""
+    return {
+        "mp4_url": [f"https://video.example.com/v/{i}_a-01.mp4" for i in range(count)],
+        "webm_url": [f"https://video.example.com/v/{i}_a-01.webm" for i in range(count)],
+        "category_id": [38] * count,
+        "category_name": ["Animated Backgrounds"] * count,
+        "price": [10 + i % 90 for i in range(count)],
+        "currency": ["EUR"] * count,
+        "name": [f"Clip {i}" for i in range(count)],
+    }
+
+
+def run(size: int, known_ratio: float, rowwise_max: int) -> dict:
+    """Run both comparison paths for one input size and return the timings in seconds."""
+    list_urls: dict = _make_list_urls(size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManagerSettings(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        db_manager.create_table(MotionsElements.__table__)
+
+        # Preload the database with the share of URLs that are already known
+        known: pd.DataFrame = pd.DataFrame(list_urls).iloc[:int(size * known_ratio)]
+        known.to_sql(MotionsElements.__tablename__, db_manager.engine, if_exists="append", index=False)
+
+        timings: dict = {"rows": size}
+
+        start: float = perf_counter()
+        bulk_result: pd.DataFrame = CheckNewItems(db_manager).compare_details_with_db(list_urls)
+        timings["bulk"] = perf_counter() - start
+
+        timings["row_by_row"] = None
+        if size <= rowwise_max:
+            start = perf_counter()
+            rowwise_result: pd.DataFrame = CheckNewItems(db_manager)._compare_details_row_by_row(list_urls)
+            timings["row_by_row"] = perf_counter() - start
+            pd.testing.assert_frame_equal(bulk_result, rowwise_result)
+
+        db_manager.close_connection()
+        db_manager.engine.dispose()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--known-ratio", type=float, default=0.95, help="Share of scraped URLs already in the database")
+    parser.add_argument("--rowwise-max", type=int, default=10_000, help="Skip the row by row path above this size, it grows quadratically")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'row_by_row [s]':>15} {'bulk [s]':>10} {'speedup':>9}")
+    for size in args.sizes:
+        timings: dict = run(size, args.known_ratio, args.rowwise_max)
+        rowwise: float = timings["row_by_row"]
+        speedup: str = f"{rowwise / timings['bulk']:.1f}x" if rowwise else "-"
+        rowwise_text: str = f"{rowwise:.3f}" if rowwise else "skipped"
+        print(f"{size:>8} {rowwise_text:>15} {timings['bulk']:>10.3f} {speedup:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+End-to-end benchmark of `RunApp.startup` against the offline search API stand-in, with stored baselines.
+
+Every scenario starts a fresh `SearchApiStandIn` (and forwarding proxies for the proxied scenario) in
+this process and runs the full startup pipeline in a fresh interpreter: proxy validation, fetching,
+decoding, the scrape pipeline, and the inserts into an empty SQLite database. The run uses a copy of
+the settings file pointing `base_url_video` at the stand-in, with the response cache and the metrics
+endpoint turned off and the per-host rate limit lifted, so the pipeline and not the politeness limit
+is measured. The scenario is reported in pages/s, items/s, p50/p99 request latency from the
+`scraper_request_seconds` histogram, and the peak RSS of the interpreter.
+
+With `--check` the results are compared with the baselines stored in `benchmarks/baselines/e2e.json`
+and the benchmark exits with status 1 if a throughput dropped, or a latency or the peak RSS grew, by
+more than `--tolerance`. Baselines depend on the machine, refresh them with `--update-baseline`.
+
+Usage:
+    python -m benchmarks.bench_e2e --scenarios clean throttled --runs 3 --check
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+from benchmarks.standin import ForwardingProxy, SearchApiStandIn
+
+ROOT_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE: str = os.path.join(ROOT_DIR, "benchmarks", "baselines", "e2e.json")
+
+# Category of the benchmark pages, the stand-in serves any category
+CATEGORY_ID: int = 38
+
+# Stand-in, proxy, and settings of every scenario
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "clean": {"pages": 100},
+    "latency": {"pages": 100, "latency": 0.05},
+    "large_pages": {"pages": 50, "payload_bytes": 2000},
+    "throttled": {"pages": 100, "latency": 0.01, "throttle_rate": 0.05, "error_rate": 0.02,
+                  "scraping_settings": {"retry_base_delay": 0.1, "retry_max_delay": 1.0}},
+    "proxied": {"pages": 50, "latency": 0.01, "proxies": 20},
+}
+
+# Metrics where a higher value is better, all others are better lower
+THROUGHPUT_METRICS: tuple = ("pages_per_s", "items_per_s")
+REPORTED_METRICS: tuple = ("pages_per_s", "items_per_s", "p50_ms", "p99_ms", "peak_rss_mb")
+
+
+def _write_settings(directory: str, scenario: Dict[str, Any], api_url: str, proxy_list: Optional[str]) -> str:
+    """
+    Write the settings file of a scenario run, a copy of the settings file named by SETTINGS_APK.
+
+    Args:
+        directory (str): The directory of the run.
+        scenario (Dict[str, Any]): The scenario.
+        api_url (str): The base URL of the search API stand-in.
+        proxy_list (str, optional): The CSV file of the stand-in proxies, None to crawl without proxies.
+
+    Returns:
+        str: The path of the settings file.
+    """
+    with open(os.getenv("SETTINGS_APK") or os.path.join(ROOT_DIR, "settings", "config_file.json"), encoding="utf-8") as file:
+        settings: Dict[str, Any] = json.load(file)
+
+    scraping_settings: Dict[str, Any] = settings["scraping_settings"]
+    scraping_settings.update(base_url_video=api_url, rate_per_host=10000.0, burst_per_host=10000,
+                             response_cache_path=None, metrics_port=None)
+    scraping_settings.update(scenario.get("scraping_settings", {}))
+
+    proxy_settings: Dict[str, Any] = settings["proxy_settings"]
+    proxy_settings.update(use_proxy=proxy_list is not None, checker_proxies=[f"{api_url}/ip"])
+    if proxy_list is not None:
+        proxy_settings.update(proxy_list5=proxy_list, min_working_proxies=scenario["proxies"])
+
+    path: str = os.path.join(directory, "config_file.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(settings, file)
+    return path
+
+
+def _run_scenario(name: str, loop: asyncio.AbstractEventLoop) -> Dict[str, float]:
+    """
+    Run `RunApp.startup` once against a fresh stand-in and return the measured metrics.
+
+    Args:
+        name (str): The name of the scenario.
+        loop (asyncio.AbstractEventLoop): The event loop of the stand-in servers, running in a background thread.
+
+    Returns:
+        Dict[str, float]: The metrics of the run.
+
+    Raises:
+        RuntimeError: If the run failed or scraped no items.
+    """
+    scenario: Dict[str, Any] = SCENARIOS[name]
+    api: SearchApiStandIn = SearchApiStandIn(
+        scenario["pages"], payload_bytes=scenario.get("payload_bytes", 0), latency=scenario.get("latency", 0.0),
+        throttle_rate=scenario.get("throttle_rate", 0.0), error_rate=scenario.get("error_rate", 0.0),
+    )
+    proxy: Optional[ForwardingProxy] = ForwardingProxy() if scenario.get("proxies") else None
+
+    def run_in_loop(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    run_in_loop(api.start())
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            proxy_list: Optional[str] = None
+            if proxy is not None:
+                run_in_loop(proxy.start(ports=[0] * scenario["proxies"]))
+                proxy_list = os.path.join(directory, "proxies.csv")
+                with open(proxy_list, "w", newline="") as file:
+                    csv.writer(file).writerows([url.removeprefix("http://")] for url in proxy.proxies)
+
+            result_file: str = os.path.join(directory, "result.json")
+            env: Dict[str, str] = dict(os.environ)
+            env.update(
+                SETTINGS_APK=_write_settings(directory, scenario, api.url, proxy_list),
+                DATABASE_URL_SQLITE=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                DATABASE_TABLE_SQLITE=env.get("DATABASE_TABLE_SQLITE", "motion_elements"),
+                LOG_FORMAT="text",
+            )
+            env.pop("METRICS_FILE", None)
+            env.pop("RUN_SUMMARY_FILE", None)
+            for log_dir in ("LOG_DIR_MAIN", "LOG_DIR_SCRAPING", "LOG_DIR_FETCHING", "LOG_DIR_PROXIES", "LOG_DIR_DATABASE"):
+                env[log_dir] = os.path.join(directory, f"{log_dir.lower()}.log")
+
+            process = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_e2e", "--child", result_file, "--pages", str(scenario["pages"]),
+                 "--proxies", str(scenario.get("proxies", 0))],
+                cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+            )
+            if process.returncode != 0 or not os.path.exists(result_file):
+                raise RuntimeError(f"Scenario {name} failed:\n{process.stderr}")
+            with open(result_file, encoding="utf-8") as file:
+                result: Dict[str, float] = json.load(file)
+            if not result["items"]:
+                with open(env["LOG_DIR_MAIN"], encoding="utf-8") as file:
+                    raise RuntimeError(f"Scenario {name} scraped no items:\n{file.read()}")
+            result.update(requests=api.requests, throttled=api.throttled, errors=api.errors)
+            return result
+    finally:
+        if proxy is not None:
+            run_in_loop(proxy.close())
+        run_in_loop(api.close())
+
+
+def _child(result_file: str, pages: int, proxies: int) -> None:
+    """
+    Run `RunApp.startup` for pages 1 to `pages` of one category and write the metrics of the run as JSON.
+
+    The environment of the process points the settings, the database, and the logs at the files of the run.
+
+    Args:
+        result_file (str): The path of the JSON result.
+        pages (int): The number of fetched pages.
+        proxies (int): The number of proxies tested before the crawl.
+
+    Returns:
+        None
+    """
+    import resource
+    from app import RunApp
+    from database.models import DatabaseManagerSettings, MotionsElements
+    from logs import flush
+    from metrics import REGISTRY
+    from scraper import ResponseScraper
+
+    db_manager: DatabaseManagerSettings = DatabaseManagerSettings()
+    db_manager.create_table(MotionsElements.__table__)
+    db_manager.close_connection()
+
+    run_app: RunApp = RunApp()
+    run_app.response_scraper = ResponseScraper(1, pages, CATEGORY_ID)
+    run_app.num_test_proxies = proxies
+
+    async def main() -> None:
+        try:
+            await run_app.startup()
+        finally:
+            await run_app.close()
+
+    start: float = perf_counter()
+    asyncio.run(main())
+    elapsed: float = perf_counter() - start
+    flush()
+
+    requests, latency, rows = (REGISTRY.metrics[name] for name in ("scraper_requests_total", "scraper_request_seconds", "pipeline_rows_total"))
+    fetched: float = sum(value for (status, _), value in requests.values.items() if status == "200")
+    items: float = rows.values.get(("parsed",), 0.0)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb: float = peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    ok: tuple = ("200",)
+    with open(result_file, "w", encoding="utf-8") as file:
+        json.dump({
+            "seconds": elapsed,
+            "pages": fetched,
+            "items": items,
+            "inserted": rows.values.get(("inserted",), 0.0),
+            "pages_per_s": fetched / elapsed,
+            "items_per_s": items / elapsed,
+            "p50_ms": 1000 * (latency.quantile(ok, 0.5) or 0.0) if ok in latency.series else None,
+            "p99_ms": 1000 * (latency.quantile(ok, 0.99) or 0.0) if ok in latency.series else None,
+            "peak_rss_mb": peak_rss_mb,
+        }, file)
+
+
+def _regressions(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Compare the results with the stored baselines.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): The metrics of every scenario.
+        baselines (Dict[str, Dict[str, float]]): The baseline metrics of every scenario.
+        tolerance (float): The allowed relative change, 0.25 allows 25%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions: List[str] = []
+    for name, result in results.items():
+        for metric, baseline in baselines.get(name, {}).items():
+            value: Optional[float] = result.get(metric)
+            if value is None or not baseline:
+                continue
+            if metric in THROUGHPUT_METRICS:
+                regressed: bool = value < baseline * (1 - tolerance)
+            else:
+                regressed = value > baseline * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}: {metric} {value:.1f} vs. baseline {baseline:.1f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=1, help="Runs per scenario, the run with the median pages/s is reported")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression against the baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative change against the baselines")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--baseline-file", default=BASELINE_FILE)
+    # Internal: run one scenario in this process, started by the parent
+    parser.add_argument("--child", metavar="RESULT_FILE", help=argparse.SUPPRESS)
+    parser.add_argument("--pages", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--proxies", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.pages, args.proxies)
+        return
+
+    # The stand-in servers run in a background event loop while the scenario runs in a child process
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    thread: threading.Thread = threading.Thread(target=loop.run_forever, name="standin", daemon=True)
+    thread.start()
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'scenario':>12} {'pages/s':>9} {'items/s':>10} {'p50 [ms]':>9} {'p99 [ms]':>9} {'peak RSS [MB]':>14} {'429':>5} {'5xx':>5}")
+    try:
+        for name in args.scenarios:
+            runs: List[Dict[str, float]] = sorted((_run_scenario(name, loop) for _ in range(args.runs)), key=lambda run: run["pages_per_s"])
+            result: Dict[str, float] = runs[len(runs) // 2]
+            results[name] = result
+            p50, p99 = (f"{result[key]:.1f}" if result[key] is not None else "-" for key in ("p50_ms", "p99_ms"))
+            print(f"{name:>12} {result['pages_per_s']:>9.1f} {result['items_per_s']:>10.0f} {p50:>9} {p99:>9} "
+                  f"{result['peak_rss_mb']:>14.1f} {result['throttled']:>5} {result['errors']:>5}")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    baselines: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline_file):
+        with open(args.baseline_file, encoding="utf-8") as file:
+            baselines = json.load(file)
+
+    if args.update_baseline:
+        for name, result in results.items():
+            baselines[name] = {metric: round(result[metric], 1) for metric in REPORTED_METRICS if result[metric] is not None}
+        os.makedirs(os.path.dirname(args.baseline_file), exist_ok=True)
+        with open(args.baseline_file, "w", encoding="utf-8") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baselines written to {args.baseline_file}")
+
+    if args.check:
+        regressions: List[str] = _regressions(results, baselines, args.tolerance)
+        for regression in regressions:
+            print(f"Regression {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark of the per-item list extraction and the columnar extraction of search API responses.
+
+Usage:
+    python -m benchmarks.bench_extract --pages 10 100 1000 --per-page 50 --repeat 5
+"""
+import argparse
+from time import perf_counter
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from scraper.data_scraper import DataScraper
+
+
+def _make_json_data(pages: int, per_page: int) -> List[Dict[str, Any]]:
+    """Build `pages` synthetic search API responses with `per_page` items each."""
+    json_data: List[Dict[str, Any]] = []
+    for page in range(pages):
+        json_data.append({"data": [{
+            "id": page * per_page + i,
+            "name": f"Clip {page}-{i}" if i % 10 else "",
+            "price": 10 + i % 90,
+            "currency": "EUR",
+            "previews": {
+                "jpg": {"url": f"https://static.example.com/p/{page}/{i}.jpg"},
+                "mp4": {"url": f"https://video.example.com/v/{page}/{i}_a-01.mp4"},
+                "webm": {"url": f"https://video.example.com/v/{page}/{i}_a-01.webm"} if i % 7 else {},
+            },
+            "categories": [{"id": 38, "name": "Animated Backgrounds"}, {"id": 41, "name": "Aerial Drone"}],
+            "keywords": ["background", "loop", "abstract", "motion"],
+            "duration": 12.5,
+            "resolution": "3840x2160",
+        } for i in range(per_page)]})
+    return json_data
+
+
+def _legacy_get_url(json_data: List[Dict[str, Any]]) -> Dict[str, List]:
+    """The previous `DataScraper._get_url`, appending to seven lists with a `.get()` chain per field."""
+    list_urls: Dict[str, List] = {column: [] for column in ("mp4_url", "webm_url", "category_id", "category_name", "price", "currency", "name")}
+    for data in json_data:
+        start_point: List[Dict[str, Any]] = data.get('data')
+        if len(start_point) == 0 or not start_point:
+            break
+        for point in start_point:
+            previews: Dict[str, Any] = point.get('previews')
+            categories: List[Dict[str, Any]] = point.get('categories')
+            mp4_url: str = previews.get('mp4', {}).get('url')
+            list_urls["mp4_url"].append(mp4_url if mp4_url else np.nan)
+            webm_url: str = previews.get('webm', {}).get('url')
+            list_urls["webm_url"].append(webm_url if webm_url else np.nan)
+            category_id: int = categories[0].get("id")
+            list_urls["category_id"].append(category_id if category_id else np.nan)
+            category_name: str = categories[0].get("name")
+            list_urls["category_name"].append(category_name if category_name else np.nan)
+            price = point.get('price')
+            list_urls["price"].append(price if price else np.nan)
+            currency = point.get('currency')
+            list_urls["currency"].append(currency if currency else np.nan)
+            name = point.get('name')
+            list_urls["name"].append(name if name else np.nan)
+    return list_urls
+
+
+def _best_of(repeat: int, function, *args) -> float:
+    """Return the fastest of `repeat` runs in seconds."""
+    timings: List[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        function(*args)
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def run(pages: int, per_page: int, repeat: int) -> dict:
+    """Time both extraction paths up to a DataFrame for one payload size and return the timings in seconds."""
+    json_data: List[Dict[str, Any]] = _make_json_data(pages, per_page)
+
+    # Both paths have to produce the same rows
+    expected: pd.DataFrame = pd.DataFrame(_legacy_get_url(json_data)).astype(object)
+    pd.testing.assert_frame_equal(DataScraper()._get_frame(json_data), expected)
+
+    data_scraper: DataScraper = DataScraper()
+    return {
+        "rows": pages * per_page,
+        "legacy": _best_of(repeat, lambda: pd.DataFrame(_legacy_get_url(json_data))),
+        "columnar": _best_of(repeat, data_scraper._get_frame, json_data),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1_000])
+    parser.add_argument("--per-page", type=int, default=50, help="Items per search API page")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per size, the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy [s]':>11} {'columnar [s]':>13} {'speedup':>9}")
+    for pages in args.pages:
+        timings: dict = run(pages, args.per_page, args.repeat)
+        print(f"{timings['rows']:>8} {timings['legacy']:>11.4f} {timings['columnar']:>13.4f} {timings['legacy'] / timings['columnar']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
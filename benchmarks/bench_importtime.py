@@ -0,0 +1,92 @@
+"""
+Regression benchmark of the cold start of the app.py entry point, measured with `python -X importtime`.
+
+Every run imports the module in a fresh interpreter and the fastest run is reported: the total import
+time, the heaviest modules imported directly by the first-party modules, and whether any module that
+must stay lazy was imported. The benchmark exits with status 1 if the total exceeds `--budget-ms` or a
+lazy module was imported, so it can track the start-up cost in a scheduled job or CI.
+
+Usage:
+    python -m benchmarks.bench_importtime --runs 5 --budget-ms 800
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules only imported on the code paths that need them, never by importing the entry point
+LAZY_MODULES: Tuple[str, ...] = ("pandas", "aiohttp.web", "aiohttp_socks", "bs4", "requests", "rich")
+
+# One line of the -X importtime output: self and cumulative microseconds, then the indented module name
+IMPORTTIME_LINE: re.Pattern = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _import_times(module: str) -> List[Tuple[int, int, str]]:
+    """
+    Import a module in a fresh interpreter and return its `-X importtime` rows.
+
+    Args:
+        module (str): The imported module.
+
+    Returns:
+        List[Tuple[int, int, str]]: The cumulative microseconds, the nesting depth, and the name of every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    rows: List[Tuple[int, int, str]] = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def _heaviest_dependencies(rows: List[Tuple[int, int, str]], top: int) -> List[Tuple[int, str]]:
+    """Return the heaviest third-party modules imported directly by a first-party module, with their cumulative microseconds."""
+    first_party: Tuple[str, ...] = ("app", "config", "metrics", "proxy", "proxy_pool", "logs", "database", "scraper", "proxy_lists")
+    totals: Dict[str, int] = {}
+    # The output lists every module after its imports, so the parent of a row is the next row one level up
+    for index, (cumulative, depth, name) in enumerate(rows):
+        parent: str = next((row[2] for row in rows[index + 1:] if row[1] < depth), "")
+        if parent.split(".")[0] in first_party and name.split(".")[0] not in first_party:
+            totals[name] = max(totals.get(name, 0), cumulative)
+    return sorted(((cumulative, name) for name, cumulative in totals.items()), reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="The imported entry point")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters, the fastest one is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest dependencies listed")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the total import time exceeds this budget")
+    args = parser.parse_args()
+
+    runs: List[List[Tuple[int, int, str]]] = [_import_times(args.module) for _ in range(args.runs)]
+    best: List[Tuple[int, int, str]] = min(runs, key=lambda rows: rows[-1][0])
+    total_ms: float = best[-1][0] / 1000
+
+    print(f"{'dependency':>40} {'cumulative [ms]':>16}")
+    for cumulative, name in _heaviest_dependencies(best, args.top):
+        print(f"{name:>40} {cumulative / 1000:>16.1f}")
+    print(f"{'import ' + args.module:>40} {total_ms:>16.1f}   (fastest of {args.runs} runs)")
+
+    imported: set = {name for _, _, name in best}
+    eager: List[str] = [module for module in LAZY_MODULES if module in imported]
+    failed: bool = False
+    if eager:
+        print(f"Lazy modules imported at start-up: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Start-up time {total_ms:.1f} ms exceeds the budget of {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
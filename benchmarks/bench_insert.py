@@ -0,0 +1,49 @@
+"""
+Benchmark of the ORM and the bulk insert modes of DatabaseManagerSettings, reported in rows per second.
+
+Usage:
+    python -m benchmarks.bench_insert --sizes 1000 10000 50000 --batch-size 5000
+"""
+import argparse
+import tempfile
+import os
+from time import perf_counter
+import pandas as pd
+from database.models import DatabaseManagerSettings, MotionsElements
+from benchmarks.bench_dedup import _make_list_urls
+
+
+def _time_insert(df: pd.DataFrame, mode: str, batch_size: int) -> float:
+    """Insert the DataFrame into a fresh database with the given mode and return the elapsed seconds."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManagerSettings(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        db_manager.create_table(MotionsElements.__table__)
+
+        start: float = perf_counter()
+        if mode == "orm":
+            db_manager.insert_data(df, MotionsElements)
+        else:
+            db_manager.bulk_insert_data(df, MotionsElements, batch_size=batch_size, ignore_duplicates=True)
+        elapsed: float = perf_counter() - start
+
+        db_manager.close_connection()
+        db_manager.engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'orm [rows/s]':>14} {'bulk [rows/s]':>15} {'speedup':>9}")
+    for size in args.sizes:
+        df: pd.DataFrame = pd.DataFrame(_make_list_urls(size))
+        orm: float = _time_insert(df, "orm", args.batch_size)
+        bulk: float = _time_insert(df, "bulk", args.batch_size)
+        print(f"{size:>8} {size / orm:>14.0f} {size / bulk:>15.0f} {orm / bulk:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
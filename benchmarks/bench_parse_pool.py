@@ -0,0 +1,77 @@
+"""
+Benchmark of the parse throughput on the event loop and in parse pools of increasing size, in pages per second.
+
+Every page goes through the work the event loop does for the scrape pipeline: the body is decoded and its
+items are extracted into a row array. With a parse pool the event loop only hands the body over. The
+"loop busy" column is the share of the run the event loop spent on the CPU, the rest is free for I/O.
+
+Usage:
+    python -m benchmarks.bench_parse_pool --workers 1 2 4 8 16 --pages 2000 --per-page 50 --in-flight 64
+"""
+import argparse
+import asyncio
+import json
+import os
+from time import perf_counter, process_time
+from typing import List
+from benchmarks.bench_extract import _make_json_data
+from scraper.data_scraper import DataScraper
+from scraper.json_decoder import JsonDecoder
+from scraper.parse_pool import ParsePool
+
+
+async def _run_inline(bodies: List[bytes]) -> None:
+    """Decode and extract every page on the event loop."""
+    decoder: JsonDecoder = JsonDecoder(workers=0)
+    data_scraper: DataScraper = DataScraper()
+    for body in bodies:
+        data_scraper._get_rows([await decoder.decode_async(body)])
+
+
+async def _run_pool(bodies: List[bytes], workers: int, in_flight_pages: int) -> int:
+    """Parse every page in a pool of worker processes with `in_flight_pages` pages outstanding and return the number of batches."""
+    parse_pool: ParsePool = ParsePool(workers)
+    try:
+        # Start the workers before the clock matters
+        await asyncio.gather(*(parse_pool.parse(bodies[0]) for _ in range(workers)))
+        in_flight: asyncio.Semaphore = asyncio.Semaphore(in_flight_pages)
+
+        async def parse(body: bytes) -> None:
+            async with in_flight:
+                (await parse_pool.parse(body))['data'].rows
+
+        await asyncio.gather(*(parse(body) for body in bodies))
+        return parse_pool.batches - workers
+    finally:
+        parse_pool.close()
+
+
+def _measure(run) -> tuple:
+    """Run a coroutine and return the wall time, the CPU time of the main process, and the result."""
+    start, start_cpu = perf_counter(), process_time()
+    result = asyncio.run(run)
+    return perf_counter() - start, process_time() - start_cpu, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--pages", type=int, default=2_000)
+    parser.add_argument("--per-page", type=int, default=50, help="Items per search API page")
+    parser.add_argument("--in-flight", type=int, default=64, help="Pages handed to the pool at the same time, like responses of concurrent requests")
+    args = parser.parse_args()
+
+    bodies: List[bytes] = [json.dumps(page).encode() for page in _make_json_data(args.pages, args.per_page)]
+    print(f"cores: {os.cpu_count()}, pages: {len(bodies)}, decoder: {JsonDecoder().backend}")
+    print(f"{'mode':>12} {'pages/s':>9} {'speedup':>8} {'loop busy':>10} {'pages/batch':>12}")
+
+    wall, cpu, _ = _measure(_run_inline(bodies))
+    baseline: float = len(bodies) / wall
+    print(f"{'event loop':>12} {baseline:>9.0f} {1:>7.1f}x {cpu / wall:>9.0%} {'-':>12}")
+    for workers in sorted(set(args.workers)):
+        wall, cpu, batches = _measure(_run_pool(bodies, workers, args.in_flight))
+        print(f"{f'{workers} workers':>12} {len(bodies) / wall:>9.0f} {len(bodies) / wall / baseline:>7.1f}x {cpu / wall:>9.0%} {len(bodies) / batches:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the settings lookups done at startup, reported per call and per crawl startup.
+
+The "before" rows read and parse the settings file on every lookup, like `_load_settings` did: the
+per-call row repeats its `load_dotenv` and `json.load`, the startup row builds one ResponseScraper with
+its scheduler per category with every lookup reloading the file. The "after" rows use the memoized
+settings of `get_settings`.
+
+Usage:
+    SETTINGS_APK=settings/config_file.json python -m benchmarks.bench_settings --calls 1000
+"""
+import argparse
+import json
+import os
+from time import perf_counter
+from typing import Callable
+from dotenv import load_dotenv
+import config
+import scraper.response_scraper
+from config import get_settings
+from scraper.response_scraper import ResponseScraper
+
+
+def _read_settings_file() -> dict:
+    """Read the settings file like `_load_settings` did before the settings were memoized."""
+    load_dotenv()
+    with open(os.environ["SETTINGS_APK"], "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _best_time(function: Callable[[], None], repeat: int = 3) -> float:
+    """Return the fastest of `repeat` runs of the function in seconds."""
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def _start_crawl() -> None:
+    """Create the scraper and the scheduler of every category, the settings lookups of a crawl startup."""
+    for category_id in get_settings().scraping_settings.category_id.values():
+        ResponseScraper(1, 1, category_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="Number of settings lookups timed per call")
+    args = parser.parse_args()
+
+    get_settings()
+    print(f"{'':>30} {'before':>12} {'after':>12}")
+
+    before: float = _best_time(lambda: [_read_settings_file() for _ in range(args.calls)]) / args.calls
+    after: float = _best_time(lambda: [get_settings() for _ in range(args.calls)]) / args.calls
+    print(f"{'lookup [us/call]':>30} {before * 1e6:>12.1f} {after * 1e6:>12.3f}   {before / after:.0f}x")
+
+    # Reload the file on every lookup of the scrapers to reproduce the startup before the memoization
+    reload: Callable[[], config.Settings] = lambda: get_settings(reload=True)
+    scraper.response_scraper.get_settings = reload
+    try:
+        before = _best_time(_start_crawl)
+    finally:
+        scraper.response_scraper.get_settings = get_settings
+    after = _best_time(_start_crawl)
+    categories: int = len(get_settings().scraping_settings.category_id)
+    print(f"{f'startup of {categories} categories [ms]':>30} {before * 1e3:>12.2f} {after * 1e3:>12.2f}   {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Offline stand-in of the MotionElements search API and of HTTP proxies, for benchmarks and tests.
+
+`SearchApiStandIn` serves `/v2/search/video` with synthetic pages shaped like the live responses:
+`per_page` items with previews, categories, price and name, padded to a payload size, and pagination
+metadata. It injects latency, 429 responses with Retry-After, and 5xx errors at configurable rates,
+deterministically for a seed. `/ip` answers like the proxy checker URLs.
+
+`ForwardingProxy` is a plain HTTP proxy listening on one or more ports, every port standing for one
+proxy of the proxy list. It forwards the absolute-form requests of aiohttp to the target server.
+
+Usage:
+    python -m benchmarks.standin --port 8080 --pages 100 --latency 0.05 --throttle-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Any, Dict, List, Optional
+import aiohttp
+from aiohttp import web
+
+
+# Response headers copied from the target server by the forwarding proxy
+FORWARDED_HEADERS: tuple = ("Content-Type", "Retry-After", "ETag", "Last-Modified")
+
+
+class _Server:
+    """Base class of the stand-in servers, an aiohttp application on local ports."""
+
+    def __init__(self) -> None:
+        self.runner: Optional[web.AppRunner] = None
+        self.ports: List[int] = []
+
+    def _application(self) -> web.Application:
+        raise NotImplementedError
+
+    async def start(self, host: str = "127.0.0.1", ports: List[int] = (0,)) -> "_Server":
+        """
+        Start serving on the given ports, 0 selects a free port.
+
+        Args:
+            host (str): The interface to listen on.
+            ports (List[int]): The ports to listen on.
+
+        Returns:
+            _Server: The started server.
+        """
+        self.runner = web.AppRunner(self._application(), access_log=None)
+        await self.runner.setup()
+        for port in ports:
+            site: web.TCPSite = web.TCPSite(self.runner, host, port)
+            await site.start()
+            self.ports.append(site._server.sockets[0].getsockname()[1])
+        self.host: str = host
+        return self
+
+    async def close(self) -> None:
+        """Stop serving and close the open connections."""
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self) -> "_Server":
+        return await self.start() if self.runner is None else self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+class SearchApiStandIn(_Server):
+    def __init__(self, pages: int = 20, per_page: Optional[int] = None, payload_bytes: int = 0, latency: float = 0.0,
+                 jitter: float = 0.5, throttle_rate: float = 0.0, retry_after: int = 0, error_rate: float = 0.0,
+                 metadata: bool = True, seed: int = 0) -> None:
+        """
+        Initializes the stand-in of the search API.
+
+        Args:
+            pages (int): The number of pages with items of every category, later pages are empty.
+            per_page (int, optional): The number of items per page. Defaults to the `per_page` query parameter.
+            payload_bytes (int): The size of the description padding every item, to tune the page size.
+            latency (float): The mean delay of a response in seconds.
+            jitter (float): The relative spread of the delay, 0.5 draws it from 50% to 150% of `latency`.
+            throttle_rate (float): The share of requests answered with 429 and a Retry-After header.
+            retry_after (int): The seconds of the Retry-After header of a 429 response.
+            error_rate (float): The share of requests answered with 503.
+            metadata (bool): Whether the pages carry pagination metadata with the total item count.
+            seed (int): The seed of the latency and fault injection.
+
+        Returns:
+            None
+        """
+        super().__init__()
+        self.pages: int = pages
+        self.per_page: Optional[int] = per_page
+        self.payload_bytes: int = payload_bytes
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.throttle_rate: float = throttle_rate
+        self.retry_after: int = retry_after
+        self.error_rate: float = error_rate
+        self.metadata: bool = metadata
+        self.random: random.Random = random.Random(seed)
+        self.requests: int = 0
+        self.throttled: int = 0
+        self.errors: int = 0
+
+    @property
+    def url(self) -> str:
+        """The base URL of the stand-in, replacing the `base_url_video` scraping setting."""
+        return f"http://{self.host}:{self.ports[0]}"
+
+    def _application(self) -> web.Application:
+        app: web.Application = web.Application()
+        app.router.add_get("/v2/search/video", self.search)
+        app.router.add_get("/ip", self.ip)
+        return app
+
+    def page(self, category_id: int, page: int, per_page: int) -> Dict[str, Any]:
+        """
+        Build one synthetic search API page.
+
+        Args:
+            category_id (int): The category of the items.
+            page (int): The page number, from 1.
+            per_page (int): The number of items of a full page.
+
+        Returns:
+            Dict[str, Any]: The page, without items after the last page.
+        """
+        count: int = per_page if 1 <= page <= self.pages else 0
+        description: str = "x" * self.payload_bytes
+        items: List[Dict[str, Any]] = [{
+            "id": (category_id * 100000 + page) * 1000 + index,
+            "name": f"Clip {category_id}-{page}-{index}",
+            "price": 10 + index % 90,
+            "currency": "EUR",
+            "description": description,
+            "previews": {
+                "jpg": {"url": f"https://static.standin.test/{category_id}/{page}/{index}.jpg"},
+                "mp4": {"url": f"https://video.standin.test/{category_id}/{page}/{index}.mp4"},
+                "webm": {"url": f"https://video.standin.test/{category_id}/{page}/{index}.webm"} if index % 7 else {},
+            },
+            "categories": [{"id": category_id, "name": f"Category {category_id}"}],
+            "keywords": ["background", "loop", "abstract", "motion"],
+            "duration": 12.5,
+        } for index in range(count)]
+        json_page: Dict[str, Any] = {"data": items}
+        if self.metadata:
+            json_page["meta"] = {"total": self.pages * per_page, "per_page": per_page, "current_page": page}
+        return json_page
+
+    async def search(self, request: web.Request) -> web.Response:
+        """Answer a search request with a page, a delay, or an injected fault."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+
+        fault: float = self.random.random()
+        if fault < self.throttle_rate:
+            self.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if fault < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+
+        query = request.query
+        per_page: int = self.per_page or int(query.get("per_page", 50))
+        json_page: Dict[str, Any] = self.page(int(query.get("cat", 0)), int(query.get("page", 1)), per_page)
+        return web.Response(body=json.dumps(json_page).encode(), content_type="application/json")
+
+    async def ip(self, request: web.Request) -> web.Response:
+        """Answer a proxy check with the address of the client."""
+        return web.json_response({"origin": request.remote})
+
+
+class ForwardingProxy(_Server):
+    def __init__(self, failure_rate: float = 0.0, seed: int = 0) -> None:
+        """
+        Initializes the forwarding HTTP proxy.
+
+        Args:
+            failure_rate (float): The share of requests answered with 502 instead of being forwarded.
+            seed (int): The seed of the failure injection.
+
+        Returns:
+            None
+        """
+        super().__init__()
+        self.failure_rate: float = failure_rate
+        self.random: random.Random = random.Random(seed)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.requests: int = 0
+
+    @property
+    def proxies(self) -> List[str]:
+        """The proxy URLs, one per port."""
+        return [f"http://{self.host}:{port}" for port in self.ports]
+
+    def _application(self) -> web.Application:
+        app: web.Application = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.forward)
+        return app
+
+    async def forward(self, request: web.Request) -> web.Response:
+        """Forward a proxied request to its target server and relay the response."""
+        self.requests += 1
+        if self.random.random() < self.failure_rate:
+            return web.Response(status=502)
+        if self.session is None:
+            self.session = aiohttp.ClientSession(auto_decompress=False)
+        headers: Dict[str, str] = {key: value for key, value in request.headers.items() if key.lower() not in ("host", "proxy-connection")}
+        async with self.session.get(request.url, headers=headers) as response:
+            body: bytes = await response.read()
+            relayed: Dict[str, str] = {key: response.headers[key] for key in FORWARDED_HEADERS if key in response.headers}
+            if "Content-Encoding" in response.headers:
+                relayed["Content-Encoding"] = response.headers["Content-Encoding"]
+            return web.Response(status=response.status, body=body, headers=relayed)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        await super().close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8080, help="Port of the search API stand-in")
+    parser.add_argument("--pages", type=int, default=20, help="Pages with items per category")
+    parser.add_argument("--per-page", type=int, default=None, help="Items per page, defaults to the per_page query parameter")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="Description padding per item")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503 responses")
+    parser.add_argument("--proxies", type=int, default=0, help="Number of forwarding proxy ports started after the API port")
+    args = parser.parse_args()
+
+    async def serve() -> None:
+        api: SearchApiStandIn = SearchApiStandIn(args.pages, args.per_page, args.payload_bytes, args.latency,
+                                                 throttle_rate=args.throttle_rate, error_rate=args.error_rate)
+        await api.start(ports=[args.port])
+        print(f"Search API stand-in on {api.url}/v2/search/video")
+        if args.proxies:
+            proxy: ForwardingProxy = await ForwardingProxy().start(ports=[args.port + 1 + index for index in range(args.proxies)])
+            print(f"Forwarding proxies: {', '.join(proxy.proxies)}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,377 @@
 import json
-from dotenv import load_dotenv
 import os
+from dataclasses import dataclass, field, fields
+from threading import Lock
+from time import monotonic
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple, Union, get_args, get_origin
+from dotenv import load_dotenv
+
+
+# Seconds between the checks of the settings file's modification time, reads in between are served from memory
+SETTINGS_CHECK_INTERVAL: float = 5.0
+
+
+class SettingsError(ValueError):
+    """Raised when the settings file contains a missing, unknown, or invalid setting."""
+
+
+def _freeze(value: Any) -> Any:
+    """Return an immutable copy of a decoded JSON value, dictionaries become read-only mappings and lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _check_type(value: Any, expected: Any) -> bool:
+    """Return whether a decoded JSON value matches the annotated type of a setting."""
+    origin = get_origin(expected)
+    if origin is Union:
+        return any(_check_type(value, option) for option in get_args(expected))
+    if origin is tuple:
+        item_type = get_args(expected)[0]
+        return isinstance(value, tuple) and all(_check_type(item, item_type) for item in value)
+    if origin is not None and issubclass(origin, Mapping) or expected is Mapping:
+        return isinstance(value, Mapping)
+    if expected is type(None):
+        return value is None
+    if expected is Any:
+        return True
+    # JSON has no separate boolean numbers, and an integer is a valid float
+    if expected is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def _minimum(value: float) -> Dict[str, float]:
+    """Return the field metadata of a numeric setting with an inclusive lower bound."""
+    return {"minimum": value}
+
+
+def _greater_than(value: float) -> Dict[str, float]:
+    """Return the field metadata of a numeric setting with an exclusive lower bound."""
+    return {"exclusive_minimum": value}
+
+
+def _between(low: float, high: float) -> Dict[str, float]:
+    """Return the field metadata of a numeric setting with exclusive lower and upper bounds."""
+    return {"exclusive_minimum": low, "exclusive_maximum": high}
+
+
+def _one_of(*choices: str) -> Dict[str, Tuple[str, ...]]:
+    """Return the field metadata of a string setting restricted to a set of values."""
+    return {"choices": choices}
+
+
+def _entries(required: Dict[str, Any], optional: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Return the field metadata of a list setting whose entries are objects with typed keys."""
+    return {"required_keys": required, "optional_keys": optional}
+
+
+def _check_entry(name: str, entry: Mapping, required: Dict[str, Any], optional: Dict[str, Any]) -> None:
+    """
+    Validate the keys and the types of one object entry of a list setting.
+
+    Args:
+        name (str): The name of the entry, used in error messages.
+        entry (Mapping): The entry.
+        required (Dict[str, Any]): The annotated types of the keys every entry must have.
+        optional (Dict[str, Any]): The annotated types of the keys an entry may have.
+
+    Raises:
+        SettingsError: If a key is missing or unknown, or has the wrong type.
+    """
+    unknown = set(entry) - set(required) - set(optional)
+    if unknown:
+        raise SettingsError(f"Unknown keys in {name}: {', '.join(sorted(unknown))}")
+    for key, expected in {**required, **optional}.items():
+        if key not in entry:
+            if key in required:
+                raise SettingsError(f"Key {key} of {name} is missing")
+            continue
+        if not _check_type(entry[key], expected):
+            raise SettingsError(f"Key {key} of {name} has an invalid value {entry[key]!r}")
+
+
+class _Section:
+    """Base class of the settings sections, also readable like the dictionaries of the settings file."""
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__dataclass_fields__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a setting like `dict.get`."""
+        return getattr(self, key) if key in self.__dataclass_fields__ else default
+
+    @classmethod
+    def from_dict(cls, name: str, data: Any) -> "_Section":
+        """
+        Create the section from its decoded JSON object, validating every setting.
+
+        Args:
+            name (str): The name of the section in the settings file, used in error messages.
+            data (Any): The decoded JSON object of the section.
+
+        Returns:
+            _Section: The immutable section.
+
+        Raises:
+            SettingsError: If the section is not an object, a setting is missing or unknown,
+                has the wrong type, is out of its bounds or not one of its allowed values, or has
+                an invalid entry.
+        """
+        if not isinstance(data, dict):
+            raise SettingsError(f"Settings section {name} must be an object")
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise SettingsError(f"Unknown settings in {name}: {', '.join(sorted(unknown))}")
+
+        values: Dict[str, Any] = {}
+        for setting in fields(cls):
+            if setting.name not in data:
+                raise SettingsError(f"Setting {name}.{setting.name} is missing")
+            value: Any = _freeze(data[setting.name])
+            if not _check_type(value, setting.type):
+                raise SettingsError(f"Setting {name}.{setting.name} has an invalid value {value!r}")
+            minimum: Optional[float] = setting.metadata.get("minimum")
+            if minimum is not None and value is not None and value < minimum:
+                raise SettingsError(f"Setting {name}.{setting.name} must be at least {minimum}, got {value!r}")
+            exclusive_minimum: Optional[float] = setting.metadata.get("exclusive_minimum")
+            if exclusive_minimum is not None and value is not None and value <= exclusive_minimum:
+                raise SettingsError(f"Setting {name}.{setting.name} must be greater than {exclusive_minimum}, got {value!r}")
+            exclusive_maximum: Optional[float] = setting.metadata.get("exclusive_maximum")
+            if exclusive_maximum is not None and value is not None and value >= exclusive_maximum:
+                raise SettingsError(f"Setting {name}.{setting.name} must be less than {exclusive_maximum}, got {value!r}")
+            choices: Optional[Tuple[str, ...]] = setting.metadata.get("choices")
+            if choices is not None and value not in choices:
+                raise SettingsError(f"Setting {name}.{setting.name} must be one of {', '.join(choices)}, got {value!r}")
+            required_keys: Optional[Dict[str, Any]] = setting.metadata.get("required_keys")
+            if required_keys is not None:
+                for index, entry in enumerate(value):
+                    _check_entry(f"{name}.{setting.name}[{index}]", entry, required_keys, setting.metadata["optional_keys"])
+            values[setting.name] = value
+        return cls(**values)
+
+
+@dataclass(frozen=True)
+class ScrapingSettings(_Section):
+    """The scraping_settings section: the search API, the crawl limits, and the tuning of the fetch stack."""
+    base_url_video: str
+    base_url_page: str
+    base_url_category: str
+    max_workers: int = field(metadata=_minimum(1))
+    max_in_flight: int = field(metadata=_minimum(1))
+    rate_per_host: float = field(metadata=_greater_than(0))
+    burst_per_host: int = field(metadata=_minimum(1))
+    retry_max_attempts: int = field(metadata=_minimum(1))
+    retry_base_delay: float = field(metadata=_minimum(0))
+    retry_max_delay: float = field(metadata=_minimum(0))
+    retry_limit_decrease: float = field(metadata=_between(0, 1))
+    breaker_failures: int = field(metadata=_minimum(1))
+    breaker_reset: float = field(metadata=_minimum(0))
+    connection_limit: int = field(metadata=_minimum(0))
+    keepalive_timeout: float = field(metadata=_minimum(0))
+    dns_cache_ttl: int = field(metadata=_minimum(0))
+    request_timeout: float = field(metadata=_minimum(0))
+    metrics_host: str
+    metrics_port: Optional[int] = field(metadata=_minimum(0))
+    max_pages_per_category: int = field(metadata=_minimum(1))
+    pipeline_batch_size: int = field(metadata=_minimum(1))
+    pipeline_queue_size: int = field(metadata=_minimum(1))
+    json_decoder: str = field(metadata=_one_of("auto", "msgspec", "orjson", "json"))
+    json_offload_bytes: int = field(metadata=_minimum(0))
+    json_decode_workers: int = field(metadata=_minimum(1))
+    parse_workers: int = field(metadata=_minimum(0))
+    parse_batch_pages: int = field(metadata=_minimum(1))
+    response_cache_path: Optional[str]
+    response_cache_max_mb: float = field(metadata=_minimum(0))
+    response_cache_ttl: float = field(metadata=_minimum(0))
+    # The incremental crawl stops at the first known page, so only a newest-first order is valid
+    incremental_sort: str = field(metadata=_one_of("newest"))
+    incremental_known_pages: int = field(metadata=_minimum(1))
+    crawl_plan: Tuple[Mapping, ...] = field(metadata=_entries(
+        required={"category": Union[str, int]},
+        optional={"start_page": int, "end_page": Optional[int]},
+    ))
+    category_id: Mapping[str, int]
+    user_agents: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ProxySettings(_Section):
+    """The proxy_settings section: the proxy lists, their validation, and the proxy pool."""
+    use_proxy: bool
+    pool_half_life: float = field(metadata=_greater_than(0))
+    pool_max_failures: int = field(metadata=_minimum(1))
+    pool_cooldown: float = field(metadata=_minimum(0))
+    proxy_list1: str
+    proxy_list2: str
+    proxy_list3: str
+    proxy_list4: str
+    proxy_list5: str
+    validated_proxy_list: str
+    checker_proxies: Tuple[str, ...]
+    proxy_check_url: str
+    proxy_check_url1: str
+    proxy_check_url2: str
+    validation_concurrency: int = field(metadata=_minimum(1))
+    validation_connect_timeout: float = field(metadata=_minimum(0))
+    validation_timeout: float = field(metadata=_minimum(0))
+    min_working_proxies: int = field(metadata=_minimum(0))
+    health_cache_ttl: float = field(metadata=_minimum(0))
+
+
+@dataclass(frozen=True)
+class Settings(_Section):
+    """The parsed settings file, immutable and shared by the whole process."""
+    scraping_settings: ScrapingSettings
+    proxy_settings: ProxySettings
+    notification_settings: Mapping[str, Any]
+    scheduler_settings: Mapping[str, Any]
+    path: str = field(default="", compare=False)
+    mtime_ns: int = field(default=0, compare=False)
+
+    @classmethod
+    def from_dict(cls, name: str, data: Any, mtime_ns: int = 0) -> "Settings":
+        """
+        Create the settings from the decoded settings file, validating every section.
+
+        Args:
+            name (str): The path of the settings file.
+            data (Any): The decoded JSON object of the file.
+            mtime_ns (int): The modification time of the file in nanoseconds.
+
+        Returns:
+            Settings: The immutable settings.
+
+        Raises:
+            SettingsError: If a section or a setting is missing, unknown, or invalid.
+        """
+        if not isinstance(data, dict):
+            raise SettingsError(f"Settings file {name} must contain an object")
+        sections: Tuple[str, ...] = ("scraping_settings", "proxy_settings", "notification_settings", "scheduler_settings")
+        unknown = set(data) - set(sections)
+        if unknown:
+            raise SettingsError(f"Unknown settings sections in {name}: {', '.join(sorted(unknown))}")
+        for section in sections:
+            if not isinstance(data.get(section), dict):
+                raise SettingsError(f"Settings section {section} is missing or not an object")
+
+        return cls(
+            scraping_settings=ScrapingSettings.from_dict("scraping_settings", data["scraping_settings"]),
+            proxy_settings=ProxySettings.from_dict("proxy_settings", data["proxy_settings"]),
+            notification_settings=_freeze(data["notification_settings"]),
+            scheduler_settings=_freeze(data["scheduler_settings"]),
+            path=name,
+            mtime_ns=mtime_ns,
+        )
+
+
+# The settings of the process and the monotonic time of the last check of the file's modification time
+_settings: Optional[Settings] = None
+_checked_at: float = 0.0
+_settings_lock: Lock = Lock()
+
+
+def _settings_path() -> str:
+    """Return the path of the settings file from the environment variable SETTINGS_APK."""
+    try:
+        return os.environ['SETTINGS_APK']
+    except KeyError:
+        raise FileNotFoundError('Environment variable SETTINGS_APK not set')
+
+
+def _read_settings(path: str) -> Settings:
+    """
+    Read, parse, and validate the settings file.
+
+    Args:
+        path (str): The path of the settings file.
+
+    Returns:
+        Settings: The immutable settings.
+
+    Raises:
+        FileNotFoundError: If the settings file does not exist.
+        UnicodeDecodeError: If the settings file cannot be decoded as a UTF-8 file.
+        SettingsError: If a setting is missing, unknown, or invalid.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            mtime_ns: int = os.fstat(file.fileno()).st_mtime_ns
+            config_data: Any = json.load(file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f'Settings file {path} not found')
+    except UnicodeDecodeError as error:
+        raise UnicodeDecodeError(error.encoding, error.object, error.start, error.end, f'Settings file {path} is not UTF-8')
+    return Settings.from_dict(path, config_data, mtime_ns)
+
+
+def get_settings(reload: bool = False) -> Settings:
+    """
+    Return the settings of the process.
+
+    The settings file, named by the environment variable SETTINGS_APK, is parsed and validated once
+    into an immutable Settings object that is shared by every caller. The file is reloaded only
+    when its modification time changes, which is checked at most every SETTINGS_CHECK_INTERVAL
+    seconds, so all other calls are served from memory without touching the filesystem.
+
+    Args:
+        reload (bool): Whether to reload the file even if it has not changed.
+
+    Returns:
+        Settings: The settings, readable by attribute (`settings.scraping_settings.max_workers`) or
+            like the dictionaries of the file (`settings['scraping_settings']['max_workers']`).
+
+    Raises:
+        FileNotFoundError: If the environment variable or the settings file does not exist.
+        UnicodeDecodeError: If the settings file cannot be decoded as a UTF-8 file.
+        SettingsError: If a setting is missing, unknown, or invalid.
+    """
+    global _settings, _checked_at
+
+    settings: Optional[Settings] = _settings
+    if settings is not None and not reload and monotonic() - _checked_at < SETTINGS_CHECK_INTERVAL:
+        return settings
+
+    with _settings_lock:
+        if _settings is None:
+            load_dotenv()
+        path: str = _settings_path()
+        try:
+            changed: bool = _settings is None or _settings.path != path or os.stat(path).st_mtime_ns != _settings.mtime_ns
+        except FileNotFoundError:
+            # The last valid settings stay in use while the file is being replaced
+            changed = _settings is None
+        if changed or reload:
+            _settings = _read_settings(path)
+        _checked_at = monotonic()
+        return _settings
 
 
 # A function for loading a JSON file with application settings
-def _load_settings():
+def _load_settings() -> Settings:
     """Load settings from a JSON file.
 
-    This function loads settings from a JSON file specified in the environment
-    variable SETTINGS_APK, which should be a path to a file on the local file
-    system. If the environment variable is not set or if the file does not
-    exist, the function raises a FileNotFoundError. If the file cannot be
-    decoded as a UTF-8 file, the function raises a UnicodeDecodeError.
+    Kept for the existing callers, the settings are memoized by `get_settings`, so the file is
+    only read again when it changes.
 
     Returns:
-        A dictionary with the settings.
+        The immutable settings, readable like the dictionaries of the file.
 
     Raises:
         FileNotFoundError: If the settings file does not exist.
         UnicodeDecodeError: If the settings file cannot be decoded as a UTF-8
             file.
+        SettingsError: If a setting is missing, unknown, or invalid.
     """
-    load_dotenv()
-    try:
-        SETTINGS_APK = os.environ['SETTINGS_APK']
-    except KeyError:
-        raise FileNotFoundError('Environment variable SETTINGS_APK not set')
-    try:
-        with open(SETTINGS_APK, 'r', encoding='utf-8') as file:
-            config_data = json.load(file)
-    except FileNotFoundError:
-        raise FileNotFoundError(f'Settings file {SETTINGS_APK} not found')
-    except UnicodeDecodeError:
-        raise UnicodeDecodeError(f'Settings file {SETTINGS_APK} is not UTF-8')
-    return config_data
+    return get_settings()
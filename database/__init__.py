@@ -1,3 +1,4 @@
-from .models import DatabaseManagerSettings
+from .models import DatabaseManagerSettings, get_engine
+from .writer import DatabaseWriter, get_writer
 
-__all__ = ["DatabaseManagerSettings"]
\ No newline at end of file
+__all__ = ["DatabaseManagerSettings", "DatabaseWriter", "get_engine", "get_writer"]
\ No newline at end of file
@@ -0,0 +1,60 @@
+from typing import Optional
+from time import time
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from database.models import CrawlState, DatabaseManagerSettings
+
+
+class CrawlStateStore:
+    def __init__(self, db_manager_settings: DatabaseManagerSettings) -> None:
+        """
+        Initializes the store of per-category high-water marks stored in the `crawl_state` table.
+
+        The high-water mark of a category is the URL of the newest item seen by its last complete
+        incremental crawl. The next crawl stops at the page holding it, so a daily run only fetches
+        the items added since.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database holding the table.
+
+        Returns:
+            None
+        """
+        self.db_manager_settings: DatabaseManagerSettings = db_manager_settings
+        CrawlState.__table__.create(self.db_manager_settings.engine, checkfirst=True)
+
+    def high_water_mark(self, category_id: int, sort: str) -> Optional[str]:
+        """
+        Return the high-water mark of a category.
+
+        Args:
+            category_id (int): The category ID.
+            sort (str): The sort order the category is crawled in.
+
+        Returns:
+            str or None: The URL of the newest item seen by the last complete crawl, or None if the category was never crawled.
+        """
+        statement = select(CrawlState.high_water_url).where(CrawlState.category_id == category_id, CrawlState.sort == sort)
+        with self.db_manager_settings.engine.connect() as connection:
+            return connection.execute(statement).scalar()
+
+    def set_high_water_mark(self, category_id: int, sort: str, url: str) -> None:
+        """
+        Store the high-water mark of a category.
+
+        Args:
+            category_id (int): The category ID.
+            sort (str): The sort order the category was crawled in.
+            url (str): The URL of the newest item of the crawl.
+
+        Returns:
+            None
+        """
+        table = CrawlState.__table__
+        statement = insert(table).values(category_id=category_id, sort=sort, high_water_url=url, updated_at=time())
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.category_id, table.c.sort],
+            set_={"high_water_url": statement.excluded.high_water_url, "updated_at": statement.excluded.updated_at},
+        )
+        with self.db_manager_settings.engine.begin() as connection:
+            connection.execute(statement)
@@ -1,9 +1,26 @@
+from __future__ import annotations
+from concurrent.futures import Future
+import asyncio
 import os
-import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Table
+import logging
+import threading
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import create_engine, event, func, insert, select, delete, Column, Float, Integer, LargeBinary, String, Table
+from sqlalchemy.engine import Connection, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
+from logs import logger
+from logs.logger import LogSampler
+from database.seen_urls import SeenUrlFilter
+from database.writer import DatabaseWriter, flush_writer, get_writer
+from metrics import REGISTRY
+
+# pandas is imported on first use, it is the largest part of the start-up time
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # Database tables definition (declarative base)
@@ -12,38 +29,164 @@ Base = declarative_base()
 # Load environment variables
 load_dotenv()
 
+# Load logger settings from .env file
+LOG_DIR_DATABASE = os.getenv('LOG_DIR_DATABASE')
+
+# Create logger object
+logger = logger.get_logger(log_file=LOG_DIR_DATABASE, log_level=logging.INFO)
+
+# Per-batch messages are sampled, with a periodic summary of the suppressed ones
+batch_log = LogSampler(logger)
+
 class MotionsElements(Base):
     # Set the table name and primary key column name (automatically generated if not specified)
     __tablename__ = os.getenv("DATABASE_TABLE_SQLITE")   # Set the table name
     id = Column(Integer, primary_key=True, autoincrement=True)   # Set the primary key
-    mp4_url = Column(String)    # Set the column name
+    mp4_url = Column(String, unique=True, index=True)    # Set the column name with a unique index
     webm_url = Column(String)   # Set the column name
-    category_id = Column(Integer)   # Set the column name
+    category_id = Column(Integer, index=True)   # Set the column name with an index
     category_name = Column(String)   # Set the column name
     price = Column(String)   # Set the column name
     currency = Column(String)   # Set the column name
     name = Column(String)   # Set the column name
 
+class ProxyHealthRecord(Base):
+    # Validation results of proxies, kept across runs
+    __tablename__ = "proxy_health"   # Set the table name
+    proxy = Column(String, primary_key=True)   # Set the primary key
+    last_success = Column(Float)   # Unix time of the last successful validation
+    last_checked = Column(Float)   # Unix time of the last validation
+    latency = Column(Float)   # Seconds the last successful validation took
+    failure_streak = Column(Integer, default=0)   # Number of failed validations in a row
+
+class HttpCacheEntry(Base):
+    # Cached HTTP responses, kept across runs
+    __tablename__ = "http_cache"   # Set the table name
+    url = Column(String, primary_key=True)   # Set the primary key
+    body = Column(LargeBinary)   # Response body
+    etag = Column(String)   # ETag header of the response
+    last_modified = Column(String)   # Last-Modified header of the response
+    size = Column(Integer)   # Number of bytes of the body
+    stored_at = Column(Float)   # Unix time the response was downloaded or last revalidated
+    accessed_at = Column(Float, index=True)   # Unix time the response was last used, for LRU eviction
+
+class CrawlState(Base):
+    # High-water marks of incremental crawls, kept across runs
+    __tablename__ = "crawl_state"   # Set the table name
+    category_id = Column(Integer, primary_key=True)   # Set the primary key
+    sort = Column(String, primary_key=True)   # Sort order the category was crawled in
+    high_water_url = Column(String)   # URL of the newest item seen by the last complete crawl
+    updated_at = Column(Float)   # Unix time the high-water mark was stored
+
+# SQLite builds older than 3.32 allow at most 999 bound parameters per statement
+SQLITE_MAX_VARIABLES: int = 900
+
+# Default number of rows sent to the database in one executemany call
+BULK_INSERT_BATCH_SIZE: int = 5000
+
+# Metrics of the database queries
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_seconds", "Duration of database queries by operation", ("operation",))
+DB_ROWS = REGISTRY.counter("db_rows_total", "Rows looked up or inserted by operation", ("operation",))
+
+# PRAGMAs of every connection to an SQLite file. WAL lets readers run while the writer thread commits,
+# synchronous=NORMAL syncs the WAL only at checkpoints, and the page cache and the memory-mapped I/O
+# keep the pages of the unique URL index in memory
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64 * 1024,   # 64 MiB, negative values are KiB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,   # Milliseconds a connection waits for a lock before it fails
+}
+
+# The engine of every database of the process, keyed by its URL
+_engines: Dict[str, Engine] = {}
+_engines_lock: threading.Lock = threading.Lock()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply SQLITE_PRAGMAS to a new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def get_engine(database_url: str = None) -> Engine:
+    """
+    Return the engine of a database, created on first use and shared by the whole process.
+
+    Every manager, cache, and store of one database shares the engine and its connection pool. SQLite
+    files get the SQLITE_PRAGMAS on every new connection. An in-memory SQLite database keeps a single
+    connection, so the writer thread and the other threads see the same database.
+
+    Args:
+        database_url (str, optional): The database URL. Defaults to the `DATABASE_URL_SQLITE` environment variable.
+
+    Returns:
+        Engine: The engine.
+    """
+    database_url = database_url or os.getenv("DATABASE_URL_SQLITE")
+    with _engines_lock:
+        engine: Optional[Engine] = _engines.get(database_url)
+        if engine is None:
+            url = make_url(database_url)
+            if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+                engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+            else:
+                engine = create_engine(url)
+                if url.get_backend_name() == "sqlite":
+                    event.listen(engine, "connect", _set_sqlite_pragmas)
+            _engines[database_url] = engine
+        return engine
+
+
 class DatabaseManagerSettings:
-    def __init__(self) -> None:
+    def __init__(self, database_url: str = None) -> None:
         """
         Initializes the DatabaseManagerSettings class.
 
-        This method creates an engine using the `create_engine` function from the `sqlalchemy` module, 
-        passing the database URL from the `DATABASE_URL_SQLITE` environment variable as an argument. 
-        It then creates a session using the `sessionmaker` function from the `sqlalchemy.orm` module, 
-        binding it to the engine. Finally, it creates a session using the `Session` class and assigns it 
-        to the `session` attribute of the class.
+        This method takes the engine of the database from `get_engine`, so all managers of one database
+        share a single engine and its connection pool. It then creates a session registry using the
+        `sessionmaker` function from the `sqlalchemy.orm` module, bound to the engine and scoped to the thread,
+        so the event loop, the writer thread and the scrape pipeline thread each use a session of their own
+        through the `session` property.
 
         Parameters:
-            None
+            database_url (str, optional): The database URL to connect to. Defaults to the
+                `DATABASE_URL_SQLITE` environment variable.
 
         Returns:
             None
         """
-        self.engine = create_engine(os.getenv("DATABASE_URL_SQLITE"))   # Create an engine
-        self.Session = sessionmaker(bind=self.engine)   # Create a session
-        self.session = self.Session()   # Create a session
+        self.engine = get_engine(database_url)   # Share the engine of the database
+        self.Session = scoped_session(sessionmaker(bind=self.engine))   # Create a session per thread
+
+    @property
+    def session(self) -> Session:
+        """The session of the calling thread, created on first use, since a session must not be shared by threads."""
+        return self.Session()
+
+    @property
+    def writer(self) -> DatabaseWriter:
+        """The writer thread of the database, shared by every manager of the database in the process."""
+        return get_writer(self.engine)
+
+    async def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking database call in the writer thread of the database, without blocking the event loop.
+
+        The call runs after every write queued before it, so it sees their results.
+
+        Args:
+            function (Callable[..., Any]): The blocking function, e.g. `create_indexes` or `close_connection`.
+            *args: The arguments of the function.
+
+        Returns:
+            Any: The result of the function.
+        """
+        return await asyncio.wrap_future(self.writer.call(function, *args))
 
     def create_table(self, table: Table):
         """
@@ -58,6 +201,35 @@ class DatabaseManagerSettings:
         # Create a table in the database using the provided Table object
         table.create(self.engine)
 
+    def create_indexes(self, Model: declarative_base) -> None:
+        """
+        Migrate an existing table to the indexes declared on the provided Model.
+
+        Tables created before the indexes were declared (e.g. old `sqlite.db` files) get the
+        missing indexes added. Before the unique index on `mp4_url` is created, duplicated URLs
+        are removed, keeping the row with the lowest id. The routine is idempotent.
+
+        Args:
+            Model (declarative_base): The SQLAlchemy model with the declared indexes.
+
+        Returns:
+            None
+        """
+        table: Table = Model.__table__
+
+        with self.engine.begin() as connection:
+            # Remove duplicated URLs that would violate the unique index
+            first_ids = select(func.min(table.c.id)).where(table.c.mp4_url.isnot(None)).group_by(table.c.mp4_url)
+            result = connection.execute(
+                delete(table).where(table.c.mp4_url.isnot(None), table.c.id.notin_(first_ids))
+            )
+            if result.rowcount:
+                logger.warning(f"Removed {result.rowcount} rows with duplicated mp4_url from {table.name}")
+
+            # Create the indexes that do not exist yet
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
     def insert_data(self, df: pd.DataFrame, Model: declarative_base):
         """
         Insert data into the database using the provided DataFrame and Model.
@@ -74,6 +246,127 @@ class DatabaseManagerSettings:
             obj = Model(**row.to_dict())    # Convert the row to a dictionary and pass it to the Model
             self.session.add(obj)   # Add the object to the session
         self.session.commit()   # Commit the changes to the database
+        self._update_seen_filter(df)
+
+    def bulk_insert_data(self, df: pd.DataFrame, Model: declarative_base, batch_size: int = BULK_INSERT_BATCH_SIZE,
+                         ignore_duplicates: bool = False) -> int:
+        """
+        Insert a whole DataFrame into the database with chunked Core `insert()` calls.
+
+        Unlike `insert_data`, no ORM object is built per row. The column values are sent to the
+        database in batches of `batch_size` rows with executemany, all inside a single transaction.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the data to be inserted.
+            Model (declarative_base): The SQLAlchemy model representing the table schema.
+            batch_size (int): The number of rows sent to the database in one executemany call.
+            ignore_duplicates (bool): Use `INSERT OR IGNORE`, so rows violating a unique constraint
+                (e.g. an already stored `mp4_url`) are skipped in the same statement.
+
+        Returns:
+            int: The number of inserted rows.
+
+        Raises:
+            ValueError: If `batch_size` is not a positive number.
+        """
+        if batch_size < 1:
+            raise ValueError("The parameter batch_size must be a positive number")
+
+        # Send the rows batch by batch in one transaction
+        statement, rows = self._insert_statement(df, Model, ignore_duplicates)
+        start_time: float = perf_counter()
+        with self.engine.begin() as connection:
+            inserted: int = self._execute_insert(connection, statement, rows, batch_size)
+        elapsed: float = perf_counter() - start_time
+        DB_QUERY_SECONDS.observe(elapsed, operation="bulk_insert")
+        DB_ROWS.inc(inserted, operation="bulk_insert")
+        self._update_seen_filter(df)
+
+        batch_log.info("bulk_insert", "Bulk inserted %d of %d rows in %.3f s (%.0f rows/s)", inserted, len(rows), elapsed, len(rows) / max(elapsed, 1e-9))
+        return inserted
+
+    def queue_bulk_insert(self, df: pd.DataFrame, Model: declarative_base, batch_size: int = BULK_INSERT_BATCH_SIZE,
+                          ignore_duplicates: bool = False) -> Future:
+        """
+        Queue the insert of a whole DataFrame on the writer thread, group committed with the other queued writes.
+
+        The rows are converted in the calling thread, the writer thread only executes the statements.
+        The URLs are added to the seen-URL filter right away: the filter only answers "maybe seen", so a
+        URL whose insert fails costs one more lookup in the database and is never lost.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the data to be inserted.
+            Model (declarative_base): The SQLAlchemy model representing the table schema.
+            batch_size (int): The number of rows sent to the database in one executemany call.
+            ignore_duplicates (bool): Use `INSERT OR IGNORE`, so rows violating a unique constraint are skipped.
+
+        Returns:
+            Future: Resolved with the number of inserted rows after the commit.
+
+        Raises:
+            ValueError: If `batch_size` is not a positive number.
+        """
+        if batch_size < 1:
+            raise ValueError("The parameter batch_size must be a positive number")
+        statement, rows = self._insert_statement(df, Model, ignore_duplicates)
+        self._update_seen_filter(df)
+
+        def job(connection: Connection) -> int:
+            with DB_QUERY_SECONDS.time(operation="bulk_insert"):
+                return self._execute_insert(connection, statement, rows, batch_size)
+
+        def committed(inserted: int) -> None:
+            DB_ROWS.inc(inserted, operation="bulk_insert")
+            batch_log.info("bulk_insert", "Group committed %d of %d rows", inserted, len(rows))
+
+        return self.writer.submit(job, on_commit=committed)
+
+    @staticmethod
+    def _insert_statement(df: pd.DataFrame, Model: declarative_base, ignore_duplicates: bool) -> Tuple[Any, List[Dict]]:
+        """
+        Build the insert statement of a DataFrame and its rows.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the data to be inserted.
+            Model (declarative_base): The SQLAlchemy model representing the table schema.
+            ignore_duplicates (bool): Use `INSERT OR IGNORE`.
+
+        Returns:
+            Tuple[Insert, List[Dict]]: The statement and one parameter dictionary per row, with NULL for missing values.
+        """
+        # Keep only the columns of the table and replace missing values with NULL
+        table: Table = Model.__table__
+        columns: list = [column for column in df.columns if column in table.c]
+        values: pd.DataFrame = df[columns].astype(object)
+        rows: list = [dict(zip(columns, row)) for row in values.where(values.notna(), None).to_numpy().tolist()]
+
+        # Build the insert statement, optionally skipping duplicates
+        statement = insert(table)
+        if ignore_duplicates:
+            statement = statement.prefix_with("OR IGNORE", dialect="sqlite")
+        return statement, rows
+
+    @staticmethod
+    def _execute_insert(connection: Connection, statement, rows: List[Dict], batch_size: int) -> int:
+        """Execute an insert statement for the rows in executemany batches and return the number of inserted rows."""
+        inserted: int = 0
+        for start in range(0, len(rows), batch_size):
+            inserted += connection.execute(statement, rows[start:start + batch_size]).rowcount
+        return inserted
+
+    def _update_seen_filter(self, df: pd.DataFrame) -> None:
+        """
+        Add the written URLs to the seen-URL filter of the database, if it is loaded in this process.
+
+        Args:
+            df (pd.DataFrame): The DataFrame with the written rows.
+
+        Returns:
+            None
+        """
+        seen_filter: SeenUrlFilter = SeenUrlFilter.loaded(self.engine.url.render_as_string(hide_password=False))
+        if seen_filter is not None and "mp4_url" in df.columns:
+            seen_filter.add(df["mp4_url"])
 
     def read_data(self, model, conditions=None):
         """
@@ -86,6 +379,8 @@ class DatabaseManagerSettings:
         Returns:
             pandas.DataFrame: The queried data as a DataFrame.
         """
+        import pandas as pd
+
         # Read data from the database using the provided Model and conditions
         query = self.session.query(model)
         
@@ -97,6 +392,36 @@ class DatabaseManagerSettings:
         data = pd.read_sql(query.statement, self.session.bind)
         return data
 
+    def read_existing_values(self, column, values: Iterable, chunk_size: int = SQLITE_MAX_VARIABLES) -> Set:
+        """
+        Return the subset of the given values that already exist in the provided column.
+
+        The lookup is done with chunked `IN (...)` queries, so a whole batch of values costs
+        one round-trip per `chunk_size` values instead of one query per value.
+
+        Parameters:
+            column (InstrumentedAttribute): The model column to look the values up in, e.g. `MotionsElements.mp4_url`.
+            values (Iterable): The values to look up. Null values are ignored, they never match in SQL.
+            chunk_size (int): The maximum number of values bound to a single query.
+
+        Returns:
+            set: The values that are already stored in the column.
+        """
+        import pandas as pd
+
+        # Drop nulls and duplicates, an `IN` clause never matches NULL anyway
+        unique_values: list = list({value for value in values if not pd.isna(value)})
+        existing: set = set()
+
+        # Look up the values chunk by chunk to stay under the bound parameter limit
+        with DB_QUERY_SECONDS.time(operation="read_existing"):
+            for start in range(0, len(unique_values), chunk_size):
+                chunk: list = unique_values[start:start + chunk_size]
+                result = self.session.execute(select(column).where(column.in_(chunk)))
+                existing.update(result.scalars())
+        DB_ROWS.inc(len(unique_values), operation="read_existing")
+        return existing
+
     def update_data(self, model, updates):
         """
         Updates data in the database using the provided Model and updates.
@@ -131,6 +456,9 @@ class DatabaseManagerSettings:
         Close the database connection.
 
         This method closes the session object, which releases any resources held by the session and closes the database connection.
+        The writes queued on the writer thread are committed first, and the seen-URL filter of the database is
+        saved next to it, if it is loaded and changed. It is called once at shutdown, the per-batch paths only
+        close the session with `close_session`.
 
         Parameters:
             self (DatabaseManagerSettings): The instance of the DatabaseManagerSettings class.
@@ -138,8 +466,28 @@ class DatabaseManagerSettings:
         Returns:
             None
         """
+        # Wait for the queued writes of the database
+        flush_writer(self.engine)
+
+        # Save the seen-URL filter of the database
+        seen_filter: SeenUrlFilter = SeenUrlFilter.loaded(self.engine.url.render_as_string(hide_password=False))
+        if seen_filter is not None:
+            seen_filter.save()
+
         # Close the database connection
-        self.session.close()
+        self.close_session()
+
+    def close_session(self) -> None:
+        """
+        Close the session of the calling thread, releasing its database connection.
+
+        Unlike `close_connection`, the queued writes are not waited for and the seen-URL filter is not saved,
+        so the session can be closed cheaply, e.g. once at the end of a scrape pipeline.
+
+        Returns:
+            None
+        """
+        self.Session.remove()
 
 
 # db_manager_settings = DatabaseManagerSettings()
@@ -0,0 +1,147 @@
+from concurrent.futures import Future
+from typing import List, Optional
+from time import time
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.sqlite import insert
+from database.models import DatabaseManagerSettings, ProxyHealthRecord
+
+
+class ProxyHealthCache:
+    def __init__(self, db_manager_settings: DatabaseManagerSettings, ttl: float) -> None:
+        """
+        Initializes the cache of proxy validation results stored in the `proxy_health` table.
+
+        Validation results are buffered with `record` and queued on the writer thread of the database
+        by `flush`, which group commits them with the other writes of the database.
+        A proxy is fresh if its last validation succeeded less than `ttl` seconds ago, so it can be
+        used right away without testing it again.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database holding the table.
+            ttl (float): The number of seconds a successful validation stays valid.
+
+        Returns:
+            None
+        """
+        self.db_manager_settings: DatabaseManagerSettings = db_manager_settings
+        self.ttl: float = ttl
+        self._results: List[tuple] = []
+        self.revalidation: Optional[asyncio.Task] = None   # Background re-test of stale proxies
+        ProxyHealthRecord.__table__.create(self.db_manager_settings.engine, checkfirst=True)
+
+    def record(self, proxy: str, working: bool, latency: Optional[float]) -> None:
+        """
+        Buffer the result of one proxy validation.
+
+        Args:
+            proxy (str): The tested proxy.
+            working (bool): Whether the proxy passed the validation.
+            latency (float or None): The number of seconds the validation took.
+
+        Returns:
+            None
+        """
+        self._results.append((proxy, working, latency, time()))
+
+    def flush(self) -> int:
+        """
+        Write the buffered validation results to the database and wait for their commit.
+
+        Returns:
+            int: The number of written results.
+        """
+        return self._queue_flush().result()
+
+    async def flush_async(self) -> int:
+        """
+        Write the buffered validation results to the database without blocking the event loop.
+
+        Returns:
+            int: The number of written results.
+        """
+        return await asyncio.wrap_future(self._queue_flush())
+
+    def _queue_flush(self) -> Future:
+        """Queue the write of the buffered validation results on the writer thread and return its future."""
+        results, self._results = self._results, []
+        if not results:
+            done: Future = Future()
+            done.set_result(0)
+            return done
+        return self.db_manager_settings.writer.submit(lambda connection: self._write_results(connection, results))
+
+    @staticmethod
+    def _write_results(connection: Connection, results: List[tuple]) -> int:
+        """Upsert validation results with the connection of a transaction and return their number."""
+        table = ProxyHealthRecord.__table__
+        for proxy, working, latency, checked_at in results:
+            statement = insert(table).values(
+                proxy=proxy,
+                last_success=checked_at if working else None,
+                last_checked=checked_at,
+                latency=latency if working else None,
+                failure_streak=0 if working else 1,
+            )
+            # A success resets the failure streak, a failure keeps the last success
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.proxy],
+                set_={
+                    "last_checked": statement.excluded.last_checked,
+                    "last_success": statement.excluded.last_success if working else table.c.last_success,
+                    "latency": statement.excluded.latency if working else table.c.latency,
+                    "failure_streak": 0 if working else table.c.failure_streak + 1,
+                },
+            )
+            connection.execute(statement)
+        return len(results)
+
+    def fresh_proxies(self) -> List[str]:
+        """
+        Return the proxies whose last validation succeeded within the TTL, fastest first.
+
+        Returns:
+            List[str]: The fresh proxies.
+        """
+        statement = (
+            select(ProxyHealthRecord.proxy)
+            .where(ProxyHealthRecord.failure_streak == 0, ProxyHealthRecord.last_success >= time() - self.ttl)
+            .order_by(ProxyHealthRecord.latency)
+        )
+        with self.db_manager_settings.engine.connect() as connection:
+            return list(connection.execute(statement).scalars())
+
+    def stale_proxies(self, max_failure_streak: int = 3) -> List[str]:
+        """
+        Return the proxies that once worked but whose validation expired or recently failed.
+
+        Args:
+            max_failure_streak (int): Proxies that failed more often in a row are given up.
+
+        Returns:
+            List[str]: The stale proxies, most recently successful first.
+        """
+        statement = (
+            select(ProxyHealthRecord.proxy)
+            .where(
+                ProxyHealthRecord.last_success.isnot(None),
+                ProxyHealthRecord.failure_streak < max_failure_streak,
+                (ProxyHealthRecord.last_success < time() - self.ttl) | (ProxyHealthRecord.failure_streak > 0),
+            )
+            .order_by(ProxyHealthRecord.last_success.desc())
+        )
+        with self.db_manager_settings.engine.connect() as connection:
+            return list(connection.execute(statement).scalars())
+
+    async def stop_revalidation(self) -> None:
+        """
+        Cancel the background re-test of stale proxies, if it is still running, and write its results.
+
+        Returns:
+            None
+        """
+        if self.revalidation is not None and not self.revalidation.done():
+            self.revalidation.cancel()
+            await asyncio.gather(self.revalidation, return_exceptions=True)
+        await self.flush_async()
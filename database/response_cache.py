@@ -0,0 +1,233 @@
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional
+from time import time
+import asyncio
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.sqlite import insert
+from database.models import DatabaseManagerSettings, HttpCacheEntry
+
+
+class CachedResponse(NamedTuple):
+    """A cached response body with its validators."""
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+# Number of buffered body bytes after which the buffered writes are flushed
+FLUSH_BYTES: int = 4 * 1024 * 1024
+
+
+class ResponseCache:
+    def __init__(self, db_manager_settings: DatabaseManagerSettings, max_bytes: int, ttl: float) -> None:
+        """
+        Initializes the on-disk cache of HTTP responses stored in the `http_cache` table.
+
+        A response is fresh for `ttl` seconds after it was downloaded or revalidated and is then used
+        without a request. A stale response is revalidated with a conditional request carrying its
+        ETag and Last-Modified validators, and its body is reused if the server answers 304.
+
+        New bodies and access times are buffered and queued on the writer thread of the database by
+        `flush`, which writes them in one transaction. After every flush the least recently used
+        responses are evicted until the bodies take at most `max_bytes` bytes. Lookups of responses
+        that are not buffered run in the writer thread too, after the writes queued before them, so
+        the event loop never waits for SQLite.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database holding the table.
+            max_bytes (int): The maximum total size of the cached bodies.
+            ttl (float): The number of seconds a response is used without revalidation.
+
+        Returns:
+            None
+        """
+        self.db_manager_settings: DatabaseManagerSettings = db_manager_settings
+        self.max_bytes: int = max_bytes
+        self.ttl: float = ttl
+        self.hits: int = 0   # Number of fresh responses used without a request
+        self.revalidated: int = 0   # Number of stale responses confirmed with a 304
+        self.misses: int = 0   # Number of responses not in the cache
+        self._stored: Dict[str, dict] = {}
+        self._stored_bytes: int = 0
+        self._accessed: Dict[str, float] = {}
+        self._revalidated: Dict[str, float] = {}
+        self._writes: List[Future] = []   # Queued flushes, not committed yet
+        HttpCacheEntry.__table__.create(self.db_manager_settings.engine, checkfirst=True)
+
+    async def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Return the cached response of a URL and mark it as used, reading it in the writer thread if it is not buffered.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            CachedResponse or None: The cached response, or None if the URL is not cached.
+        """
+        if url in self._stored:
+            entry: dict = self._stored[url]
+            entry['accessed_at'] = time()
+            return CachedResponse(entry['body'], entry['etag'], entry['last_modified'], entry['stored_at'])
+
+        row = await self.db_manager_settings.run(self._select_entry, url)
+        if row is None:
+            self.misses += 1
+            return None
+
+        # A revalidation not written yet restarts the TTL
+        self._accessed[url] = time()
+        return CachedResponse(*row)._replace(stored_at=self._revalidated.get(url, row.stored_at))
+
+    def _select_entry(self, url: str):
+        """Select the body and the validators of a cached URL, in the writer thread."""
+        statement = select(HttpCacheEntry.body, HttpCacheEntry.etag, HttpCacheEntry.last_modified, HttpCacheEntry.stored_at).where(HttpCacheEntry.url == url)
+        with self.db_manager_settings.engine.connect() as connection:
+            return connection.execute(statement).first()
+
+    def is_fresh(self, cached: CachedResponse) -> bool:
+        """
+        Return whether a cached response can be used without revalidation.
+
+        Args:
+            cached (CachedResponse): The cached response.
+
+        Returns:
+            bool: True if the response is younger than the TTL.
+        """
+        return time() - cached.stored_at < self.ttl
+
+    def conditional_headers(self, cached: Optional[CachedResponse]) -> Dict[str, str]:
+        """
+        Return the headers revalidating a cached response.
+
+        Args:
+            cached (CachedResponse or None): The cached response.
+
+        Returns:
+            Dict[str, str]: The `If-None-Match` and `If-Modified-Since` headers of the response's validators.
+        """
+        headers: Dict[str, str] = {}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+        return headers
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """
+        Buffer a downloaded response. Responses without validators are cached for the TTL only.
+
+        Args:
+            url (str): The requested URL.
+            body (bytes): The response body.
+            etag (str or None): The ETag header of the response.
+            last_modified (str or None): The Last-Modified header of the response.
+
+        Returns:
+            None
+        """
+        now: float = time()
+        previous: Optional[dict] = self._stored.get(url)
+        self._stored_bytes += len(body) - (previous['size'] if previous else 0)
+        self._stored[url] = {
+            'url': url, 'body': body, 'etag': etag, 'last_modified': last_modified,
+            'size': len(body), 'stored_at': now, 'accessed_at': now,
+        }
+        if self._stored_bytes >= FLUSH_BYTES:
+            self._queue_flush()
+
+    def touch(self, cached: CachedResponse, url: str) -> None:
+        """
+        Mark a cached response as confirmed by a 304, so it is fresh for another TTL.
+
+        Args:
+            cached (CachedResponse): The revalidated response.
+            url (str): The requested URL.
+
+        Returns:
+            None
+        """
+        self.revalidated += 1
+        if url in self._stored:
+            self._stored[url]['stored_at'] = time()
+        else:
+            self._revalidated[url] = time()
+
+    def flush(self) -> int:
+        """
+        Write the buffered responses, access times, and revalidations, then evict the least recently used responses.
+        The writes are queued on the writer thread and waited for, so this must not be called in the writer thread.
+
+        Returns:
+            int: The number of responses evicted by the flushes not waited for yet.
+        """
+        self._queue_flush()
+        writes, self._writes = self._writes, []
+        return sum(write.result() for write in writes)
+
+    async def flush_async(self) -> int:
+        """
+        Write the buffered responses, access times, and revalidations without blocking the event loop.
+
+        Returns:
+            int: The number of responses evicted by the flushes not waited for yet.
+        """
+        self._queue_flush()
+        writes, self._writes = self._writes, []
+        return sum(await asyncio.gather(*(asyncio.wrap_future(write) for write in writes)))
+
+    def _queue_flush(self) -> None:
+        """Queue the write of the buffered responses, access times, and revalidations on the writer thread."""
+        stored: List[dict] = list(self._stored.values())
+        accessed: Dict[str, float] = {url: accessed_at for url, accessed_at in self._accessed.items() if url not in self._stored}
+        revalidated: Dict[str, float] = {url: stored_at for url, stored_at in self._revalidated.items() if url not in self._stored}
+        self._stored, self._stored_bytes, self._accessed, self._revalidated = {}, 0, {}, {}
+        if stored or accessed or revalidated:
+            self._writes.append(self.db_manager_settings.writer.submit(lambda connection: self._write(connection, stored, accessed, revalidated)))
+
+    def _write(self, connection: Connection, stored: List[dict], accessed: Dict[str, float], revalidated: Dict[str, float]) -> int:
+        """Write buffered entries with the connection of a transaction, evict over the size limit, and return the number of evictions."""
+        table = HttpCacheEntry.__table__
+        evicted: int = 0
+        if stored:
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.url],
+                set_={column: statement.excluded[column] for column in ('body', 'etag', 'last_modified', 'size', 'stored_at', 'accessed_at')},
+            )
+            connection.execute(statement, stored)
+        if accessed:
+            connection.execute(
+                update(table).where(table.c.url == bindparam('cached_url')).values(accessed_at=bindparam('accessed')),
+                [{'cached_url': url, 'accessed': accessed_at} for url, accessed_at in accessed.items()],
+            )
+        if revalidated:
+            connection.execute(
+                update(table).where(table.c.url == bindparam('cached_url')).values(stored_at=bindparam('revalidated')),
+                [{'cached_url': url, 'revalidated': stored_at} for url, stored_at in revalidated.items()],
+            )
+
+        # Evict the least recently used responses over the size limit
+        total: int = connection.execute(select(func.coalesce(func.sum(table.c.size), 0))).scalar()
+        if total > self.max_bytes:
+            urls: List[str] = []
+            for url, size in connection.execute(select(table.c.url, table.c.size).order_by(table.c.accessed_at)):
+                if total <= self.max_bytes:
+                    break
+                urls.append(url)
+                total -= size
+            for start in range(0, len(urls), 500):
+                connection.execute(delete(table).where(table.c.url.in_(urls[start:start + 500])))
+            evicted = len(urls)
+        return evicted
+
+    def close(self) -> None:
+        """
+        Write the buffered responses.
+
+        Returns:
+            None
+        """
+        self.flush()
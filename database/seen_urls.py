@@ -0,0 +1,263 @@
+from __future__ import annotations
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+import numpy as np
+from sqlalchemy import select, func
+
+# pandas is imported on first use, it is the largest part of the start-up time
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Version of the persisted file format and of the URL hash function
+SEEN_FILTER_VERSION: int = 1
+
+# Number of pending hashes kept outside the sorted array before they are merged into it
+PENDING_MERGE_SIZE: int = 65536
+
+
+class SeenUrlFilter:
+    """
+    In-memory prefilter of URLs that are already stored in the database.
+
+    The filter keeps a sorted array of 64-bit URL hashes. A URL whose hash is not in the array is
+    definitely new and does not need a database lookup. A URL whose hash is in the array was maybe
+    seen and has to be confirmed against the database, as two URLs can share a hash.
+
+    The array is saved next to the SQLite file together with the highest row id it covers, so the
+    next start only loads the rows inserted since then instead of rebuilding it from scratch.
+
+    The filter is shared by threads: inserts add URLs in the writer thread while the event loop and
+    the pipeline thread look URLs up, so the array and the pending hashes are only used under a lock.
+    """
+
+    # Filters already loaded in this process, keyed by database URL
+    _loaded: Dict[str, "SeenUrlFilter"] = {}
+
+    def __init__(self, path: str = None) -> None:
+        """
+        Initializes an empty filter.
+
+        Args:
+            path (str, optional): The file the filter is saved to. If None, the filter is not persisted.
+
+        Returns:
+            None
+        """
+        self.path: Optional[str] = path
+        self.max_id: int = 0
+        self.dirty: bool = False
+        self._hashes: np.ndarray = np.empty(0, dtype=np.uint64)
+        self._pending: set = set()
+        self._lock: threading.Lock = threading.Lock()   # Guards `_hashes` and `_pending`
+
+    def __len__(self) -> int:
+        return len(self._hashes) + len(self._pending)
+
+    @staticmethod
+    def hash_urls(urls: Iterable) -> np.ndarray:
+        """
+        Hash URLs to 64-bit integers with the vectorized pandas hash.
+
+        Args:
+            urls (Iterable): The URLs to hash.
+
+        Returns:
+            np.ndarray: The uint64 hashes in the order of the URLs.
+        """
+        import pandas as pd
+        return pd.util.hash_array(np.asarray(list(urls), dtype=object))
+
+    @staticmethod
+    def default_path(database_url: str) -> Optional[str]:
+        """
+        Return the file next to a SQLite database where its filter is saved.
+
+        Args:
+            database_url (str): The SQLAlchemy database URL.
+
+        Returns:
+            str or None: The path of the filter file, or None for in-memory and non-SQLite databases.
+        """
+        prefix: str = "sqlite:///"
+        if not database_url.startswith(prefix) or database_url[len(prefix):] in ("", ":memory:"):
+            return None
+        return database_url[len(prefix):] + ".seen.npz"
+
+    @classmethod
+    def for_database(cls, db_manager_settings, Model) -> "SeenUrlFilter":
+        """
+        Return the filter of the database, loading it once per process.
+
+        The filter is read from its file next to the database if there is one and then brought up
+        to date with the rows inserted since it was saved.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database to load the URLs from.
+            Model (declarative_base): The SQLAlchemy model with the `id` and `mp4_url` columns.
+
+        Returns:
+            SeenUrlFilter: The loaded filter.
+        """
+        database_url: str = db_manager_settings.engine.url.render_as_string(hide_password=False)
+        if database_url not in cls._loaded:
+            seen_filter: SeenUrlFilter = cls.load(cls.default_path(database_url))
+            seen_filter.refresh(db_manager_settings, Model)
+            cls._loaded[database_url] = seen_filter
+        return cls._loaded[database_url]
+
+    @classmethod
+    def loaded(cls, database_url: str) -> Optional["SeenUrlFilter"]:
+        """
+        Return the filter of the database if it was already loaded in this process.
+
+        Args:
+            database_url (str): The SQLAlchemy database URL.
+
+        Returns:
+            SeenUrlFilter or None: The loaded filter, or None.
+        """
+        return cls._loaded.get(database_url)
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "SeenUrlFilter":
+        """
+        Load a filter from a file, or return an empty one if the file is missing or outdated.
+
+        Args:
+            path (str or None): The file to load the filter from.
+
+        Returns:
+            SeenUrlFilter: The loaded filter.
+        """
+        seen_filter: SeenUrlFilter = cls(path)
+        if path is None or not os.path.exists(path):
+            return seen_filter
+
+        with np.load(path) as data:
+            if int(data["version"]) != SEEN_FILTER_VERSION:
+                return seen_filter
+            seen_filter._hashes = data["hashes"]
+            seen_filter.max_id = int(data["max_id"])
+        return seen_filter
+
+    def refresh(self, db_manager_settings, Model) -> int:
+        """
+        Add the URLs of the rows inserted after the highest row id known to the filter.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database to load the URLs from.
+            Model (declarative_base): The SQLAlchemy model with the `id` and `mp4_url` columns.
+
+        Returns:
+            int: The number of loaded rows.
+        """
+        # Start over if the database has fewer rows than the filter covers, e.g. it was replaced
+        max_id: int = db_manager_settings.session.execute(select(func.max(Model.id))).scalar() or 0
+        if max_id < self.max_id:
+            with self._lock:
+                self._hashes = np.empty(0, dtype=np.uint64)
+                self._pending.clear()
+            self.max_id = 0
+
+        # Read only the rows the filter does not cover yet
+        rows: list = db_manager_settings.session.execute(
+            select(Model.mp4_url).where(Model.id > self.max_id, Model.id <= max_id, Model.mp4_url.isnot(None))
+        ).scalars().all()
+
+        if rows:
+            hashes: np.ndarray = self.hash_urls(rows)
+            with self._lock:
+                self._merge(hashes)
+        if max_id != self.max_id:
+            self.max_id = max_id
+            self.dirty = True
+        return len(rows)
+
+    def add(self, urls: Iterable) -> None:
+        """
+        Add URLs written to the database to the filter.
+
+        Args:
+            urls (Iterable): The stored URLs. Null values are ignored.
+
+        Returns:
+            None
+        """
+        import pandas as pd
+        urls: pd.Series = pd.Series(urls, dtype=object).dropna()
+        if urls.empty:
+            return
+        hashes: list = self.hash_urls(urls).tolist()
+        with self._lock:
+            self._pending.update(hashes)
+            self.dirty = True
+            if len(self._pending) >= PENDING_MERGE_SIZE:
+                self._merge_pending()
+
+    def maybe_seen(self, urls: Iterable) -> np.ndarray:
+        """
+        Return which URLs may already be in the database.
+
+        Args:
+            urls (Iterable): The URLs to check.
+
+        Returns:
+            np.ndarray: A boolean mask, False means the URL is definitely new. Null URLs are always new.
+        """
+        import pandas as pd
+        urls: pd.Series = pd.Series(urls, dtype=object)
+        mask: np.ndarray = np.zeros(len(urls), dtype=bool)
+        not_null: np.ndarray = urls.notna().to_numpy()
+        if not not_null.any():
+            return mask
+
+        hashes: np.ndarray = self.hash_urls(urls[not_null])
+        found: np.ndarray = np.zeros(len(hashes), dtype=bool)
+
+        # A merge in another thread moves the pending hashes into the array, so both are read together
+        with self._lock:
+            # Binary search the hashes in the sorted array
+            if len(self._hashes):
+                positions: np.ndarray = np.searchsorted(self._hashes, hashes)
+                positions[positions == len(self._hashes)] = 0
+                found = self._hashes[positions] == hashes
+
+            # Check the hashes added since the last merge
+            if self._pending:
+                found |= np.fromiter((value in self._pending for value in hashes.tolist()), dtype=bool, count=len(hashes))
+
+        mask[not_null] = found
+        return mask
+
+    def save(self) -> None:
+        """
+        Save the filter atomically to its file if it changed since it was loaded.
+
+        Returns:
+            None
+        """
+        if self.path is None or not self.dirty:
+            return
+        with self._lock:
+            if self._pending:
+                self._merge_pending()
+            hashes: np.ndarray = self._hashes
+
+        # Write to a temporary file first, so a crash never leaves a half written filter
+        tmp_path: str = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, hashes=hashes, max_id=self.max_id, version=SEEN_FILTER_VERSION)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _merge(self, hashes: np.ndarray) -> None:
+        """Merge hashes into the sorted array, with the lock held."""
+        self._hashes = np.union1d(self._hashes, hashes)
+        self.dirty = True
+
+    def _merge_pending(self) -> None:
+        """Merge the pending hashes into the sorted array, with the lock held."""
+        self._merge(np.fromiter(self._pending, dtype=np.uint64, count=len(self._pending)))
+        self._pending.clear()
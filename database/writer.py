@@ -0,0 +1,266 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import atexit
+import logging
+import os
+import queue
+import threading
+from time import perf_counter
+from dotenv import load_dotenv
+from sqlalchemy.engine import Connection, Engine
+from logs import logger
+from metrics import REGISTRY
+
+
+# Load environment variables
+load_dotenv()
+
+# Load logger settings from .env file
+LOG_DIR_DATABASE = os.getenv('LOG_DIR_DATABASE')
+
+# Create logger object
+logger = logger.get_logger(log_file=LOG_DIR_DATABASE, log_level=logging.INFO)
+
+# Maximum number of queued write jobs merged into one transaction
+GROUP_COMMIT_MAX_JOBS: int = 256
+
+# Metrics of the writer threads, the number of jobs per commit is their ratio
+DB_COMMITS = REGISTRY.counter("db_commits_total", "Transactions committed by the database writer threads")
+DB_WRITE_JOBS = REGISTRY.counter("db_write_jobs_total", "Jobs run by the database writer threads by kind", ("kind",))
+DB_COMMIT_SECONDS = REGISTRY.histogram("db_commit_seconds", "Duration of one group-committed transaction of the writer threads")
+
+# Queued by `close` to stop the writer thread
+_CLOSE: object = object()
+
+# A queued job: the function run with the connection of the transaction, its callback after the commit, and its future
+_Job = Tuple[Callable[[Connection], Any], Optional[Callable[[Any], None]], Future]
+
+
+class DatabaseWriter:
+    """
+    The dedicated thread doing the database work of one engine.
+
+    Jobs are queued from any thread, including the event loop, and run in the writer thread in order.
+    Write jobs waiting in the queue together are run in one transaction with one commit (group commit),
+    so the writes of many producers, e.g. the micro-batches of the scrape pipeline and the proxy
+    validation results, share the cost of a commit. If a group fails, its jobs are retried one
+    transaction each, so one failed job never fails the others.
+    """
+
+    def __init__(self, engine: Engine, max_jobs: int = GROUP_COMMIT_MAX_JOBS) -> None:
+        """
+        Initializes the writer and starts its thread.
+
+        Args:
+            engine (Engine): The engine of the database.
+            max_jobs (int): The maximum number of write jobs merged into one transaction.
+
+        Returns:
+            None
+        """
+        self.engine: Engine = engine
+        self.max_jobs: int = max_jobs
+        self.commits: int = 0   # Number of committed transactions
+        self.jobs: int = 0   # Number of committed write jobs
+        self._queue: queue.Queue = queue.Queue()
+        self._closed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, name=f"db-writer-{engine.url.database}", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[Connection], Any], on_commit: Callable[[Any], None] = None) -> Future:
+        """
+        Queue a write job, group committed with the other write jobs waiting in the queue.
+
+        Args:
+            job (Callable[[Connection], Any]): The function run with the connection of the transaction.
+            on_commit (Callable[[Any], None], optional): Called in the writer thread with the result of the job after the commit.
+
+        Returns:
+            Future: Resolved with the result of the job after the commit, or with its error.
+
+        Raises:
+            RuntimeError: If the writer is closed.
+        """
+        return self._put(job, on_commit)
+
+    def call(self, function: Callable[..., Any], *args: Any) -> Future:
+        """
+        Queue a blocking call, e.g. a read or a migration, run in the writer thread outside of any group.
+
+        Args:
+            function (Callable[..., Any]): The function.
+            *args: The arguments of the function.
+
+        Returns:
+            Future: Resolved with the result of the function, or with its error.
+
+        Raises:
+            RuntimeError: If the writer is closed.
+        """
+        return self._put(lambda: function(*args), None, group=False)
+
+    def _put(self, job: Callable, on_commit: Optional[Callable[[Any], None]], group: bool = True) -> Future:
+        """Queue a write job, or a blocking call if `group` is False, and return its future."""
+        if self._closed:
+            raise RuntimeError("The database writer is closed")
+        future: Future = Future()
+        self._queue.put((job, on_commit, future) if group else (None, job, future))
+        return future
+
+    def flush(self) -> None:
+        """
+        Wait until every queued job is done. In the writer thread itself the jobs queued before are already done.
+
+        Returns:
+            None
+        """
+        if not self._closed and threading.current_thread() is not self._thread:
+            self.call(lambda: None).result()
+
+    def close(self) -> None:
+        """
+        Run the queued jobs and stop the writer thread.
+
+        Returns:
+            None
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+    def _run(self) -> None:
+        """Run the queued jobs, merging the waiting write jobs into groups, until `close` is called."""
+        pending: Optional[tuple] = None
+        while True:
+            item: tuple = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is _CLOSE:
+                return
+            if item[0] is None:
+                self._run_call(item)
+                continue
+
+            # Take the write jobs already waiting, up to the next blocking call or the group limit
+            group: List[_Job] = [item]
+            while len(group) < self.max_jobs:
+                try:
+                    waiting: tuple = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if waiting is _CLOSE or waiting[0] is None:
+                    pending = waiting
+                    break
+                group.append(waiting)
+            self._commit(group)
+
+    @staticmethod
+    def _run_call(item: tuple) -> None:
+        """Run a blocking call of `call` and resolve its future."""
+        _, function, future = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function())
+        except Exception as e:
+            future.set_exception(e)
+        DB_WRITE_JOBS.inc(kind="call")
+
+    def _commit(self, group: List[_Job]) -> None:
+        """Run a group of write jobs in one transaction, or one transaction each if the group fails."""
+        group = [job for job in group if job[2].set_running_or_notify_cancel()]
+        if not group:
+            return
+        try:
+            start_time: float = perf_counter()
+            with self.engine.begin() as connection:
+                results: List[Any] = [job(connection) for job, _, _ in group]
+            DB_COMMIT_SECONDS.observe(perf_counter() - start_time)
+        except Exception as e:
+            if len(group) == 1:
+                group[0][2].set_exception(e)
+                return
+            logger.warning(f"Group commit of {len(group)} jobs failed, committing them one by one: {e!r}")
+            for job in group:
+                self._commit_one(job)
+            return
+        self._committed(group, results)
+
+    def _commit_one(self, job: _Job) -> None:
+        """Run one write job in its own transaction."""
+        try:
+            with self.engine.begin() as connection:
+                result: Any = job[0](connection)
+        except Exception as e:
+            job[2].set_exception(e)
+            return
+        self._committed([job], [result])
+
+    def _committed(self, group: List[_Job], results: List[Any]) -> None:
+        """Count a committed transaction, run the callbacks of its jobs, and resolve their futures."""
+        self.commits += 1
+        self.jobs += len(group)
+        DB_COMMITS.inc()
+        DB_WRITE_JOBS.inc(len(group), kind="write")
+        for (_, on_commit, future), result in zip(group, results):
+            try:
+                if on_commit is not None:
+                    on_commit(result)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+
+
+# The writer of every database of the process, keyed by its URL
+_writers: Dict[str, DatabaseWriter] = {}
+_writers_lock: threading.Lock = threading.Lock()
+
+
+def get_writer(engine: Engine) -> DatabaseWriter:
+    """
+    Return the writer of the engine's database, started on first use and shared by the whole process.
+
+    Args:
+        engine (Engine): The engine of the database.
+
+    Returns:
+        DatabaseWriter: The writer.
+    """
+    key: str = engine.url.render_as_string(hide_password=False)
+    with _writers_lock:
+        writer: Optional[DatabaseWriter] = _writers.get(key)
+        if writer is None or writer._closed:
+            writer = _writers[key] = DatabaseWriter(engine)
+        return writer
+
+
+def flush_writer(engine: Engine) -> None:
+    """
+    Wait until the queued jobs of the engine's database are done, if its writer was started.
+
+    Args:
+        engine (Engine): The engine of the database.
+
+    Returns:
+        None
+    """
+    writer: Optional[DatabaseWriter] = _writers.get(engine.url.render_as_string(hide_password=False))
+    if writer is not None:
+        writer.flush()
+
+
+def close_writers() -> None:
+    """
+    Run the queued jobs of every writer and stop their threads.
+
+    Returns:
+        None
+    """
+    with _writers_lock:
+        writers: List[DatabaseWriter] = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_writers)
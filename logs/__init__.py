@@ -1,4 +1,4 @@
-from .logger import get_logger
+from .logger import LogSampler, flush, get_logger, shutdown
 
 
-__all__ = ["get_logger"]
\ No newline at end of file
+__all__ = ["LogSampler", "flush", "get_logger", "shutdown"]
\ No newline at end of file
@@ -1,23 +1,247 @@
+import atexit
+import json
 import logging
-from rich import print
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import weakref
+from time import monotonic
+from typing import Dict, Optional
 
 
-def get_logger(log_file, log_level):
+# Size in bytes at which a log file is rotated, and the number of rotated files kept
+LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+# Format of the log files, "text" or "json" for one compact JSON object per line
+LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+
+# Per-item messages of every sampler: the first SAMPLE_BURST of every SAMPLE_INTERVAL seconds are logged
+SAMPLE_INTERVAL: float = 10.0
+SAMPLE_BURST: int = 5
+
+TEXT_FORMAT: str = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats a record as one compact JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": os.path.basename(record.name),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+
+
+class _StderrHandler(logging.StreamHandler):
+    """Writes to the current sys.stderr, which may be replaced after the handler is created."""
+
+    def __init__(self) -> None:
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+class _FileRouter(logging.Handler):
+    """Hands every record to the rotating file handler of its logger, in the writer thread."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.file_handlers: Dict[str, logging.Handler] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        file_handler: Optional[logging.Handler] = self.file_handlers.get(record.name)
+        if file_handler is not None:
+            file_handler.handle(record)
+
+    def close(self) -> None:
+        for file_handler in self.file_handlers.values():
+            file_handler.close()
+        super().close()
+
+
+# The queue of the process, its writer thread, and the handler every logger puts its records on
+_log_queue: queue.Queue = queue.Queue()
+_router: _FileRouter = _FileRouter()
+_queue_handler: logging.handlers.QueueHandler = logging.handlers.QueueHandler(_log_queue)
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock: threading.Lock = threading.Lock()
+
+
+def _start_listener() -> None:
+    """Start the writer thread of the log queue, once per process."""
+    global _listener
+    if _listener is None:
+        stream_handler: logging.Handler = _StderrHandler()
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        _listener = logging.handlers.QueueListener(_log_queue, _router, stream_handler)
+        _listener.start()
+
+
+def get_logger(log_file, log_level, json_lines: bool = None, max_bytes: int = None, backup_count: int = None):
+    """
+    Return the logger of a log file, writing its messages through the background writer thread.
+
+    A record is only put on a queue by the calling thread, the writer thread formats it and writes it to
+    the rotating log file and the terminal, so a hot loop never waits for the disk or the terminal.
+    Calling the function again for the same file returns the same logger without adding handlers.
+
+    Args:
+        log_file (str): The path of the log file, also the name of the logger.
+        log_level (int): The level of the logger.
+        json_lines (bool, optional): Whether to write the file as JSON lines. Defaults to the LOG_FORMAT environment variable.
+        max_bytes (int, optional): The size in bytes at which the file is rotated. Defaults to LOG_MAX_BYTES.
+        backup_count (int, optional): The number of rotated files kept. Defaults to LOG_BACKUP_COUNT.
+
+    Returns:
+        logging.Logger: The logger.
+    """
     # Create logger object
     logger = logging.getLogger(log_file)
     logger.setLevel(log_level)
 
-    # Set formatter for log messages
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    with _lock:
+        if log_file not in _router.file_handlers:
+            # Set up the rotating file handler, the file is opened on the first message instead of at import
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=LOG_MAX_BYTES if max_bytes is None else max_bytes,
+                backupCount=LOG_BACKUP_COUNT if backup_count is None else backup_count,
+                encoding="utf-8",
+                delay=True,
+            )
+            use_json: bool = LOG_FORMAT == "json" if json_lines is None else json_lines
+            file_handler.setFormatter(JsonLinesFormatter() if use_json else logging.Formatter(TEXT_FORMAT))
+            _router.file_handlers[log_file] = file_handler
+
+        # Put the records on the queue of the writer thread, once per logger
+        if _queue_handler not in logger.handlers:
+            logger.addHandler(_queue_handler)
+        _start_listener()
+
+    return logger
+
+
+def flush() -> None:
+    """
+    Wait until the writer thread has written every queued record.
+
+    Returns:
+        None
+    """
+    if _listener is not None:
+        _log_queue.join()
+
+
+class LogSampler:
+    """
+    Rate limit of per-item messages, replaced by periodic aggregated summaries.
+
+    Messages are grouped by a key. Of every `interval` seconds, the first `burst` messages of a key are
+    logged, the others are only counted and reported in one summary line when the interval ends.
+    Suppressed messages are never formatted.
+    """
+
+    # Samplers of the process, flushed at exit
+    _samplers: "weakref.WeakSet[LogSampler]" = weakref.WeakSet()
+
+    def __init__(self, logger: logging.Logger, interval: float = SAMPLE_INTERVAL, burst: int = SAMPLE_BURST) -> None:
+        """
+        Initializes the sampler of a logger.
+
+        Args:
+            logger (logging.Logger): The logger the messages and summaries are written to.
+            interval (float): The length of a sampling interval in seconds.
+            burst (int): The number of messages of a key logged per interval.
+
+        Returns:
+            None
+        """
+        self.logger: logging.Logger = logger
+        self.interval: float = interval
+        self.burst: int = burst
+        self._counts: Dict[str, int] = {}
+        self._started: float = monotonic()
+        self._lock: threading.Lock = threading.Lock()
+        LogSampler._samplers.add(self)
+
+    def log(self, key: str, level: int, message: str, *args) -> None:
+        """
+        Log a per-item message unless its key already used up the burst of the interval.
+
+        Args:
+            key (str): The kind of the message, e.g. "request_ok".
+            level (int): The level of the message.
+            message (str): The message, with %-style placeholders for the arguments.
+            *args: The arguments of the message.
+
+        Returns:
+            None
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            if monotonic() - self._started >= self.interval:
+                self._flush()
+            count: int = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+        if count <= self.burst:
+            self.logger.log(level, message, *args)
+
+    def info(self, key: str, message: str, *args) -> None:
+        self.log(key, logging.INFO, message, *args)
+
+    def warning(self, key: str, message: str, *args) -> None:
+        self.log(key, logging.WARNING, message, *args)
+
+    def error(self, key: str, message: str, *args) -> None:
+        self.log(key, logging.ERROR, message, *args)
+
+    def flush(self) -> None:
+        """
+        Log the summary of the messages suppressed in the current interval and start a new one.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Log the summary of the current interval, called with the lock held."""
+        elapsed: float = monotonic() - self._started
+        suppressed: Dict[str, int] = {key: count - self.burst for key, count in self._counts.items() if count > self.burst}
+        if suppressed:
+            totals: str = ", ".join(f"{key}={count}" for key, count in sorted(suppressed.items()))
+            self.logger.info(f"Suppressed messages in the last {elapsed:.0f} s: {totals}")
+        self._counts = {}
+        self._started = monotonic()
+
+
+def shutdown() -> None:
+    """
+    Log the summaries of all samplers and stop the writer thread after it has written every record.
+
+    Returns:
+        None
+    """
+    global _listener
+    for sampler in list(LogSampler._samplers):
+        sampler.flush()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _router.close()
+    _router.file_handlers.clear()
 
-    # Set up file handler for log messages
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
-    # Set up stream handler for log messages
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-    
-    return logger
\ No newline at end of file
+atexit.register(shutdown)
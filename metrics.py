@@ -0,0 +1,372 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter, time
+import json
+import math
+import os
+import threading
+
+# The aiohttp server is imported only when the endpoint is served
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+# Upper bounds of the latency buckets in seconds, from a cached page to a slow proxy
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds of the size buckets in bytes, from a small page to a large batch
+SIZE_BUCKETS: Tuple[float, ...] = tuple(float(4 ** exponent) for exponent in range(4, 13))
+
+# A sample of a custom collector: the metric name, its labels, and its value
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Format the labels of a sample in the Prometheus text format."""
+    escaped: List[str] = [str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values]
+    pairs: List[str] = [f'{name}="{value}"' for name, value in zip(names, escaped)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value in the Prometheus text format."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind: str = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        """
+        Initializes a metric with one series per combination of label values.
+
+        Args:
+            name (str): The metric name in the Prometheus naming scheme.
+            help_text (str): The description of the metric.
+            labels (Sequence[str]): The label names of the series.
+
+        Returns:
+            None
+        """
+        self.name: str = name
+        self.help_text: str = help_text
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self._lock: threading.Lock = threading.Lock()   # Series are updated from the event loop and the database thread
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Return the label values of a series in the order of the label names."""
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Metric {self.name} has the labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Increase the series of the labels.
+
+        Args:
+            amount (float): The non-negative increase.
+            **labels (str): The label values of the series.
+
+        Returns:
+            None
+        """
+        key: Tuple[str, ...] = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, ...], float]]:
+        """Return the series sorted by their labels, copied under the lock, so an export never races an update."""
+        with self._lock:
+            return sorted(self.values.items())
+
+    def lines(self) -> List[str]:
+        """Return the samples in the Prometheus text format."""
+        return [f"{self.name}{_label_text(self.labels, key)} {_format_value(value)}" for key, value in self._snapshot()]
+
+    def summary(self) -> Dict[str, float]:
+        """Return the value of every series, keyed by its labels."""
+        return {_label_text(self.labels, key) or "total": value for key, value in self._snapshot()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Set the series of the labels.
+
+        Args:
+            value (float): The current value.
+            **labels (str): The label values of the series.
+
+        Returns:
+            None
+        """
+        key: Tuple[str, ...] = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (math.inf,)
+        self.series: Dict[Tuple[str, ...], List[float]] = {}   # Bucket counts followed by the count and the sum
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record an observation in the series of the labels.
+
+        Args:
+            value (float): The observed value, e.g. a latency in seconds.
+            **labels (str): The label values of the series.
+
+        Returns:
+            None
+        """
+        key: Tuple[str, ...] = self._key(labels)
+        with self._lock:
+            series: List[float] = self.series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the number of seconds the `with` block takes.
+
+        Args:
+            **labels (str): The label values of the series.
+
+        Yields:
+            None
+        """
+        start: float = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def quantile(self, key: Tuple[str, ...], q: float) -> Optional[float]:
+        """
+        Estimate a quantile of a series by linear interpolation within its bucket.
+
+        Args:
+            key (Tuple[str, ...]): The label values of the series.
+            q (float): The quantile between 0 and 1.
+
+        Returns:
+            float or None: The estimated quantile, or None if the series is empty.
+        """
+        with self._lock:
+            series: List[float] = list(self.series[key])
+        return self._quantile(series, q)
+
+    def _quantile(self, series: List[float], q: float) -> Optional[float]:
+        """Estimate a quantile of a copied series, see `quantile`."""
+        count: float = series[-2]
+        if not count:
+            return None
+        rank: float = q * count
+        cumulative: float = 0.0
+        for index, bound in enumerate(self.buckets):
+            if cumulative + series[index] >= rank:
+                lower: float = self.buckets[index - 1] if index else 0.0
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / series[index] if series[index] else lower
+            cumulative += series[index]
+        return None
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, ...], List[float]]]:
+        """Return copies of the series sorted by their labels, taken under the lock, so an export never races an update."""
+        with self._lock:
+            return sorted((key, list(series)) for key, series in self.series.items())
+
+    def lines(self) -> List[str]:
+        """Return the cumulative bucket, count, and sum samples in the Prometheus text format."""
+        lines: List[str] = []
+        for key, series in self._snapshot():
+            cumulative: float = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le: str = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_format_value(series[-1])}")
+        return lines
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return the count, sum, mean, and estimated quantiles of every series, keyed by its labels."""
+        return {_label_text(self.labels, key) or "total": {
+            "count": series[-2],
+            "sum": series[-1],
+            "mean": series[-1] / series[-2] if series[-2] else None,
+            "p50": self._quantile(series, 0.5),
+            "p95": self._quantile(series, 0.95),
+            "p99": self._quantile(series, 0.99),
+        } for key, series in self._snapshot()}
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        """
+        Initializes a registry of the metrics of a process.
+
+        Modules register their metrics once at import time with `counter`, `gauge`, and `histogram`.
+        Custom collectors added with `add_collector` are called at every export and return samples
+        that are exported as gauges, so state kept elsewhere can be exported without patching the code.
+
+        Returns:
+            None
+        """
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+        self.started_at: float = time()
+
+    def _register(self, metric_type: type, name: str, *args, **kwargs) -> _Metric:
+        """Return the metric of the name, creating it on first use."""
+        metric: Optional[_Metric] = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_type(name, *args, **kwargs)
+        elif type(metric) is not metric_type:
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        """Return the counter of the name, creating it on first use."""
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        """Return the gauge of the name, creating it on first use."""
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Return the histogram of the name, creating it on first use."""
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Add a custom collector called at every export.
+
+        Args:
+            collector (Callable[[], Iterable[Sample]]): Returns the samples to export as (name, labels, value) tuples.
+
+        Returns:
+            None
+        """
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Remove a custom collector.
+
+        Args:
+            collector (Callable[[], Iterable[Sample]]): The collector added with `add_collector`.
+
+        Returns:
+            None
+        """
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def _collected(self) -> Dict[str, Gauge]:
+        """Call the custom collectors and return their samples as gauges, keyed by name."""
+        gauges: Dict[str, Gauge] = {}
+        for collector in list(self.collectors):
+            for name, labels, value in collector():
+                gauge: Gauge = gauges.setdefault(name, Gauge(name, "Custom collector sample", tuple(sorted(labels))))
+                gauge.set(value, **labels)
+        return gauges
+
+    def to_prometheus(self) -> str:
+        """
+        Export every metric and the samples of the custom collectors in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines: List[str] = []
+        for metric in list(self.metrics.values()) + list(self._collected().values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict:
+        """
+        Summarize the run: the counters and gauges by labels, and the count, sum, mean, and quantiles of the histograms.
+
+        Returns:
+            Dict: The JSON serializable run summary.
+        """
+        metrics: Dict[str, _Metric] = {**self.metrics, **self._collected()}
+        return {
+            "started_at": self.started_at,
+            "duration": time() - self.started_at,
+            "metrics": {name: metric.summary() for name, metric in metrics.items() if metric.summary()},
+        }
+
+    def write(self, prometheus_path: Optional[str] = None, summary_path: Optional[str] = None) -> None:
+        """
+        Write the Prometheus text file and the JSON run summary. Each file is replaced atomically,
+        so a scraper such as the node exporter's textfile collector never reads a partial file.
+
+        Args:
+            prometheus_path (str, optional): The path of the Prometheus text file.
+            summary_path (str, optional): The path of the JSON run summary.
+
+        Returns:
+            None
+        """
+        for path, text in ((prometheus_path, self.to_prometheus), (summary_path, lambda: json.dumps(self.summary(), indent=2))):
+            if not path:
+                continue
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(text())
+            os.replace(path + ".tmp", path)
+
+    async def serve(self, host: str, port: int) -> web.AppRunner:
+        """
+        Serve the metrics in the Prometheus text format on `http://host:port/metrics`.
+
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on, 0 selects a free port.
+
+        Returns:
+            web.AppRunner: The runner of the endpoint, stopped with `cleanup`.
+        """
+        from aiohttp import web
+
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=self.to_prometheus(), content_type="text/plain", charset="utf-8", headers={"X-Content-Type-Options": "nosniff"})
+
+        app: web.Application = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner: web.AppRunner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+# Registry of the process, shared by all modules
+REGISTRY: MetricsRegistry = MetricsRegistry()
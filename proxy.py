@@ -1,13 +1,16 @@
+from typing import Sequence
 import logging
 import random
 import asyncio
 import os
 import csv
-from aiohttp_socks import ProxyError
+from time import perf_counter
+from python_socks import ProxyError
 from logs import logger
+from logs.logger import LogSampler
 from dotenv import load_dotenv
-from rich import print
-from config import _load_settings
+from config import ProxySettings, get_settings
+from database.proxy_cache import ProxyHealthCache
 import aiohttp
 
 
@@ -20,6 +23,9 @@ LOG_DIR_PROXIES = os.getenv('LOG_DIR_PROXIES')
 # Create logger object
 logger = logger.get_logger(log_file=LOG_DIR_PROXIES, log_level=logging.INFO)
 
+# Per-proxy messages are sampled, with a periodic summary of the suppressed ones
+proxy_log = LogSampler(logger)
+
 
 def _get_proxy(num_test_proxies: int):
     """
@@ -36,7 +42,7 @@ def _get_proxy(num_test_proxies: int):
         ValueError: If the proxy list is empty.
     """
     # Load proxy list from path in settings
-    proxy_list_path: str = _load_settings()['proxy_settings']['proxy_list5']
+    proxy_list_path: str = get_settings().proxy_settings.proxy_list5
 
     # Sync method to read one proxy list from file
     with open(proxy_list_path, 'r') as file:
@@ -45,104 +51,175 @@ def _get_proxy(num_test_proxies: int):
         return random.sample(proxy_list, k=num_test_proxies)    # Return a random sample of the specified number of proxies
 
 
-async def _test_proxy(proxy: str, index: int, checker_url: list):
+def _create_validation_session(concurrency: int) -> aiohttp.ClientSession:
     """
-    Asynchronously tests a proxy by sending a GET request to a randomly chosen URL from the provided checker_url list.
-    
+    Creates the client session shared by all proxy tests of one validation run.
+
+    Args:
+        concurrency (int): The maximum number of connections the session opens at once.
+
+    Returns:
+        aiohttp.ClientSession: The client session with short connect timeouts.
+    """
+    proxy_settings: ProxySettings = get_settings().proxy_settings
+    connector: aiohttp.BaseConnector = aiohttp.TCPConnector(ssl=False, limit=concurrency)  # Turn off SSL verification for testing
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+        total=proxy_settings.validation_timeout, sock_connect=proxy_settings.validation_connect_timeout
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def _check_proxy_url(proxy: str, url: str, session: aiohttp.ClientSession):
+    """
+    Asynchronously sends one GET request through a proxy to a checker URL.
+
+    :param proxy: The proxy to test.
+    :type proxy: str
+    :param url: The checker URL.
+    :type url: str
+    :param session: The shared client session.
+    :type session: aiohttp.ClientSession
+    :return: The HTTP status code, or None if the request failed.
+    :rtype: int or None
+    """
+    try:
+        async with session.get(url=url, proxy=proxy) as response:
+            return response.status
+    except (ProxyError, aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+
+
+async def _test_proxy(proxy: str, index: int, checker_url: list, session: aiohttp.ClientSession = None):
+    """
+    Asynchronously tests a proxy by racing GET requests to all URLs from the provided checker_url list.
+
+    The proxy is working as soon as one of the checker URLs answers with status 200, the other
+    requests are then cancelled. A 429 or any other status only fails the request to that URL,
+    there are no retries and no delays.
+
     :param proxy: The proxy to test.
     :type proxy: str
     :param index: The index of the proxy in the list.
     :type index: int
-    :param checker_url: The list of URLs to choose from for testing the proxy.
+    :param checker_url: The list of URLs to test the proxy against.
     :type checker_url: list
+    :param session: The client session shared by the validation run. A new one is created if None.
+    :type session: aiohttp.ClientSession
     :return: The tested proxy if it is working, None otherwise.
     :rtype: str or None
     """
-    # Delay between requests
-    delay: int = 1
-
-    # Generate random URL for proxy checking
-    url = random.choice(checker_url) if checker_url else None
-    
-    # If proxy is None, raise ValueError
-    if not url:
+    # If no URL is provided, the proxy cannot be tested
+    if not checker_url:
         logger.error("No URL provided for proxy checking.")
         return None
-    
-    # Create connector and timeout objects
-    connector: aiohttp.BaseConnector = aiohttp.TCPConnector(ssl=False, limit=100)  # Turn off SSL verification for testing
-    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=30)
-    
+
+    # Create a session for a single test
+    if session is None:
+        async with _create_validation_session(len(checker_url)) as session:
+            return await _test_proxy(proxy, index, checker_url, session)
+
+    # Race the requests to all checker URLs
+    pending: set = {asyncio.create_task(_check_proxy_url(proxy, url, session)) for url in checker_url}
+    statuses: list = []
     try:
-        # Create aiohttp session and send GET request
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            try:
-                # Send GET request with proxy and random delay
-                async with session.get(url=url, proxy=proxy) as response:
-                    await asyncio.sleep(random.uniform(0.5, 5.0))   # Add random delay between requests
-
-                    # Check response status
-                    if response.status == 200:
-                        logger.info(f"Proxy {index}: {proxy} WORKING")
-                        return proxy
-
-                    # Handle 429 and 504 errors
-                    elif response.status == 429:
-                        logger.warning(f"Proxy {index}: {proxy} too many requests")
-                        await asyncio.sleep(60)  # Wait for 60 seconds before retrying
-                        return await _test_proxy(proxy, index, checker_url)
-
-                    elif response.status == 504:
-                        logger.warning(f"Proxy {index}: {proxy} timed out")
-                        return None
-                    
-                    # Handle other status codes
-                    else:
-                        logger.error(f"Proxy {index}: {proxy} failed with status {response.status} - URL: {url}")
-                        return None
-            
-            # Handle proxy errors
-            except ProxyError as e:
-                logger.error(f"Error {e}, retrying in {delay} seconds...")
-                await asyncio.sleep(delay)  # Add delay before retrying
-                delay *= 2   # Double the delay
-    
-    # Handle other errors
-    except Exception as e:
-        # logger.error(f"Proxy {index}: {proxy} failed with exception: {e}")
-        return None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                statuses.append(task.result())
+                if task.result() == 200:
+                    proxy_log.info("proxy_working", "Proxy %s: %s WORKING", index, proxy)
+                    return proxy
+    finally:
+        # Cancel the requests still in flight
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
+    proxy_log.info("proxy_failed", "Proxy %s: %s failed with statuses %s", index, proxy, statuses)
+    return None
 
-async def _get_working_proxies(proxy_list: list, checker_url: list):
+
+async def _get_working_proxies(proxy_list: list, checker_url: list, concurrency: int = None, min_working: int = None,
+                               on_result=None):
     """
     Asynchronously tests a list of proxies and returns a list of working proxies.
 
+    The proxies are tested by a pool of `concurrency` workers sharing one client session. With
+    `min_working`, the validation stops and returns as soon as that many working proxies are found.
+
     Args:
         proxy_list (List[str]): A list of proxies to test.
         checker_url (List[str]): A list of URLs to check the proxies against.
+        concurrency (int, optional): The number of proxies tested at once. Defaults to the `validation_concurrency` proxy setting.
+        min_working (int, optional): Return as soon as this many working proxies are found. If None, all proxies are tested.
+        on_result (Callable[[str, bool, float], None], optional): Called with the proxy, whether it works, and the
+            seconds its test took, after every finished test.
 
     Returns:
-        List[str]: A list of working proxies.
+        List[str]: A list of working proxies in the order they were found.
 
     Raises:
         None
     """
-    # Test each proxy in parallel using asyncio gathering method
-    tasks: list = [_test_proxy(proxy, index, checker_url) for index, proxy in enumerate(proxy_list)]
+    concurrency = concurrency or get_settings().proxy_settings.validation_concurrency
+    working_proxies: list = []
+    enough: asyncio.Event = asyncio.Event()
+    candidates = iter(enumerate(proxy_list))
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        # Test the next proxy until the list is exhausted or enough proxies were found
+        for index, proxy in candidates:
+            if enough.is_set():
+                return
+            start_time: float = perf_counter()
+            working: bool = await _test_proxy(proxy, index, checker_url, session) is not None
+            if on_result is not None:
+                on_result(proxy, working, perf_counter() - start_time)
+            if working:
+                working_proxies.append(proxy)
+                if min_working is not None and len(working_proxies) >= min_working:
+                    enough.set()
+
+    async with _create_validation_session(concurrency * max(len(checker_url), 1)) as session:
+        workers: list = [asyncio.create_task(worker(session)) for _ in range(min(concurrency, len(proxy_list)))]
+        waiter: asyncio.Task = asyncio.create_task(enough.wait())
+
+        # Wait until all workers are done or enough working proxies were found
+        await asyncio.wait([asyncio.gather(*workers), waiter], return_when=asyncio.FIRST_COMPLETED)
+        for task in workers + [waiter]:
+            task.cancel()
+        await asyncio.gather(*workers, waiter, return_exceptions=True)
+
+    return working_proxies[:min_working] if min_working is not None else working_proxies
+
+
+async def _revalidate_proxies(proxy_list: list, checker_url: list, cache: ProxyHealthCache):
+    """
+    Asynchronously re-tests stale proxies in the background and records the results in the cache.
 
-    # Wait for all tasks to complete
-    working_proxies: list = await asyncio.gather(*tasks)
+    Args:
+        proxy_list (List[str]): A list of stale proxies to test.
+        checker_url (List[str]): A list of URLs to check the proxies against.
+        cache (ProxyHealthCache): The cache the results are written to.
 
-    # Remove None values from the list and return it
-    return [proxy for proxy in working_proxies if proxy is not None]
+    Returns:
+        None
+    """
+    try:
+        await _get_working_proxies(proxy_list, checker_url, on_result=cache.record)
+    finally:
+        await cache.flush_async()
+    logger.info(f"Revalidated {len(proxy_list)} stale proxies in the background")
 
 
-async def test_proxies(num_test_proxies: int):
+async def test_proxies(num_test_proxies: int, min_working: int = None, cache: ProxyHealthCache = None):
     """
     Asynchronously tests a list of proxies and returns a list of working proxies.
 
     Args:
         num_test_proxies (int): The number of proxies to test.
+        min_working (int, optional): Return as soon as this many working proxies are found, so crawling can start early.
+        cache (ProxyHealthCache, optional): The cache of validation results from earlier runs.
 
     Returns:
         List[str]: A list of working proxies.
@@ -150,19 +227,36 @@ async def test_proxies(num_test_proxies: int):
     Raises:
         None
 
-    This function loads a list of proxies from the settings and a list of URLs to check the proxies against. If no URL is provided, an empty list is returned. The function then tests the proxies in parallel using asyncio and returns a list of working proxies.
+    This function loads a list of proxies from the settings and a list of URLs to check the proxies against. If no URL is provided, an empty list is returned. The function then tests the proxies with a bounded pool of workers and returns a list of working proxies.
+
+    With a cache, proxies validated successfully within the cache TTL are returned right away if there
+    are at least `min_working` of them (or at least one), and the stale proxies are re-tested in the
+    background as `cache.revalidation`. Otherwise the proxies are tested and the results are cached.
     """
-    # Load proxy list from path in settings
-    proxy_list: list = _get_proxy(num_test_proxies)
-    
     # Load proxy checker URL from settings
-    checker_url: list = _load_settings()["proxy_settings"]["checker_proxies"]
+    checker_url: Sequence[str] = get_settings().proxy_settings.checker_proxies
     
     # If no URL is provided, return an empty list
     if not checker_url:
         logger.error("No URL provided for proxy checking.")
         return []   # Return an empty list
-    
-    # Get working proxies in parallel using asyncio
-    working_proxies: list = await _get_working_proxies(proxy_list, checker_url)
+
+    # Reuse the recently validated proxies and re-test the stale ones in the background
+    if cache is not None:
+        fresh_proxies: list = await cache.db_manager_settings.run(cache.fresh_proxies)
+        if len(fresh_proxies) >= (min_working or 1):
+            logger.info(f"Reusing {len(fresh_proxies)} recently validated proxies from the cache")
+            stale_proxies: list = await cache.db_manager_settings.run(cache.stale_proxies)
+            cache.revalidation = asyncio.create_task(_revalidate_proxies(stale_proxies, checker_url, cache))
+            return fresh_proxies
+
+    # Load proxy list from path in settings
+    proxy_list: list = _get_proxy(num_test_proxies)
+
+    # Get working proxies with a bounded pool of workers
+    working_proxies: list = await _get_working_proxies(
+        proxy_list, checker_url, min_working=min_working, on_result=cache.record if cache is not None else None
+    )
+    if cache is not None:
+        await cache.flush_async()
     return working_proxies  # Return the list of working proxies
@@ -1,4 +1,4 @@
-from .get_proxy_list import get_proxy_list_from_api, get_proxy_list_from_freeproxy_world, check_proxies
+from .get_proxy_list import get_proxy_list_from_api, get_proxy_list_from_freeproxy_world, check_proxies, run_proxy_pipeline
 
 
-__all__ = ["get_proxy_list_from_api", "get_proxy_list_from_freeproxy_world", "check_proxies"]
\ No newline at end of file
+__all__ = ["get_proxy_list_from_api", "get_proxy_list_from_freeproxy_world", "check_proxies", "run_proxy_pipeline"]
\ No newline at end of file
@@ -1,34 +1,92 @@
 from datetime import datetime
-import pandas as pd
-from bs4 import BeautifulSoup
-import requests
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+import asyncio
+import csv
+import os
+import aiohttp
 from rich import print
-from config import _load_settings
-import pandas as pd
+from config import ProxySettings, get_settings
+from proxy import _create_validation_session, _test_proxy
 
 
-def get_proxy_list_from_freeproxy_world():
-    proxy_list = {
-        "ip": [],
-    }
-    for page in range(1, 10 + 1):
-        url = f"https://www.freeproxy.world/?type=http&anonymity=4&country=&speed=&port=&page={page}"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
-        table: object = soup.find("table")
-        rows: list = table.find_all("tr")
+# URL of one page of the freeproxy.world HTTP proxy list
+FREEPROXY_WORLD_URL: str = "https://www.freeproxy.world/?type=http&anonymity=4&country=&speed=&port=&page={page}"
+
+
+def _parse_freeproxy_world_page(html: str) -> List[str]:
+    """
+    Parse the proxies from one page of the freeproxy.world proxy list.
+
+    The parsing is CPU bound, so the pipeline runs it in a thread pool.
+
+    Args:
+        html (str): The HTML of the page.
+
+    Returns:
+        List[str]: The proxies in the format 'ip:port'.
+    """
+    # BeautifulSoup is imported on first use, only the freeproxy.world source needs it
+    from bs4 import BeautifulSoup
+
+    proxy_list: List[str] = []
+    table: object = BeautifulSoup(html, "html.parser").find("table")
+    if table is None:
+        return proxy_list
 
-        for row in rows:
-            if row.find("td", class_="show-ip-div") is None:
-                continue
-            cols_ip = row.find("td", class_="show-ip-div").text.strip()
-            cols_port = row.find('a').get('href').split("=")[1]
-            ip_port = cols_ip + ":" + cols_port
-            proxy_list['ip'].append(ip_port)
+    for row in table.find_all("tr"):
+        if row.find("td", class_="show-ip-div") is None:
+            continue
+        cols_ip = row.find("td", class_="show-ip-div").text.strip()
+        cols_port = row.find('a').get('href').split("=")[1]
+        proxy_list.append(cols_ip + ":" + cols_port)
+    return proxy_list
 
-        df = pd.DataFrame(proxy_list)
-        # print(df)
-        # df.to_csv('async-web-scraper-motionelements/proxy/free_proxy_list.csv', index=False, encoding='utf-8')
+
+async def _fetch_freeproxy_world_page(session: aiohttp.ClientSession, url: str, executor: Executor) -> List[str]:
+    """
+    Asynchronously fetch one page of the freeproxy.world proxy list and parse it in the executor.
+
+    Args:
+        session (aiohttp.ClientSession): The client session.
+        url (str): The URL of the page.
+        executor (Executor): The executor the page is parsed in.
+
+    Returns:
+        List[str]: The proxies in the format 'ip:port', empty if the page could not be fetched.
+    """
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                print(f'Proxy source {url}  --  Status {response.status}')
+                return []
+            html: str = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f'Proxy source {url}  --  Failed: {e}')
+        return []
+    return await asyncio.get_running_loop().run_in_executor(executor, _parse_freeproxy_world_page, html)
+
+
+def get_proxy_list_from_freeproxy_world(pages: int = 10, page_url: str = FREEPROXY_WORLD_URL) -> List[str]:
+    """
+    Fetch the freeproxy.world proxy list, all pages at the same time.
+
+    Args:
+        pages (int): The number of pages to fetch.
+        page_url (str): The page URL template with a `{page}` placeholder.
+
+    Returns:
+        List[str]: The deduplicated proxies in the format 'ip:port'.
+    """
+    async def fetch_all_pages() -> List[str]:
+        with ThreadPoolExecutor() as executor:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                results: list = await asyncio.gather(*(
+                    _fetch_freeproxy_world_page(session, page_url.format(page=page), executor) for page in range(1, pages + 1)
+                ))
+        return list(dict.fromkeys(proxy for result in results for proxy in result))
+
+    return asyncio.run(fetch_all_pages())
 
 
 
@@ -54,6 +112,8 @@ def get_proxy_list_from_api():
     Raises:
         requests.exceptions.RequestException: If there is an error with the request.
     """
+    import requests
+
     url: str = "https://api.proxyscrape.com/v3/free-proxy-list/get?request=getproxies&skip=0&proxy_format=protocolipport&format=json&limit=7"  # limit=20 = 20 proxies at once
 
     headers: dict = {
@@ -101,66 +161,204 @@ def check_proxies(proxies: list):
     - list: A list of available proxy addresses.
 
     Note:
-    - This function makes use of the `requests` library to send HTTP requests.
-    - The function logs any errors or information related to the proxy availability.
+    - The proxies are checked concurrently by the validation workers of `run_proxy_pipeline`.
     - The function measures the total time taken to check all proxies.
     """
     if proxies is None:
         raise ValueError('Proxy list is empty')
 
-    proxy_check_url: str = _load_settings()['proxy_settings']['proxy_check_url']
+    proxy_check_url: str = get_settings().proxy_settings.proxy_check_url
     if proxy_check_url is None:
         raise ValueError('Proxy check URL is empty')
 
     start_time = datetime.now()
-
-    available_proxies = []
     print(f'\n\t*** Number proxies to check: {len(proxies)} ***')
-    for index, proxy in enumerate(proxies, start=1):
-        if proxy is None:
-            raise ValueError('Proxy is null')
-        try:
-            response: requests.models.Response = requests.get(proxy_check_url, proxies={"http": proxy, "https": proxy}, timeout=3)
-            if response is None:
-                print(f'Proxy {index} :: {proxy}  --  Null Response')
-            elif response.status_code == 200:
-                print(f'Proxy {index} :: {proxy}  --  Available')
-                available_proxies.append(proxy)
-            else:
-                print(f'Proxy {index} :: {proxy}  --  Not Available ({response.status_code})')
-        except requests.exceptions.ConnectTimeout as e:
-            print(f'Proxy {index} :: {proxy}  --  Connect Timeout')
-        except requests.exceptions.ConnectionError as e:
-            print(f'Proxy {index} :: {proxy}  --  Connection Error')
-        except requests.exceptions.InvalidURL as e:
-            print(f'Proxy {index} :: {proxy}  --  Invalid URL')
-        # except requests.exceptions.ProxyError as e:
-        #     print(f'Proxy {index} :: {proxy}  --  Proxy Error')
-        # except requests.exceptions.SSLError as e:
-        #     print(f'Proxy {index} :: {proxy}  --  SSL Error')
-        except requests.exceptions.Timeout as e:
-            print(f'Proxy {index} :: {proxy}  --  Timeout')
-        except requests.exceptions.TooManyRedirects as e:
-            print(f'Proxy {index} :: {proxy}  --  Too Many Redirects')
-        except Exception as e:
-            print(f'Proxy {index} :: {proxy}  --  Unhandled Exception: {e}')
+
+    concurrency: int = get_settings().proxy_settings.validation_concurrency
+
+    async def check_all() -> List[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for proxy in proxies:
+            if proxy is None:
+                raise ValueError('Proxy is null')
+            queue.put_nowait(proxy)
+        for _ in range(concurrency):
+            queue.put_nowait(None)
+        return await _validate_proxy_candidates(queue, [proxy_check_url], concurrency)
+
+    available_proxies: List[str] = asyncio.run(check_all())
 
     end_time = datetime.now()
     print(f'Total time to check all proxies: {end_time - start_time}')
     print(f'Total available proxies for scraping: {len(available_proxies)}\n')
     return available_proxies
 
+
+def _normalize_proxy(proxy: str) -> Optional[str]:
+    """
+    Normalize a proxy to the format 'ip:port' used by the proxy list files.
+
+    Args:
+        proxy (str): The proxy, with or without a scheme.
+
+    Returns:
+        str or None: The normalized proxy, or None if it is empty.
+    """
+    proxy = proxy.strip()
+    if "://" in proxy:
+        proxy = proxy.split("://", 1)[1]
+    return proxy.rstrip("/") or None
+
+
+def read_proxy_csv_files(paths: Iterable[str]) -> List[str]:
+    """
+    Read and merge the proxies of several proxy list files.
+
+    Args:
+        paths (Iterable[str]): The CSV files with one proxy per row. Missing files are skipped.
+
+    Returns:
+        List[str]: The deduplicated proxies in the format 'ip:port', in the order they were read.
+    """
+    proxies: dict = {}
+    for path in paths:
+        if not os.path.exists(path):
+            print(f'Proxy list {path}  --  Not found')
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            for row in csv.reader(file):
+                proxy: Optional[str] = _normalize_proxy(row[0]) if row else None
+                if proxy and proxy != 'proxy':
+                    proxies.setdefault(proxy)
+    return list(proxies)
+
+
+def write_proxy_list(path: str, proxies: Iterable[str]) -> None:
+    """
+    Write a proxy list file atomically, readers never see a partially written file.
+
+    Args:
+        path (str): The CSV file to write.
+        proxies (Iterable[str]): The proxies in the format 'ip:port'.
+
+    Returns:
+        None
+    """
+    # Write to a temporary file first, so a crash never leaves a half written list
+    tmp_path: str = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        for proxy in proxies:
+            writer.writerow([proxy])
+    os.replace(tmp_path, path)
+
+
+async def _validate_proxy_candidates(queue: asyncio.Queue, checker_url: List[str], concurrency: int) -> List[str]:
+    """
+    Asynchronously validate the proxy candidates taken from the queue with a pool of workers.
+
+    Every worker stops when it takes None from the queue, so the producer puts one None per worker
+    after the last candidate.
+
+    Args:
+        queue (asyncio.Queue): The queue of proxy candidates in the format 'ip:port'.
+        checker_url (List[str]): The URLs to check the proxies against.
+        concurrency (int): The number of proxies validated at once.
+
+    Returns:
+        List[str]: The working proxies in the format 'ip:port'.
+    """
+    working_proxies: List[str] = []
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        while True:
+            proxy: Optional[str] = await queue.get()
+            if proxy is None:
+                return
+            proxy = _normalize_proxy(proxy)
+            if proxy and await _test_proxy(f'http://{proxy}', len(working_proxies), checker_url, session):
+                working_proxies.append(proxy)
+
+    async with _create_validation_session(concurrency * len(checker_url)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return working_proxies
+
+
+async def run_proxy_pipeline(output_path: str, csv_paths: Iterable[str] = (), pages: int = 10,
+                             page_url: str = FREEPROXY_WORLD_URL, checker_url: List[str] = None,
+                             concurrency: int = None) -> List[str]:
+    """
+    Asynchronously build the validated proxy list from all sources.
+
+    All freeproxy.world pages are fetched at the same time and parsed in a thread pool, and the proxy
+    list files are read in the same pool. Every new candidate is streamed through a bounded queue
+    straight into the validation workers, so validation starts with the first parsed page. The
+    working proxies are written atomically to `output_path`.
+
+    Args:
+        output_path (str): The CSV file the working proxies are written to.
+        csv_paths (Iterable[str]): The proxy list files to merge.
+        pages (int): The number of freeproxy.world pages to fetch, 0 to skip the source.
+        page_url (str): The page URL template with a `{page}` placeholder.
+        checker_url (List[str], optional): The URLs to check the proxies against. Defaults to the `checker_proxies` setting.
+        concurrency (int, optional): The number of proxies validated at once. Defaults to the `validation_concurrency` setting.
+
+    Returns:
+        List[str]: The working proxies in the format 'ip:port'.
+    """
+    proxy_settings: ProxySettings = get_settings().proxy_settings
+    checker_url = checker_url or proxy_settings.checker_proxies
+    concurrency = concurrency or proxy_settings.validation_concurrency
+    start_time = datetime.now()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    seen: set = set()
+
+    async def produce(candidates: List[str]) -> None:
+        # Stream every proxy not seen before to the validation workers
+        for candidate in candidates:
+            proxy: Optional[str] = _normalize_proxy(candidate)
+            if proxy and proxy not in seen:
+                seen.add(proxy)
+                await queue.put(proxy)
+
+    async def produce_sources(executor: Executor) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                sources: list = [loop.run_in_executor(executor, read_proxy_csv_files, [path]) for path in csv_paths]
+                sources += [asyncio.ensure_future(_fetch_freeproxy_world_page(session, page_url.format(page=page), executor)) for page in range(1, pages + 1)]
+                try:
+                    for source in asyncio.as_completed(sources):
+                        await produce(await source)
+                finally:
+                    # A failed source stops the others before the session is closed
+                    for source in sources:
+                        source.cancel()
+                    await asyncio.gather(*sources, return_exceptions=True)
+        finally:
+            # Tell every validation worker that no more candidates follow, also after a failed source,
+            # so the workers finish and the error of the source is raised instead of hanging
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    with ThreadPoolExecutor() as executor:
+        working_proxies, _ = await asyncio.gather(
+            _validate_proxy_candidates(queue, checker_url, concurrency),
+            produce_sources(executor),
+        )
+
+    write_proxy_list(output_path, working_proxies)
+    print(f'Total time to build the proxy list: {datetime.now() - start_time}')
+    print(f'Total available proxies for scraping: {len(working_proxies)} of {len(seen)} candidates\n')
+    return working_proxies
+
+
 if __name__ == "__main__":
-    # Get proxy list from API
-    list_proxy = get_proxy_list_from_api()
-    
-    # Check proxy list and return list of available proxies
-    available_proxy = check_proxies(list_proxy)
-    # print(available_proxy)
-    
-    # create DataFrame from list of available proxies
-    df = pd.DataFrame(available_proxy, columns=['proxy'])
-    df.to_csv('async-web-scraper-motionelements/proxy/free_proxy_list.csv', index=False, encoding='utf-8')
-
-    # Alternative way to get proxy list
-    # get_proxy_list_from_freeproxy_world()
+    proxy_settings: ProxySettings = get_settings().proxy_settings
+
+    # Merge all proxy lists and freeproxy.world, validate them, and save the working proxies
+    asyncio.run(run_proxy_pipeline(
+        output_path=proxy_settings.validated_proxy_list,
+        csv_paths=[proxy_settings[f'proxy_list{number}'] for number in range(1, 6)],
+    ))
@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+from time import monotonic
+import random
+
+
+class ProxyHealth:
+    def __init__(self, proxy: str) -> None:
+        """
+        Initializes the health statistics of one proxy.
+
+        Args:
+            proxy (str): The proxy URL.
+
+        Returns:
+            None
+        """
+        self.proxy: str = proxy
+        self.latency: Optional[float] = None   # Exponentially weighted average latency in seconds
+        self.success_rate: float = 1.0   # Exponentially weighted share of successful requests
+        self.throttled: float = 0.0   # Number of 429 responses, decayed over time
+        self.server_errors: float = 0.0   # Number of 5xx responses, decayed over time
+        self.requests: int = 0
+        self.failures_in_row: int = 0
+        self.ejected_until: float = 0.0
+        self.updated_at: float = monotonic()
+
+    def decay(self, half_life: float) -> None:
+        """Decay the error counters by the time passed since the last update."""
+        now: float = monotonic()
+        factor: float = 0.5 ** ((now - self.updated_at) / half_life)
+        self.throttled *= factor
+        self.server_errors *= factor
+        self.updated_at = now
+
+    def weight(self) -> float:
+        """Return the selection weight, higher for fast proxies with few errors."""
+        latency: float = self.latency if self.latency is not None else 1.0
+        return max(self.success_rate, 0.01) / (max(latency, 0.01) * (1.0 + self.throttled + self.server_errors))
+
+
+class ProxyPool:
+    def __init__(self, proxies: List[str], smoothing: float = 0.3, half_life: float = 60.0,
+                 max_failures: int = 3, cooldown: float = 120.0) -> None:
+        """
+        Initializes a pool of proxies rotated per request.
+
+        Every request reports its outcome back to the pool. The pool keeps exponentially weighted
+        latency and success rate per proxy together with 429 and 5xx counters that decay over time,
+        and selects proxies at random weighted toward the healthy ones. A proxy that fails
+        `max_failures` times in a row is ejected and offered again after `cooldown` seconds.
+
+        Args:
+            proxies (List[str]): The proxy URLs.
+            smoothing (float): The weight of the newest observation in the weighted averages.
+            half_life (float): The number of seconds after which the 429 and 5xx counters are halved.
+            max_failures (int): The number of failures in a row after which a proxy is ejected.
+            cooldown (float): The number of seconds an ejected proxy is not used.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the proxy list is empty.
+        """
+        if not proxies:
+            raise ValueError("The proxy pool needs at least one proxy")
+        self.smoothing: float = smoothing
+        self.half_life: float = half_life
+        self.max_failures: int = max_failures
+        self.cooldown: float = cooldown
+        self.health: Dict[str, ProxyHealth] = {proxy: ProxyHealth(proxy) for proxy in dict.fromkeys(proxies)}
+
+    def __len__(self) -> int:
+        return len(self.health)
+
+    def available(self) -> List[ProxyHealth]:
+        """
+        Return the health statistics of the proxies that are not ejected.
+
+        Returns:
+            List[ProxyHealth]: The available proxies.
+        """
+        now: float = monotonic()
+        return [health for health in self.health.values() if health.ejected_until <= now]
+
+    def acquire(self) -> str:
+        """
+        Select a proxy for the next request.
+
+        If every proxy is ejected, the one whose cooldown ends first is returned, so a crawl never stalls.
+
+        Returns:
+            str: The selected proxy URL.
+        """
+        candidates: List[ProxyHealth] = self.available()
+        if not candidates:
+            return min(self.health.values(), key=lambda health: health.ejected_until).proxy
+
+        for health in candidates:
+            health.decay(self.half_life)
+        return random.choices(candidates, weights=[health.weight() for health in candidates])[0].proxy
+
+    def record(self, proxy: str, status: Optional[int], latency: float) -> None:
+        """
+        Record the outcome of a request sent through a proxy.
+
+        Args:
+            proxy (str): The proxy URL the request was sent through.
+            status (int or None): The HTTP status code, or None if the request failed without a response.
+            latency (float): The number of seconds the request took.
+
+        Returns:
+            None
+        """
+        health: Optional[ProxyHealth] = self.health.get(proxy)
+        if health is None:
+            return
+        health.decay(self.half_life)
+        health.requests += 1
+
+        succeeded: bool = status is not None and status < 500 and status != 429
+        health.success_rate += self.smoothing * ((1.0 if succeeded else 0.0) - health.success_rate)
+        if status is not None:
+            health.latency = latency if health.latency is None else health.latency + self.smoothing * (latency - health.latency)
+        if status == 429:
+            health.throttled += 1
+        elif status is not None and status >= 500:
+            health.server_errors += 1
+
+        # Eject the proxy after repeated failures, a success resets the streak
+        if succeeded:
+            health.failures_in_row = 0
+            return
+        health.failures_in_row += 1
+        if health.failures_in_row >= self.max_failures:
+            health.ejected_until = monotonic() + self.cooldown
+            health.failures_in_row = 0
+
+    def snapshot(self) -> List[Dict]:
+        """
+        Return the current health statistics of all proxies.
+
+        Returns:
+            List[Dict]: One dictionary per proxy, sorted from the healthiest.
+        """
+        now: float = monotonic()
+        rows: List[Dict] = [{
+            "proxy": health.proxy,
+            "requests": health.requests,
+            "latency": health.latency,
+            "success_rate": round(health.success_rate, 3),
+            "throttled": round(health.throttled, 2),
+            "server_errors": round(health.server_errors, 2),
+            "ejected": health.ejected_until > now,
+            "weight": health.weight(),
+        } for health in self.health.values()]
+        return sorted(rows, key=lambda row: row["weight"], reverse=True)
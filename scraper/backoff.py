@@ -0,0 +1,355 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic
+from urllib.parse import urlsplit
+import asyncio
+import random
+from metrics import REGISTRY
+
+
+# Metrics of the retries, counted over every controller of the process
+RETRIES = REGISTRY.counter("scraper_retries_total", "Attempts after the first one of a request")
+THROTTLED_RESPONSES = REGISTRY.counter("scraper_throttled_responses_total", "Responses rejected by the rate limit of the server (HTTP 429)")
+
+
+class RetryableError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = False,
+                 proxy_failure: bool = False) -> None:
+        """
+        Initializes the error of a failed attempt that is worth retrying.
+
+        Args:
+            message (str): The description of the failure.
+            retry_after (float, optional): The number of seconds the server asked to wait, from its `Retry-After` header.
+            throttled (bool): Whether the server rejected the request because of its rate limit (HTTP 429).
+            proxy_failure (bool): Whether the request failed at the proxy or on the way through it, which
+                says nothing about the host and is scored by the proxy pool instead of the circuit breaker.
+
+        Returns:
+            None
+        """
+        super().__init__(message)
+        self.retry_after: Optional[float] = retry_after
+        self.throttled: bool = throttled
+        self.proxy_failure: bool = proxy_failure
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of a `Retry-After` header.
+
+    Args:
+        value (str or None): The header value, a number of seconds or an HTTP date.
+
+    Returns:
+        float or None: The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None, decrease: float = 0.5) -> None:
+        """
+        Initializes an adaptive limit of requests in flight to one host (AIMD).
+
+        Every successful request raises the limit by 1 / limit, i.e. by one request per round of
+        `limit` successes. A throttled request multiplies the limit by `decrease`. Throttled requests
+        sent before the last decrease were answered under the old limit, so they do not cut it again.
+        The limit thus settles just below the rate the server accepts instead of oscillating.
+
+        Args:
+            initial (int): The limit before the first response.
+            minimum (int): The lowest limit.
+            maximum (int, optional): The highest limit. Defaults to `initial`.
+            decrease (float): The factor applied to the limit after a throttled request.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the limits are not positive or the decrease is not between 0 and 1.
+        """
+        maximum = maximum or initial
+        if not 1 <= minimum <= initial <= maximum or not 0 < decrease < 1:
+            raise ValueError("The limits must satisfy 1 <= minimum <= initial <= maximum and the decrease must be between 0 and 1")
+        self.limit: float = float(initial)
+        self.minimum: int = minimum
+        self.maximum: int = maximum
+        self.decrease: float = decrease
+        self.in_flight: int = 0
+        self.decreased_at: float = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        """
+        Wait until fewer requests than the limit are in flight and take a slot.
+
+        Returns:
+            None
+        """
+        while self.in_flight >= int(self.limit):
+            waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        """
+        Give a slot back and wake the callers that fit under the limit.
+
+        Returns:
+            None
+        """
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Wake as many waiting callers as there are free slots."""
+        for _ in range(int(self.limit) - self.in_flight):
+            if not self._waiters:
+                return
+            waiter: asyncio.Future = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def on_success(self) -> None:
+        """Raise the limit additively after a successful request."""
+        self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_throttled(self, sent_at: float) -> None:
+        """
+        Cut the limit multiplicatively after a throttled request.
+
+        Args:
+            sent_at (float): The `monotonic` time the throttled request was sent.
+
+        Returns:
+            None
+        """
+        if sent_at < self.decreased_at:
+            return
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+        self.decreased_at = monotonic()
+
+
+class CircuitBreaker:
+    def __init__(self, max_failures: int, reset_timeout: float) -> None:
+        """
+        Initializes a circuit breaker of one host.
+
+        After `max_failures` failed attempts in a row the circuit opens and requests fail right away
+        without being sent. After `reset_timeout` seconds one trial request is let through: its success
+        closes the circuit, its failure opens it for another `reset_timeout` seconds.
+
+        Args:
+            max_failures (int): The number of failed attempts in a row that open the circuit.
+            reset_timeout (float): The number of seconds the circuit stays open before a trial request.
+
+        Returns:
+            None
+        """
+        self.max_failures: int = max_failures
+        self.reset_timeout: float = reset_timeout
+        self.failures_in_row: int = 0
+        self.opened_at: Optional[float] = None
+        self._trial: bool = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected."""
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        Return whether a request may be sent, letting one trial request through after the reset timeout.
+
+        Returns:
+            bool: True if the request may be sent.
+        """
+        if self.opened_at is None:
+            return True
+        if self._trial or monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self._trial = True
+        return True
+
+    def release_trial(self) -> None:
+        """
+        Release the trial request after it ended without an outcome, e.g. when it was cancelled, so the next request is the trial.
+
+        Returns:
+            None
+        """
+        self._trial = False
+
+    def record(self, succeeded: bool) -> None:
+        """
+        Record the outcome of an attempt.
+
+        Args:
+            succeeded (bool): Whether the host answered the attempt.
+
+        Returns:
+            None
+        """
+        self._trial = False
+        if succeeded:
+            self.failures_in_row = 0
+            self.opened_at = None
+            return
+        self.failures_in_row += 1
+        if self.opened_at is not None or self.failures_in_row >= self.max_failures:
+            self.opened_at = monotonic()
+
+
+class BackoffController:
+    def __init__(self, max_in_flight: int, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 decrease: float = 0.5, breaker_failures: int = 10, breaker_reset: float = 30.0) -> None:
+        """
+        Initializes the retry and backoff controller shared by all requests of a crawl.
+
+        A request is attempted at most `max_attempts` times in a loop. Between attempts the controller
+        waits a random time between 0 and `base_delay * 2 ** (attempt - 1)` seconds, capped at
+        `max_delay` (exponential backoff with full jitter), or as long as the server asked with
+        `Retry-After`. A request the server asks to delay longer than `max_delay` is given up.
+
+        Per host, the requests in flight are capped by an AdaptiveLimit that is cut on every 429 and
+        ramps back up on success, and a CircuitBreaker stops sending requests to a host that keeps failing.
+        Attempts failing at a proxy are left to the health score of the proxy pool and never count against the host.
+
+        Args:
+            max_in_flight (int): The highest number of requests in flight per host.
+            max_attempts (int): The number of attempts of one request.
+            base_delay (float): The backoff of the first retry in seconds.
+            max_delay (float): The longest wait between two attempts in seconds.
+            decrease (float): The factor applied to the limit of a host after a 429.
+            breaker_failures (int): The number of failed attempts in a row that open the circuit of a host.
+            breaker_reset (float): The number of seconds the circuit of a host stays open.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the number of attempts is not positive.
+        """
+        if max_attempts < 1:
+            raise ValueError("The parameter max_attempts must be a positive number")
+        self.max_in_flight: int = max_in_flight
+        self.max_attempts: int = max_attempts
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.decrease: float = decrease
+        self.breaker_failures: int = breaker_failures
+        self.breaker_reset: float = breaker_reset
+        self.retries: int = 0   # Number of attempts after the first one
+        self.throttled: int = 0   # Number of 429 responses
+        self.limits: Dict[str, AdaptiveLimit] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def _host(self, url: str) -> str:
+        """Return the host of the URL, creating its limit and circuit breaker on first use."""
+        host: str = urlsplit(url).netloc
+        if host not in self.limits:
+            self.limits[host] = AdaptiveLimit(self.max_in_flight, decrease=self.decrease)
+            self.breakers[host] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return host
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Return the number of seconds to wait after a failed attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 1.
+            retry_after (float, optional): The number of seconds the server asked to wait.
+
+        Returns:
+            float: The jittered exponential backoff, or `retry_after` if the server asked to wait longer.
+        """
+        delay: float = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, url: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run the attempts of one request until one succeeds, retrying the ones that raise RetryableError.
+
+        Args:
+            url (str): The requested URL, its host selects the limit and the circuit breaker.
+            attempt (Callable[[], Awaitable[Any]]): The coroutine function sending the request once.
+
+        Returns:
+            Any: The result of the successful attempt.
+
+        Raises:
+            RetryableError: The error of the last attempt, if every attempt failed or the server asked to wait too long.
+            CircuitOpenError: If the circuit breaker of the host is open.
+            Exception: The error of an attempt that is not retryable, counted as a failure by the circuit breaker.
+        """
+        host: str = self._host(url)
+        limit: AdaptiveLimit = self.limits[host]
+        breaker: CircuitBreaker = self.breakers[host]
+
+        for number in range(1, self.max_attempts + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit breaker of {host} is open after {breaker.failures_in_row} failures in a row")
+
+            # The slot is only held while the request is in flight, not while backing off
+            try:
+                await limit.acquire()
+            except BaseException:
+                breaker.release_trial()
+                raise
+            sent_at: float = monotonic()
+            try:
+                result: Any = await attempt()
+            except RetryableError as e:
+                error: RetryableError = e
+            except Exception:
+                # Any other error is a failed attempt too, so a trial request never stays pending
+                breaker.record(False)
+                raise
+            except BaseException:
+                # A cancelled attempt has no outcome, the next request is the trial
+                breaker.release_trial()
+                raise
+            else:
+                limit.on_success()
+                breaker.record(True)
+                return result
+            finally:
+                limit.release()
+
+            # A 429 means the host is overloaded, so fewer requests are sent to it at once
+            if error.throttled:
+                self.throttled += 1
+                THROTTLED_RESPONSES.inc()
+                limit.on_throttled(sent_at)
+            if error.proxy_failure:
+                # A dead proxy is not the host's fault, the next attempt goes through another proxy
+                breaker.release_trial()
+            else:
+                breaker.record(False)
+            if number == self.max_attempts or (error.retry_after or 0.0) > self.max_delay:
+                raise error
+            self.retries += 1
+            RETRIES.inc()
+            await asyncio.sleep(self.backoff(number, error.retry_after))
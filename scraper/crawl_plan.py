@@ -0,0 +1,55 @@
+from typing import Dict, List, Mapping, NamedTuple, Optional
+from config import get_settings
+
+
+class CrawlTask(NamedTuple):
+    """One category of a crawl plan with its page range. An `end_page` of None means until an empty page."""
+    category_id: int
+    start_page: int
+    end_page: Optional[int]
+
+
+def load_crawl_plan(settings: Mapping = None) -> List[CrawlTask]:
+    """
+    Load the crawl plan from the `crawl_plan` scraping settings.
+
+    Each entry of the plan names a category by its key in `scraping_settings.category_id` (or by its
+    numeric id) together with a `start_page` and an `end_page`. An `end_page` of null crawls the category
+    until an empty page is returned. The category "all" expands to every category of the settings.
+
+    Args:
+        settings (Mapping, optional): The application settings. The settings of the process if None.
+
+    Returns:
+        List[CrawlTask]: The crawl tasks in the order of the plan, each category at most once.
+
+    Raises:
+        ValueError: If a category is unknown or a page range is invalid.
+    """
+    settings = settings or get_settings()
+    categories: Dict[str, int] = settings['scraping_settings']['category_id']
+    plan: List[Mapping] = settings['scraping_settings'].get('crawl_plan', [])
+
+    tasks: Dict[int, CrawlTask] = {}
+    for entry in plan:
+        start_page: int = entry.get('start_page', 1)
+        end_page: Optional[int] = entry.get('end_page')
+
+        # Validate the page range
+        if start_page < 1 or (end_page is not None and end_page < start_page):
+            raise ValueError(f"Invalid page range {start_page}-{end_page} in crawl plan entry {entry}")
+
+        # Resolve the category name or id to the list of category ids
+        category = entry['category']
+        if category == 'all':
+            category_ids: List[int] = list(categories.values())
+        elif category in categories:
+            category_ids = [categories[category]]
+        elif category in categories.values():
+            category_ids = [category]
+        else:
+            raise ValueError(f"Unknown category {category!r} in crawl plan")
+
+        for category_id in category_ids:
+            tasks.setdefault(category_id, CrawlTask(category_id, start_page, end_page))
+    return list(tasks.values())
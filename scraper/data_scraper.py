@@ -1,11 +1,17 @@
+from __future__ import annotations
 import numpy as np
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
 import os
 import logging
 from dotenv import load_dotenv
-import pandas as pd
 from logs import logger
+from logs.logger import LogSampler
 from database.models import DatabaseManagerSettings, MotionsElements
+from database.seen_urls import SeenUrlFilter
+
+# pandas is imported on first use, it is the largest part of the start-up time
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # Load environment variables
@@ -17,6 +23,66 @@ LOG_DIR_SCRAPING = os.getenv('LOG_DIR_SCRAPING')
 # Create logger object
 logger = logger.get_logger(log_file=LOG_DIR_SCRAPING, log_level=logging.INFO)
 
+# Per-batch messages are sampled, with a periodic summary of the suppressed ones
+batch_log = LogSampler(logger)
+
+# Field paths of the extracted columns in one item of the search API response
+ITEM_FIELD_PATHS: Dict[str, Tuple] = {
+    "mp4_url": ("previews", "mp4", "url"),
+    "webm_url": ("previews", "webm", "url"),
+    "category_id": ("categories", 0, "id"),
+    "category_name": ("categories", 0, "name"),
+    "price": ("price",),
+    "currency": ("currency",),
+    "name": ("name",),
+}
+
+
+# Placeholder for missing objects on a field path
+_EMPTY: Dict = {}
+
+
+def _compile_row_extractor(field_paths: Dict[str, Tuple]) -> Callable[[Dict[str, Any]], Tuple]:
+    """
+    Compile field paths to one function reading all fields of an item into a row tuple.
+
+    The generated function looks up every shared prefix of the paths once, e.g. `previews` for the
+    mp4 and the webm url, and reads the fields with plain `.get()` and index lookups without any
+    loop or per-field function call.
+
+    Args:
+        field_paths (Dict[str, Tuple]): The keys and list indexes leading to every field, in column order.
+
+    Returns:
+        Callable[[Dict[str, Any]], Tuple]: The function returning the fields of one item, NaN if missing or empty.
+    """
+    lines: List[str] = []
+    names: Dict[Tuple, str] = {(): "item"}
+
+    def lookup(parent: str, key: Any) -> str:
+        # Dictionary keys are read with .get(), list indexes only if the list is long enough
+        if isinstance(key, int):
+            return f"({parent}[{key}] if len({parent}) > {key} else None)"
+        return f"{parent}.get({key!r})"
+
+    # Bind every shared prefix of the paths to a local variable once
+    for path in field_paths.values():
+        for depth in range(1, len(path)):
+            prefix: Tuple = path[:depth]
+            if prefix not in names:
+                names[prefix] = f"value_{len(names)}"
+                lines.append(f"    {names[prefix]} = {lookup(names[path[:depth - 1]], path[depth - 1])} or _EMPTY")
+
+    fields: str = ", ".join(f"{lookup(names[path[:-1]], path[-1])} or nan" for path in field_paths.values())
+    source: str = "def extract_row(item):\n" + "\n".join(lines) + f"\n    return ({fields},)\n"
+    namespace: Dict[str, Any] = {"_EMPTY": _EMPTY, "nan": np.nan}
+    exec(compile(source, "<item row extractor>", "exec"), namespace)
+    return namespace["extract_row"]
+
+
+# Compiled extractor of one row per item, in the column order of ITEM_FIELD_PATHS
+extract_item_row: Callable[[Dict[str, Any]], Tuple] = _compile_row_extractor(ITEM_FIELD_PATHS)
+
 
 class DataScraper:
     def __init__(self) -> None:
@@ -63,6 +129,7 @@ class DataScraper:
         Note:
             If any of the required keys are not found in the JSON data, the corresponding list will be empty.
             NaN values are used to represent missing values in the lists.
+            Every call returns a new result and stores it in `list_urls`, so one instance can be reused across pages.
 
         Example:
             >>> data_scraper = DataScraper()
@@ -94,68 +161,125 @@ class DataScraper:
                 "name": ["Example"]
             }
         """
-        # Loop through the JSON data and extract the mp4 and webm urls
-        for data in json_data:
-            start_point: List[Dict[str, Any]] = data.get('data')
+        rows: np.ndarray = self._get_rows(json_data)
 
-            # If no data is found, break the loop and return an empty list
-            if len(start_point) == 0 or not start_point:
-                break
+        # Convert the column buffers to lists, a new result for every call
+        self.list_urls = {column: rows[:, index].tolist() for index, column in enumerate(ITEM_FIELD_PATHS)}
 
-            # Append the mp4 and webm urls to the list if they exist
-            for point in start_point:
-                previews: Dict[str, Any] = point.get('previews')
-                categories: List[Dict[str, Any]] = point.get('categories')
+        # Print the number of mp4 and webm urls found
+        logger.info(f"Number of mp4 urls: {len(self.list_urls['mp4_url'])} and webm urls: {len(self.list_urls['webm_url'])}")
 
-                mp4_url: str = previews.get('mp4', {}).get('url')
-                self.list_urls["mp4_url"].append(mp4_url if mp4_url else np.nan)
+        # Return the list of mp4, webm urls, category ids, and category names
+        return self.list_urls
 
-                webm_url: str = previews.get('webm', {}).get('url')
-                self.list_urls["webm_url"].append(webm_url if webm_url else np.nan)
+    def _get_rows(self, json_data: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Extracts the fields of all items from the given JSON data into one preallocated buffer.
 
-                category_id: int = categories[0].get("id")
-                self.list_urls["category_id"].append(category_id if category_id else np.nan)
+        The number of items is counted first, so the buffer is allocated once, and it is then filled
+        page by page with the compiled row extractor. As in `_get_url`, the extraction stops at the
+        first page without data and missing or empty fields are NaN.
 
-                category_name: str = categories[0].get("name")
-                self.list_urls["category_name"].append(category_name if category_name else np.nan)
+        Args:
+            json_data (List[Dict[str, Any]]): A list of dictionaries representing JSON data.
 
-                price = point.get('price')
-                self.list_urls["price"].append(price if price else np.nan)
+        Returns:
+            np.ndarray: An object array with one row per item and one column per field of `ITEM_FIELD_PATHS`.
+        """
+        # Collect the item lists up to the first page without data
+        pages: List[List[Dict[str, Any]]] = []
+        for data in json_data:
+            items: List[Dict[str, Any]] = data.get('data')
+            if not items:
+                break
+            pages.append(items)
 
-                currency = point.get('currency')
-                self.list_urls["currency"].append(currency if currency else np.nan)
+        # Allocate the buffer once and fill it page by page
+        rows: np.ndarray = np.empty((sum(map(len, pages)), len(ITEM_FIELD_PATHS)), dtype=object)
+        start: int = 0
+        for items in pages:
+            rows[start:start + len(items)] = list(map(extract_item_row, items))
+            start += len(items)
+        return rows
 
-                name = point.get('name')
-                self.list_urls["name"].append(name if name else np.nan)
-                
-        # Print the number of mp4 and webm urls found
-        logger.info(f"Number of mp4 urls: {len(self.list_urls['mp4_url'])} and webm urls: {len(self.list_urls['webm_url'])}")
+    def _get_frame(self, json_data: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Extracts the items of the given JSON data into a DataFrame.
 
-        # Return the list of mp4, webm urls, category ids, and category names
-        return self.list_urls
+        The DataFrame wraps the buffer of `_get_rows` as a single block without copying it.
+
+        Args:
+            json_data (List[Dict[str, Any]]): A list of dictionaries representing JSON data.
+
+        Returns:
+            pd.DataFrame: One row per item with the columns of `ITEM_FIELD_PATHS`.
+        """
+        import pandas as pd
+        return pd.DataFrame(self._get_rows(json_data), columns=list(ITEM_FIELD_PATHS), copy=False)
 
 
 class CheckNewItems:
-    def __init__(self) -> None:
+    def __init__(self, db_manager_settings: DatabaseManagerSettings = None, use_seen_filter: bool = True) -> None:
         """
         Initializes the CheckNewItems class.
 
         This method creates an instance of the DatabaseManagerSettings class and assigns it to the `db_manager_settings` attribute of the CheckNewItems class.
+        It also loads the seen-URL filter of the database once per process, which answers "definitely new"
+        for most URLs without querying the database.
 
         Parameters:
-            None
+            db_manager_settings (DatabaseManagerSettings, optional): An existing database manager to use
+                instead of creating a new one.
+            use_seen_filter (bool): Whether to check the URLs against the seen-URL filter before the database.
 
         Returns:
             None
         """
-        self.db_manager_settings = DatabaseManagerSettings()
+        self.db_manager_settings = db_manager_settings or DatabaseManagerSettings()
+        self.seen_filter: SeenUrlFilter = (
+            SeenUrlFilter.for_database(self.db_manager_settings, MotionsElements) if use_seen_filter else None
+        )
+
+        # Define column names of the dataframe with new details
+        self.column_names: list = [
+            "mp4_url",
+            "webm_url",
+            "category_id",
+            "category_name",
+            "price",
+            "currency",
+            "name",
+        ]
 
     def compare_details_with_db(self, list_urls) -> pd.DataFrame:
         """
-        Compares a list of URLs with a database to find new details to insert.
+        Compares a list of URLs with a database to find new details to insert, then closes the session.
+
+        The seen-URL filter is not saved here but by `close_connection` at shutdown. A caller comparing many
+        batches, like the scrape pipeline, uses `find_new_items` and closes the session once at the end instead.
+
+        Args:
+            list_urls (dict or pd.DataFrame): A dictionary of URLs, or the DataFrame of `DataScraper._get_frame`,
+                to compare with the database.
+
+        Returns:
+            pd.DataFrame: A dataframe containing the new details to insert into the database.
+        """
+        df_to_insert: pd.DataFrame = self.find_new_items(list_urls)
+
+        # Close the session, the seen-URL filter is saved once at shutdown
+        self.db_manager_settings.close_session()
+
+        # Return the dataframe with new details
+        return df_to_insert
+
+    def find_new_items(self, list_urls) -> pd.DataFrame:
+        """
+        Compares a list of URLs with a database to find new details to insert, leaving the connection open.
 
         Args:
-            list_urls (list or dict): A list or dictionary of URLs to compare with the database.
+            list_urls (dict or pd.DataFrame): A dictionary of URLs, or the DataFrame of `DataScraper._get_frame`,
+                to compare with the database.
 
         Returns:
             pd.DataFrame: A dataframe containing the new details to insert into the database.
@@ -167,77 +291,94 @@ class CheckNewItems:
 
         Note:
             - The function creates a dataframe from the `list_urls` parameter.
-            - The function defines column names for a blank dataframe to store new details.
-            - The function loops through each row in the dataframe and checks if the URL already exists in the database.
-            - If a new URL is found, the corresponding row is added to the dataframe.
-            - If the URL is already in the database, the function skips it.
-            - The function closes the database connection.
-            - The function returns the dataframe with new details.
-        """
-        print("\t*** Start comparing details with database ***")
-        if not list_urls:
-            logger.error("The parameter list_urls cannot be empty")
-            # raise ValueError('The parameter cars_details cannot be empty')
-        if not isinstance(list_urls, Dict):
-            logger.error("The parameter list_urls must be a Dict")
-            # raise TypeError('The parameter cars_details must be a list')
-
-        # Create dataframe from list
-        df: pd.DataFrame = pd.DataFrame(list_urls)
-
-        # Define column names for the blank dataframe to store new details
-        column_names: list = [
-            "mp4_url",
-            "webm_url",
-            "category_id",
-            "category_name",
-            "price",
-            "currency",
-            "name",
-        ]
-        
-        # Create blank dataframe to store new details
-        df_to_insert: pd.DataFrame = pd.DataFrame(columns=column_names)
+            - The function skips URLs the seen-URL filter reports as definitely new.
+            - The function looks up the remaining URLs in the database with chunked `IN (...)` queries.
+            - The function selects the new rows with a single vectorized membership mask.
+            - The function returns the dataframe with new details, identical to the row by row comparison.
+        """
+        import pandas as pd
+        if isinstance(list_urls, pd.DataFrame):
+            # Use the extracted DataFrame as it is
+            df: pd.DataFrame = list_urls[self.column_names]
+        else:
+            if not list_urls:
+                logger.error("The parameter list_urls cannot be empty")
+                # raise ValueError('The parameter cars_details cannot be empty')
+            if not isinstance(list_urls, Dict):
+                logger.error("The parameter list_urls must be a Dict")
+                # raise TypeError('The parameter cars_details must be a list')
+
+            # Create dataframe from list
+            df = pd.DataFrame(list_urls, columns=self.column_names)
 
         try:
-            # Loop through each row in the dataframe
-            for index, row in df.iterrows():
-                # Get URL from dataframe
-                mp4_url: str = row["mp4_url"]
-                
-                # Check if URL already exists in the database
-                df_database: pd.DataFrame = self.db_manager_settings.read_data(
-                    model=MotionsElements, conditions=MotionsElements.mp4_url == mp4_url
-                )
-                
-                # If the URL is not in the database, add it to the dataframe
-                if mp4_url not in df_database["mp4_url"].values:
-                    logger.info(f"New URL found: {mp4_url}")
-                    
-                    # If a new URL is found, return the corresponding row
-                    row_to_insert: pd.DataFrame = pd.DataFrame(
-                        [row.values], columns=column_names
-                    )
-                    
-                    # Append the new row to the dataframe
-                    df_to_insert: pd.DataFrame = pd.concat(
-                        [df_to_insert, row_to_insert], ignore_index=True
-                    )
-                    
-                # If the URL is already in the database, skip it
-                if mp4_url in df_database["mp4_url"].values:
-                    logger.info(
-                        f"Skipping... URL already exists in the database: {mp4_url}"
-                    )
-                    continue
-                
-        # Handle any exceptions that occur during the loop
+            # Only URLs the filter may have seen need to be confirmed against the database
+            candidate_urls: pd.Series = df["mp4_url"]
+            if self.seen_filter is not None:
+                candidate_urls = candidate_urls[self.seen_filter.maybe_seen(candidate_urls)]
+
+            # Look up the candidate URLs in the database at once
+            existing_urls: set = self.db_manager_settings.read_existing_values(
+                MotionsElements.mp4_url, candidate_urls
+            )
+
+            # Keep only the rows whose URL is not in the database yet
+            is_new: np.ndarray = ~df["mp4_url"].isin(existing_urls).to_numpy()
+            df_to_insert: pd.DataFrame = df.loc[is_new].reset_index(drop=True).astype(object)
+
+            batch_log.info(
+                "compare",
+                "New URLs found: %d, skipped URLs already in the database: %d, URLs confirmed against the database: %d",
+                int(is_new.sum()), int((~is_new).sum()), len(candidate_urls),
+            )
+
+        # Handle any exceptions that occur during the comparison
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
             raise
-        
-        # Close the database connection
-        self.db_manager_settings.close_connection()
-        
+
+        # Return the dataframe with new details
+        return df_to_insert
+
+    def _compare_details_row_by_row(self, list_urls) -> pd.DataFrame:
+        """
+        Compares the URLs with the database one row at a time.
+
+        This is the original comparison that runs one query per scraped row. It is kept as
+        the reference implementation for tests and benchmarks of `compare_details_with_db`.
+
+        Args:
+            list_urls (dict): A dictionary of URLs to compare with the database.
+
+        Returns:
+            pd.DataFrame: A dataframe containing the new details to insert into the database.
+        """
+        import pandas as pd
+
+        # Create dataframe from list
+        df: pd.DataFrame = pd.DataFrame(list_urls, columns=self.column_names)
+
+        # Create blank dataframe to store new details
+        df_to_insert: pd.DataFrame = pd.DataFrame(columns=self.column_names)
+
+        # Loop through each row in the dataframe
+        for index, row in df.iterrows():
+            # Get URL from dataframe
+            mp4_url: str = row["mp4_url"]
+
+            # Check if URL already exists in the database
+            df_database: pd.DataFrame = self.db_manager_settings.read_data(
+                model=MotionsElements, conditions=MotionsElements.mp4_url == mp4_url
+            )
+
+            # If the URL is not in the database, append the corresponding row to the dataframe
+            if mp4_url not in df_database["mp4_url"].values:
+                row_to_insert: pd.DataFrame = pd.DataFrame(
+                    [row.values], columns=self.column_names
+                )
+                df_to_insert: pd.DataFrame = pd.concat(
+                    [df_to_insert, row_to_insert], ignore_index=True
+                )
+
         # Return the dataframe with new details
-        return df_to_insert
\ No newline at end of file
+        return df_to_insert
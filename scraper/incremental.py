@@ -0,0 +1,164 @@
+from typing import Any, Dict, List, Optional, Set
+import os
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import select
+from logs import logger
+from database.models import DatabaseManagerSettings, MotionsElements
+from database.seen_urls import SeenUrlFilter
+from scraper.data_scraper import ITEM_FIELD_PATHS, DataScraper
+from scraper.parse_pool import RowBatch
+
+
+# Load environment variables
+load_dotenv()
+
+# Load logger settings from .env file
+LOG_DIR_SCRAPING = os.getenv("LOG_DIR_SCRAPING")
+
+# Create logger object
+logger = logger.get_logger(log_file=LOG_DIR_SCRAPING, log_level=logging.INFO)
+
+# Column of the item URL in the extracted rows
+_URL_COLUMN: int = list(ITEM_FIELD_PATHS).index("mp4_url")
+
+
+def _page_urls(json_page: Dict[str, Any]) -> List[str]:
+    """
+    Return the item URLs of a fetched page.
+
+    The rows of a decoded page are extracted here once and put under `data` as a RowBatch, like the
+    pages of a parse pool, so the scrape pipeline reuses them instead of parsing the page again.
+
+    Args:
+        json_page (Dict[str, Any]): The decoded page, or the page of a parse pool with a RowBatch under `data`.
+
+    Returns:
+        List[str]: The item URLs in the order of the page, items without a URL are skipped.
+    """
+    data = json_page.get('data')
+    if not isinstance(data, RowBatch):
+        data = json_page['data'] = RowBatch(DataScraper()._get_rows([json_page]))
+    rows: np.ndarray = data.rows
+    return [url for url in rows[:, _URL_COLUMN].tolist() if isinstance(url, str)]
+
+
+class IncrementalCrawl:
+    def __init__(self, category_id: int, start_page: int, db_manager_settings: DatabaseManagerSettings,
+                 high_water_url: Optional[str] = None, sort: str = "newest", known_pages_to_stop: int = 2) -> None:
+        """
+        Initializes the stop condition of an incremental crawl of one category in a newest-first sort order.
+
+        Every page is checked as soon as it arrives, before its rows reach the database. A page is
+        the last page of the crawl if it holds the high-water mark of the previous complete crawl, if
+        it is empty, or if it ends a run of `known_pages_to_stop` pages in a row whose URLs are all
+        already known. A URL is known if the seen-URL filter may have seen it and the database confirms it.
+
+        The crawl is complete once its last page is found and every page before it was fetched. Only
+        then is the newest URL of the crawl a valid high-water mark for the next run.
+
+        Args:
+            category_id (int): The category ID.
+            start_page (int): The first page of the crawl, holding the newest items.
+            db_manager_settings (DatabaseManagerSettings): The manager of the database the URLs are looked up in.
+            high_water_url (str, optional): The high-water mark of the previous complete crawl.
+            sort (str): The newest-first sort order of the search API.
+            known_pages_to_stop (int): The number of known pages in a row that end the crawl.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If `known_pages_to_stop` is not positive.
+        """
+        if known_pages_to_stop < 1:
+            raise ValueError("The parameter known_pages_to_stop must be a positive number")
+        self.category_id: int = category_id
+        self.start_page: int = start_page
+        self.db_manager_settings: DatabaseManagerSettings = db_manager_settings
+        self.seen_filter: SeenUrlFilter = SeenUrlFilter.for_database(db_manager_settings, MotionsElements)
+        self.high_water_url: Optional[str] = high_water_url
+        self.sort: str = sort
+        self.known_pages_to_stop: int = known_pages_to_stop
+        self.newest_url: Optional[str] = None   # URL of the first item of the first page
+        self.last_page: Optional[int] = None   # First page at which the crawl stops
+        self._known_pages: Set[int] = set()
+        self._failed_pages: Set[int] = set()
+
+    @property
+    def complete(self) -> bool:
+        """Whether the last page was found and every page before it was fetched."""
+        return self.last_page is not None and not any(page < self.last_page for page in self._failed_pages)
+
+    async def _known_urls(self, urls: List[str]) -> Set[str]:
+        """
+        Return the URLs of one page that are already in the database.
+
+        Args:
+            urls (List[str]): The URLs of the page.
+
+        Returns:
+            Set[str]: The known URLs.
+        """
+        # URLs the filter has never seen are new without a query
+        candidates: List[str] = [url for url, seen in zip(urls, self.seen_filter.maybe_seen(urls)) if seen]
+        if not candidates:
+            return set()
+
+        # The query runs in the database thread, so the event loop keeps fetching
+        return await self.db_manager_settings.run(self._select_known_urls, candidates)
+
+    def _select_known_urls(self, candidates: List[str]) -> Set[str]:
+        """Select the candidate URLs that are in the database, in the database thread."""
+        # A page has fewer URLs than the bound parameter limit, and the connection is released right away
+        statement = select(MotionsElements.mp4_url).where(MotionsElements.mp4_url.in_(candidates))
+        with self.db_manager_settings.engine.connect() as connection:
+            return set(connection.execute(statement).scalars())
+
+    async def check_page(self, page: int, json_page: Optional[Dict[str, Any]]) -> bool:
+        """
+        Record a fetched page and return whether the crawl stops at it.
+
+        The database lookup of the page's URLs runs in the database thread, never on the event loop.
+
+        Args:
+            page (int): The page number.
+            json_page (Dict[str, Any] or None): The fetched page, or None if the request failed.
+
+        Returns:
+            bool: True if no page after this one needs to be fetched.
+        """
+        if json_page is None:
+            self._failed_pages.add(page)
+            return False
+
+        urls: List[str] = _page_urls(json_page) if json_page.get('data') else []
+        if page == self.start_page and urls:
+            self.newest_url = urls[0]
+
+        if not json_page.get('data'):
+            # The end of the results
+            reason: str = "empty page"
+        elif self.high_water_url is not None and self.high_water_url in urls:
+            # The newest item of the previous crawl, every item after it is known
+            reason = "high-water mark"
+        elif urls and len(await self._known_urls(urls)) == len(set(urls)):
+            # A known page ends the crawl if it completes a run of known pages
+            self._known_pages.add(page)
+            first: int = page
+            while first - 1 in self._known_pages:
+                first -= 1
+            last: int = page
+            while last + 1 in self._known_pages:
+                last += 1
+            if last - first + 1 < self.known_pages_to_stop:
+                return False
+            reason = f"{self.known_pages_to_stop} known pages in a row"
+        else:
+            return False
+
+        if self.last_page is None or page < self.last_page:
+            self.last_page = page
+            logger.info(f"Incremental crawl of category {self.category_id} stops at page {page}: {reason}")
+        return True
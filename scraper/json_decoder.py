@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, TypedDict
+import asyncio
+import json
+from config import ScrapingSettings, get_settings
+
+# Optional faster JSON decoders, the standard library is the fallback
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Keys of the pagination metadata giving the number of the last page directly
+LAST_PAGE_KEYS: tuple = ('last_page', 'lastPage', 'total_pages', 'totalPages', 'page_count', 'pageCount')
+
+# Keys of the pagination metadata giving the total item count
+TOTAL_COUNT_KEYS: tuple = ('total', 'total_count', 'totalCount', 'total_results', 'totalResults')
+
+# Keys of the pagination metadata giving the number of items per page
+PER_PAGE_KEYS: tuple = ('per_page', 'perPage')
+
+# Fields of a search API page read by the scraper. A list holds the fields of its elements, None keeps the whole value.
+SEARCH_PAGE_FIELDS: Dict[str, Any] = {
+    "data": [{
+        "previews": {"mp4": {"url": None}, "webm": {"url": None}},
+        "categories": [{"id": None, "name": None}],
+        "price": None,
+        "currency": None,
+        "name": None,
+    }],
+    "meta": None,
+    "pagination": None,
+    **{key: None for key in LAST_PAGE_KEYS + TOTAL_COUNT_KEYS + PER_PAGE_KEYS},
+}
+
+
+def _schema_type(name: str, fields: Any) -> Any:
+    """
+    Build the typed schema of a field specification as nested TypedDicts.
+
+    Args:
+        name (str): The name of the TypedDict.
+        fields (Any): The field specification in the format of `SEARCH_PAGE_FIELDS`.
+
+    Returns:
+        Any: The type of the value, every container may also be null.
+    """
+    if fields is None:
+        return Any
+    if isinstance(fields, list):
+        return Optional[List[_schema_type(name, fields[0])]]
+    return Optional[TypedDict(name, {key: _schema_type(name + key.title(), value) for key, value in fields.items()}, total=False)]
+
+
+# Typed schema of a search API page, the decoders skip every field not in it
+SearchPage = _schema_type("SearchPage", SEARCH_PAGE_FIELDS)
+
+
+def _project(value: Any, fields: Any) -> Any:
+    """
+    Keep only the specified fields of a decoded value.
+
+    Args:
+        value (Any): The decoded value.
+        fields (Any): The field specification in the format of `SEARCH_PAGE_FIELDS`.
+
+    Returns:
+        Any: The value with the fields not in the specification removed.
+    """
+    if fields is None or value is None:
+        return value
+    if isinstance(fields, list):
+        return [_project(element, fields[0]) for element in value] if isinstance(value, list) else value
+    if not isinstance(value, dict):
+        return value
+    return {key: _project(value[key], spec) for key, spec in fields.items() if key in value}
+
+
+# Decoders of every backend, msgspec only materializes the fields of the schema
+_DECODERS: Dict[str, Any] = {"json": json.loads}
+if orjson is not None:
+    _DECODERS["orjson"] = orjson.loads
+if msgspec is not None:
+    _DECODERS["msgspec"] = msgspec.json.Decoder(SearchPage).decode
+
+# Backends in the order of preference
+_PREFERRED_BACKENDS: tuple = ("msgspec", "orjson", "json")
+
+
+def _decode_page(backend: str, body: bytes) -> Dict[str, Any]:
+    """
+    Decode a page in a worker process and keep only the schema fields, so little data is sent back.
+
+    Args:
+        backend (str): The name of the decoder backend.
+        body (bytes): The response body.
+
+    Returns:
+        Dict[str, Any]: The decoded page.
+    """
+    page: Dict[str, Any] = _DECODERS[backend](body)
+    return page if backend == "msgspec" else _project(page, SEARCH_PAGE_FIELDS)
+
+
+# Worker pools shared by all decoders of the process, keyed by the number of workers
+_worker_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+class JsonDecoder:
+    def __init__(self, backend: str = "auto", offload_bytes: int = 2 * 1024 * 1024, workers: int = 2) -> None:
+        """
+        Initializes a JSON decoder of search API responses.
+
+        The backend "auto" selects the fastest installed decoder: msgspec with the typed schema of
+        `SEARCH_PAGE_FIELDS`, which skips every other field while decoding, then orjson, then the
+        standard library. Bodies of at least `offload_bytes` bytes are decoded in a pool of worker
+        processes, because the decoders hold the GIL and would block the event loop. The worker
+        keeps only the schema fields of the page, so little data is sent back to the event loop.
+
+        Args:
+            backend (str): "auto", "msgspec", "orjson", or "json".
+            offload_bytes (int): The body size from which the body is decoded in a worker process.
+            workers (int): The number of worker processes, 0 decodes every body on the event loop.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the backend is unknown or not installed.
+        """
+        if backend == "auto":
+            backend = next(name for name in _PREFERRED_BACKENDS if name in _DECODERS)
+        if backend not in _DECODERS:
+            raise ValueError(f"JSON decoder backend {backend!r} is unknown or not installed")
+        self.backend: str = backend
+        self.offload_bytes: int = offload_bytes
+        self.workers: int = workers
+        self._decode = _DECODERS[backend]
+
+    def decode(self, body: bytes) -> Dict[str, Any]:
+        """
+        Decode a response body on the calling thread.
+
+        Args:
+            body (bytes): The response body.
+
+        Returns:
+            Dict[str, Any]: The decoded page.
+
+        Raises:
+            ValueError: If the body is not valid JSON or does not match the schema.
+        """
+        return self._decode(body)
+
+    async def decode_async(self, body: bytes) -> Dict[str, Any]:
+        """
+        Asynchronously decode a response body, in a worker process if it is large.
+
+        Args:
+            body (bytes): The response body.
+
+        Returns:
+            Dict[str, Any]: The decoded page.
+
+        Raises:
+            ValueError: If the body is not valid JSON or does not match the schema.
+        """
+        if self.workers < 1 or len(body) < self.offload_bytes:
+            return self._decode(body)
+
+        # The pool is created on first use and shared by all decoders with the same number of workers
+        if self.workers not in _worker_pools:
+            _worker_pools[self.workers] = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(_worker_pools[self.workers], _decode_page, self.backend, body)
+
+
+# Decoder configured with the scraping settings, created on first use
+_default_decoder: Optional[JsonDecoder] = None
+
+
+def get_default_decoder() -> JsonDecoder:
+    """
+    Return the decoder configured with the `json_decoder`, `json_offload_bytes`, and `json_decode_workers` scraping settings.
+
+    Returns:
+        JsonDecoder: The decoder shared by all scrapers of the process.
+    """
+    global _default_decoder
+    if _default_decoder is None:
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        _default_decoder = JsonDecoder(
+            backend=scraping_settings.json_decoder,
+            offload_bytes=scraping_settings.json_offload_bytes,
+            workers=scraping_settings.json_decode_workers,
+        )
+    return _default_decoder
@@ -0,0 +1,160 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import numpy as np
+from scraper.data_scraper import ITEM_FIELD_PATHS, DataScraper
+from scraper.json_decoder import _DECODERS, SEARCH_PAGE_FIELDS, JsonDecoder
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class RowBatch:
+    """Columnar rows of one page extracted in a worker process or by an incremental crawl, one row per item and one column per field."""
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: np.ndarray) -> None:
+        self.rows: np.ndarray = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Wrap the rows in a DataFrame without copying them."""
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=list(ITEM_FIELD_PATHS), copy=False)
+
+
+def _parse_body(backend: str, body: bytes) -> Dict[str, Any]:
+    """
+    Decode a response body and extract its items in a worker process.
+
+    Args:
+        backend (str): The name of the decoder backend.
+        body (bytes): The response body.
+
+    Returns:
+        Dict[str, Any]: The pagination metadata of the page, with the extracted items as a RowBatch under `data`.
+    """
+    page: Dict[str, Any] = _DECODERS[backend](body)
+    parsed_page: Dict[str, Any] = {key: page[key] for key in SEARCH_PAGE_FIELDS if key in page and key != 'data'}
+    parsed_page['data'] = RowBatch(DataScraper()._get_rows([page]))
+    return parsed_page
+
+
+def _parse_bodies(backend: str, bodies: List[bytes]) -> List[Any]:
+    """
+    Parse a batch of response bodies in a worker process, so the batch costs one round trip.
+
+    Args:
+        backend (str): The name of the decoder backend.
+        bodies (List[bytes]): The response bodies.
+
+    Returns:
+        List[Any]: The parsed page of every body, or the ValueError raised while parsing it.
+    """
+    results: List[Any] = []
+    for body in bodies:
+        try:
+            results.append(_parse_body(backend, body))
+        except ValueError as e:
+            results.append(e)
+    return results
+
+
+class ParsePool:
+    def __init__(self, workers: int, backend: str = "auto", max_batch: int = 16) -> None:
+        """
+        Initializes a pool of long-lived worker processes parsing response bodies.
+
+        The event loop only hands the raw body over to a worker and receives the page back with its
+        items already extracted into a compact RowBatch. Decoding and extraction, the CPU bound part
+        of a page, run on as many cores as there are workers, so the event loop stays free for I/O.
+
+        Each round trip to a worker costs the event loop about as much as a third of parsing a page
+        itself, so bodies are sent in batches. At most two batches per worker are in flight. Bodies
+        that arrive meanwhile wait and leave together in the next batch of up to `max_batch` bodies.
+        A lightly loaded pool thus parses every page at once, and a busy pool pays one round trip
+        for many pages.
+
+        Args:
+            workers (int): The number of worker processes.
+            backend (str): The JSON decoder backend used by the workers, see JsonDecoder.
+            max_batch (int): The maximum number of bodies sent to a worker at once.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the number of workers or the batch size is not positive or the backend is not installed.
+        """
+        if workers < 1 or max_batch < 1:
+            raise ValueError("The parameters workers and max_batch must be positive numbers")
+        self.workers: int = workers
+        self.max_batch: int = max_batch
+        self.backend: str = JsonDecoder(backend).backend
+        self.batches: int = 0   # Number of batches sent to the workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._in_flight: int = 0
+
+    async def parse(self, body: bytes) -> Dict[str, Any]:
+        """
+        Asynchronously parse a response body in a worker process.
+
+        Args:
+            body (bytes): The response body.
+
+        Returns:
+            Dict[str, Any]: The pagination metadata of the page, with the extracted items as a RowBatch under `data`.
+
+        Raises:
+            ValueError: If the body is not valid JSON or does not match the schema.
+        """
+        # The workers are started on first use and stay alive until the pool is closed
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending.append((body, future))
+        self._submit()
+        return await future
+
+    def _submit(self) -> None:
+        """Send the waiting bodies to the workers in batches while fewer than two batches per worker are in flight."""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while self._pending and self._in_flight < self.workers * 2:
+            batch: List[Tuple[bytes, asyncio.Future]] = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            self._in_flight += 1
+            self.batches += 1
+            task: asyncio.Future = loop.run_in_executor(self._executor, _parse_bodies, self.backend, [body for body, _ in batch])
+            task.add_done_callback(functools.partial(self._complete, batch))
+
+    def _complete(self, batch: List[Tuple[bytes, asyncio.Future]], task: asyncio.Future) -> None:
+        """Hand the results of a finished batch to the waiting callers and send the next batch."""
+        self._in_flight -= 1
+        error: Optional[BaseException] = None if task.cancelled() else task.exception()
+        results: List[Any] = [error or asyncio.CancelledError()] * len(batch) if task.cancelled() or error else task.result()
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        if self._executor is not None:
+            self._submit()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+
+        Returns:
+            None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
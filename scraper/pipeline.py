@@ -0,0 +1,228 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+import asyncio
+import os
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from logs import logger
+from metrics import REGISTRY
+from scraper.data_scraper import ITEM_FIELD_PATHS, CheckNewItems, DataScraper
+from scraper.parse_pool import RowBatch
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Load environment variables
+load_dotenv()
+
+# Load logger settings from .env file
+LOG_DIR_SCRAPING = os.getenv("LOG_DIR_SCRAPING")
+
+# Create logger object
+logger = logger.get_logger(log_file=LOG_DIR_SCRAPING, log_level=logging.INFO)
+
+# Metrics of the pipeline stages
+QUEUE_DEPTH = REGISTRY.gauge("pipeline_queue_depth", "Items waiting in a pipeline queue", ("queue",))
+EXTRACT_SECONDS = REGISTRY.histogram("pipeline_extract_seconds", "Duration of the row extraction of one page on the event loop")
+WRITE_SECONDS = REGISTRY.histogram("pipeline_write_seconds", "Duration of comparing and inserting one micro-batch", ("operation",))
+PIPELINE_ROWS = REGISTRY.counter("pipeline_rows_total", "Rows passing a pipeline stage", ("stage",))
+
+
+class ScrapePipeline:
+    def __init__(self, db_manager_settings, Model, check_new_items: CheckNewItems = None, batch_size: int = 500,
+                 queue_size: int = 16) -> None:
+        """
+        Initializes a streaming pipeline from fetched pages to database rows.
+
+        Pages handed to `on_page` go through two stages connected by bounded queues. The parse stage
+        extracts the rows of every page as soon as it arrives. The write stage collects the parsed rows
+        into micro-batches and compares them with the database in a single database thread, so the event
+        loop keeps fetching while the database works. The new rows of a batch are queued on the writer
+        thread of the database, which group commits them with the other queued writes, while the next
+        batch is already compared. A batch is written when it reaches `batch_size` rows or when no more
+        parsed pages are waiting. When a queue is full, or `queue_size` inserts are waiting for their
+        commit, `on_page` waits, so a slow database slows down the fetching instead of piling up pages in memory.
+
+        Args:
+            db_manager_settings (DatabaseManagerSettings): The manager of the database the rows are inserted into.
+            Model (declarative_base): The SQLAlchemy model of the rows.
+            check_new_items (CheckNewItems, optional): The comparison with the database. Created for the database if None.
+            batch_size (int): The number of rows after which a micro-batch is written.
+            queue_size (int): The maximum number of pages waiting in each queue, and of inserts waiting for their commit.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the batch size or the queue size is not positive.
+        """
+        if batch_size < 1 or queue_size < 1:
+            raise ValueError("The parameters batch_size and queue_size must be positive numbers")
+        self.db_manager_settings = db_manager_settings
+        self.Model = Model
+        self.check_new_items: CheckNewItems = check_new_items or CheckNewItems(db_manager_settings)
+        self.batch_size: int = batch_size
+        self.queue_size: int = queue_size
+        self.pages: int = 0   # Number of pages handed to the pipeline
+        self.parsed_rows: int = 0   # Number of rows extracted from the pages
+        self.inserted_rows: int = 0   # Number of new rows written to the database
+        self.batches: int = 0   # Number of written micro-batches
+        self.error: Optional[BaseException] = None
+        self._page_queue: asyncio.Queue = None
+        self._row_queue: asyncio.Queue = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor = None
+        self._inserts: Set[asyncio.Future] = set()   # Inserts queued on the writer thread, not committed yet
+
+    def start(self) -> None:
+        """
+        Start the parse and the write stage in the running event loop.
+
+        Returns:
+            None
+        """
+        self._page_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._row_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scrape-pipeline-db")
+        self._tasks = [asyncio.create_task(self._parse_stage()), asyncio.create_task(self._write_stage())]
+
+    async def on_page(self, json_page: Dict[str, Any]) -> None:
+        """
+        Hand a fetched page over to the pipeline, waiting while the pipeline is full.
+
+        Args:
+            json_page (Dict[str, Any]): The decoded response of one page.
+
+        Returns:
+            None
+
+        Raises:
+            Exception: The error of a failed stage, so the crawl stops early.
+        """
+        if self.error is not None:
+            raise self.error
+        self.pages += 1
+        await self._page_queue.put(json_page)
+        QUEUE_DEPTH.set(self._page_queue.qsize(), queue="pages")
+
+    async def join(self) -> int:
+        """
+        Wait until every handed over page is parsed and written, and stop the stages.
+
+        Returns:
+            int: The number of inserted rows.
+
+        Raises:
+            Exception: The error of a failed stage.
+        """
+        try:
+            await self._page_queue.put(None)
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            # The session of the database thread stays open across the batches and is closed once here
+            self._executor.submit(self.db_manager_settings.close_session)
+            self._executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+        logger.info(f"Pipeline processed {self.pages} pages, {self.parsed_rows} rows, inserted {self.inserted_rows} rows in {self.batches} batches")
+        return self.inserted_rows
+
+    async def _parse_stage(self) -> None:
+        """Extract the rows of every page and pass them on to the write stage."""
+        data_scraper: DataScraper = DataScraper()
+        while True:
+            json_page: Optional[Dict[str, Any]] = await self._page_queue.get()
+            QUEUE_DEPTH.set(self._page_queue.qsize(), queue="pages")
+            if json_page is None:
+                await self._row_queue.put(None)
+                return
+
+            # After a failure the pages are only drained, so the producer never blocks
+            if self.error is not None:
+                continue
+            try:
+                # Pages parsed in a worker process already carry their rows
+                data: Any = json_page.get('data')
+                if isinstance(data, RowBatch):
+                    rows: np.ndarray = data.rows
+                else:
+                    with EXTRACT_SECONDS.time():
+                        rows = data_scraper._get_rows([json_page])
+            except Exception as e:
+                self.error = e
+                continue
+            if len(rows):
+                self.parsed_rows += len(rows)
+                PIPELINE_ROWS.inc(len(rows), stage="parsed")
+                await self._row_queue.put(rows)
+                QUEUE_DEPTH.set(self._row_queue.qsize(), queue="rows")
+
+    async def _write_stage(self) -> None:
+        """Collect the parsed rows into micro-batches and write them in the database thread."""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        batch: List[np.ndarray] = []
+        batch_rows: int = 0
+        finished: bool = False
+
+        while not finished:
+            rows: Optional[np.ndarray] = await self._row_queue.get()
+            QUEUE_DEPTH.set(self._row_queue.qsize(), queue="rows")
+            if rows is None:
+                finished = True
+            elif self.error is None:
+                batch.append(rows)
+                batch_rows += len(rows)
+
+            # Write when the batch is full, when no parsed page is waiting, or at the end
+            if batch_rows and (batch_rows >= self.batch_size or self._row_queue.empty() or finished):
+                try:
+                    insert: Optional[Future] = await loop.run_in_executor(self._executor, self._write_batch, batch)
+                    if insert is not None:
+                        self._inserts.add(asyncio.wrap_future(insert))
+                except Exception as e:
+                    self.error = e
+                batch, batch_rows = [], 0
+
+            # Wait for a commit when too many inserts are queued, and for all of them at the end
+            while self._inserts and (len(self._inserts) >= self.queue_size or finished):
+                done, self._inserts = await asyncio.wait(self._inserts, return_when=asyncio.FIRST_COMPLETED)
+                self._committed(done)
+
+    def _committed(self, inserts: Set[asyncio.Future]) -> None:
+        """Count the rows of committed inserts, or keep the error of a failed one."""
+        for insert in inserts:
+            try:
+                inserted: int = insert.result()
+            except Exception as e:
+                self.error = e
+                continue
+            self.inserted_rows += inserted
+            PIPELINE_ROWS.inc(inserted, stage="inserted")
+
+    def _write_batch(self, batch: List[np.ndarray]) -> Optional[Future]:
+        """
+        Compare a micro-batch with the database and queue the insert of its new rows on the writer thread.
+
+        The DataFrame of the batch is built here in the database thread, so pandas never runs on the event loop.
+
+        Args:
+            batch (List[np.ndarray]): The parsed rows of the pages in the batch, see `DataScraper._get_rows`.
+
+        Returns:
+            Future or None: Resolved with the number of inserted rows after the commit, or None if no row is new.
+        """
+        import pandas as pd
+        self.batches += 1
+        rows: np.ndarray = batch[0] if len(batch) == 1 else np.concatenate(batch)
+        df: pd.DataFrame = pd.DataFrame(rows, columns=list(ITEM_FIELD_PATHS), copy=False)
+        with WRITE_SECONDS.time(operation="compare"):
+            df_to_insert: pd.DataFrame = self.check_new_items.find_new_items(df)
+        if df_to_insert.empty:
+            return None
+        with WRITE_SECONDS.time(operation="insert"):
+            return self.db_manager_settings.queue_bulk_insert(df_to_insert, self.Model, ignore_duplicates=True)
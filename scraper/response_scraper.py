@@ -1,14 +1,26 @@
-from typing import List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
 import random
+import re
 import asyncio
+from time import perf_counter
 import aiohttp
 import os
 import logging
-from rich import print
 from dotenv import load_dotenv
-from aiohttp_socks import ProxyConnector, ProxyError
-from config import _load_settings
+from python_socks import ProxyError
+from config import ProxySettings, ScrapingSettings, get_settings
 from logs import logger
+from logs.logger import LogSampler
+from metrics import REGISTRY, SIZE_BUCKETS
+from proxy_pool import ProxyPool
+from database.models import DatabaseManagerSettings
+from database.response_cache import CachedResponse, ResponseCache
+from scraper.parse_pool import ParsePool
+from scraper.backoff import BackoffController, CircuitOpenError, RetryableError, parse_retry_after
+from scraper.incremental import IncrementalCrawl
+from scraper.json_decoder import LAST_PAGE_KEYS, PER_PAGE_KEYS, TOTAL_COUNT_KEYS, JsonDecoder, get_default_decoder
+from scraper.scheduler import CrawlScheduler
+from scraper.sessions import SessionManager
 
 
 # Load environment variables
@@ -20,48 +32,130 @@ LOG_DIR_FETCHING = os.getenv("LOG_DIR_FETCHING")
 # Create logger object
 logger = logger.get_logger(log_file=LOG_DIR_FETCHING, log_level=logging.INFO)
 
+# Per-request messages are sampled, with a periodic summary of the suppressed ones
+request_log = LogSampler(logger)
+
+# Metrics of the requests and the decoding of their responses
+REQUESTS = REGISTRY.counter("scraper_requests_total", "Requests by HTTP status and proxy, status error for requests without a response", ("status", "proxy"))
+REQUEST_SECONDS = REGISTRY.histogram("scraper_request_seconds", "Request latency by HTTP status", ("status",))
+RESPONSE_BYTES = REGISTRY.counter("scraper_response_bytes_total", "Bytes of the received response bodies")
+RESPONSE_SIZE = REGISTRY.histogram("scraper_response_size_bytes", "Size of the received response bodies", buckets=SIZE_BUCKETS)
+CACHED_RESPONSES = REGISTRY.counter("scraper_cached_responses_total", "Responses served from the response cache by outcome", ("outcome",))
+PARSE_SECONDS = REGISTRY.histogram("scraper_parse_seconds", "Duration of decoding one page by decoder, pool for the parse pool", ("decoder",))
+
 
 class ResponseScraper:
-    def __init__(self, start_page: int, end_page: int, category_id: int) -> None:
+    def __init__(self, start_page: int, end_page: Optional[int], category_id: int, scheduler: CrawlScheduler = None,
+                 proxy_pool: ProxyPool = None, parse_pool: ParsePool = None, response_cache: ResponseCache = None,
+                 sort: str = None) -> None:
         """
         Initializes a new instance of the ResponseScraper class.
 
         Args:
             start_page (int): The starting page number for scraping.
-            end_page (int): The ending page number for scraping.
+            end_page (int or None): The ending page number for scraping. If None, pages are fetched until an empty page.
             category_id (int): The category ID for scraping.
+            scheduler (CrawlScheduler, optional): A scheduler shared with other scrapers, so they share its limits.
+            proxy_pool (ProxyPool, optional): A proxy pool shared with other scrapers. Every request is sent through
+                a proxy selected from the pool. If None, requests are sent without a proxy.
+            parse_pool (ParsePool, optional): A pool of worker processes shared with other scrapers. If given, every
+                response body is decoded and its items are extracted in a worker process, and the fetched pages
+                carry a RowBatch under `data`. If None, the body is decoded on the event loop.
+            response_cache (ResponseCache, optional): An on-disk cache of responses shared with other scrapers. If given,
+                fresh cached pages are used without a request and stale ones are revalidated with a conditional request.
+            sort (str, optional): The sort order replacing the one of the `base_url_category` scraping setting,
+                e.g. a newest-first order for an incremental crawl.
 
         Returns:
             None
 
         Initializes the instance variables `one_page_response`, `list_all_responses`, `start_page`,
         `end_page`, `category_id`, `__base_url_video`, `__base_url_page`, `__base_url_category`,
-        `urls`, and `_user_agents` with the given values.
+        `urls`, `_user_agents`, `scheduler`, `proxy_pool`, `parse_pool`, `response_cache`, and `decoder` with the given values.
 
         The `urls` attribute is a list of URLs generated by combining the `__base_url_video`,
         `__base_url_page`, `page`, `__base_url_category`, and `category_id` attributes. The `page`
-        variable ranges from `start_page` to `end_page + 1`.
+        variable ranges from `start_page` to `end_page + 1`. If `end_page` is None, the list is empty and the
+        URLs are generated while streaming the pages.
+
+        The `_user_agents` attribute is the tuple of user agents of the scraping settings.
 
-        The `_user_agents` attribute is a list of user agents loaded from the scraping settings.
+        The `scheduler` attribute is the given scheduler or a CrawlScheduler configured with the `max_workers`,
+        `max_in_flight`, `rate_per_host`, and `burst_per_host` scraping settings.
+
+        The `decoder` attribute is the JSON decoder configured with the scraping settings, shared by all scrapers.
         """
         self.one_page_response: str = None
         self.list_all_responses: List = []
         self.start_page: int = start_page
         self.end_page: int = end_page
         self.category_id: int = category_id
-        self.__base_url_video: str = _load_settings()['scraping_settings']['base_url_video']
-        self.__base_url_page: str = _load_settings()['scraping_settings']['base_url_page']
-        self.__base_url_category: str = _load_settings()['scraping_settings']['base_url_category']
-        self.urls: List = [f'{self.__base_url_video}{self.__base_url_page}{page}{self.__base_url_category}{self.category_id}' for page in range(self.start_page, self.end_page + 1)]
-        self._user_agents: List = _load_settings()['scraping_settings']['user_agents']
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        self.__base_url_video: str = scraping_settings.base_url_video
+        self.__base_url_page: str = scraping_settings.base_url_page
+        self.__base_url_category: str = scraping_settings.base_url_category
+        if sort is not None:
+            self.__base_url_category = re.sub(r'(?<=[?&])sort=[^&]*', f'sort={sort}', self.__base_url_category)
+        self.urls: List = [self._build_url(page) for page in range(self.start_page, self.end_page + 1)] if self.end_page is not None else []
+        self._user_agents: Sequence[str] = scraping_settings.user_agents
+        self.max_pages: int = scraping_settings.max_pages_per_category
+        self.scheduler: CrawlScheduler = scheduler or self._create_scheduler()
+        self.proxy_pool: Optional[ProxyPool] = proxy_pool
+        self.parse_pool: Optional[ParsePool] = parse_pool
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self.decoder: JsonDecoder = get_default_decoder()
+
+    @staticmethod
+    def _create_scheduler() -> CrawlScheduler:
+        """
+        Create a crawl scheduler configured with the scraping settings, with a backoff controller
+        configured with the `retry_*` and `breaker_*` scraping settings.
+
+        Returns:
+            CrawlScheduler: The scheduler.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        backoff: BackoffController = BackoffController(
+            scraping_settings.max_in_flight,
+            max_attempts=scraping_settings.retry_max_attempts,
+            base_delay=scraping_settings.retry_base_delay,
+            max_delay=scraping_settings.retry_max_delay,
+            decrease=scraping_settings.retry_limit_decrease,
+            breaker_failures=scraping_settings.breaker_failures,
+            breaker_reset=scraping_settings.breaker_reset,
+        )
+        return CrawlScheduler(
+            workers=scraping_settings.max_workers,
+            max_in_flight=scraping_settings.max_in_flight,
+            rate_per_host=scraping_settings.rate_per_host,
+            burst_per_host=scraping_settings.burst_per_host,
+            backoff=backoff,
+        )
 
-    async def _fetch(self, url: str, session: aiohttp.ClientSession):
+    def _build_url(self, page: int) -> str:
+        """
+        Build the search API URL of one page of the category.
+
+        Args:
+            page (int): The page number.
+
+        Returns:
+            str: The URL of the page.
+        """
+        return f'{self.__base_url_video}{self.__base_url_page}{page}{self.__base_url_category}{self.category_id}'
+
+    async def _fetch(self, url: str, session: SessionManager):
         """
         Asynchronously fetches a web page from the given URL using the provided session and user agent.
 
+        The attempts are run by the backoff controller of the scheduler: failed requests are retried a
+        bounded number of times with jittered exponential backoff or after the server's `Retry-After`,
+        429 responses cut the number of requests in flight to the host, and requests to a host whose
+        circuit breaker is open fail right away.
+
         Args:
             url (str): The URL of the web page to fetch.
-            session (aiohttp.ClientSession): The aiohttp client session to use for the request.
+            session (SessionManager): The session manager sending the request, or a single aiohttp client session.
 
         Returns:
             str or None: The content of the fetched web page as a JSON string, or None if the request failed.
@@ -70,50 +164,220 @@ class ResponseScraper:
             ValueError: If the session parameter is None.
 
         Handles:
-            ProxyError: Retries the request with an increased delay.
-            aiohttp.ClientError, asyncio.TimeoutError, aiohttp.ClientPayloadError, aiohttp.ClientResponseError: Logs the error and returns None.
+            RetryableError: Logs the error of the last attempt and returns None.
+            CircuitOpenError: Logs the error and returns None.
         """
-        # Delay between requests
-        delay: int = 1
-        
         # If session is None, raise ValueError
         if session is None:
             raise ValueError("session parameter cannot be None")
 
+        try:
+            # Every attempt waits for the rate limit and a slot of its own, none is held while backing off
+            return await self.scheduler.backoff.call(url, lambda: self.scheduler.send(url, lambda: self._fetch_once(url, session)))
+        except RetryableError as e:
+            request_log.error("request_gave_up", "Request failed after retries: %s - %s", url, e)
+            return None
+        except CircuitOpenError as e:
+            request_log.error("request_circuit_open", "Request not sent: %s - %s", url, e)
+            return None
+
+    async def _fetch_once(self, url: str, session: SessionManager):
+        """
+        Asynchronously sends one request for a web page.
+
+        If the scraper has a proxy pool, the request is sent through a proxy selected from the pool
+        and its outcome and latency are recorded in the pool.
+
+        If the scraper has a response cache, a fresh cached page is returned without a request. A stale
+        cached page is revalidated with `If-None-Match`/`If-Modified-Since` and reused on a 304, and a
+        downloaded page is stored in the cache with its ETag and Last-Modified headers.
+
+        Args:
+            url (str): The URL of the web page to fetch.
+            session (SessionManager): The session manager sending the request, or a single aiohttp client session.
+
+        Returns:
+            str or None: The content of the fetched web page as a JSON string, or None if the request failed for good.
+
+        Raises:
+            RetryableError: If the request failed with a 429, a 5xx status, a proxy error, or a connection error.
+
+        Handles:
+            ValueError: Logs the error of a body that is not valid JSON and returns None.
+        """
         # Generate random user agent
         _headers: dict = {"User-Agent": random.choice(self._user_agents) if self._user_agents else None} # generate random user agent
 
+        # Use a fresh cached page without a request, or revalidate a stale one
+        cached: Optional[CachedResponse] = await self.response_cache.get(url) if self.response_cache else None
+        if cached is not None and self.response_cache.is_fresh(cached):
+            self.response_cache.hits += 1
+            CACHED_RESPONSES.inc(outcome="fresh")
+            request_log.info("cached", "Cached response used: %s", url)
+            self.one_page_response: str = await self._decode(cached.body)
+            return self.one_page_response
+        if cached is not None:
+            _headers.update(self.response_cache.conditional_headers(cached))
+
+        # Select a proxy for this request
+        proxy: Optional[str] = self.proxy_pool.acquire() if self.proxy_pool else None
+        start_time: float = perf_counter()
+
         try:
             # Send GET request to the specified URL and get the response
-            async with session.get(url=url, headers=_headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                await asyncio.sleep(random.uniform(0.5, 5.0))   # Add random delay between requests
+            async with session.get(url=url, headers=_headers, proxy=proxy) as response:
+                self._record_request(proxy, response.status, start_time)
                 if response.status == 200:
-                    logger.info(f"Request successful: {url} - {response.status}")
-                    self.one_page_response: str = await response.json()
+                    request_log.info("request_ok", "Request successful: %s - %s", url, response.status)
+                    body: bytes = await response.read()
+                    RESPONSE_BYTES.inc(len(body))
+                    RESPONSE_SIZE.observe(len(body))
+                    self.one_page_response: str = await self._decode(body)
+
+                    # Cache only pages that could be decoded
+                    if self.response_cache is not None:
+                        self.response_cache.store(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
                     return self.one_page_response
-                elif response.status == 429:
-                    logger.warning(f"Too many requests: {url} - {response.status}")
-                    await asyncio.sleep(60)  # Wait for 60 seconds before retrying
-                    return await self._fetch(url, session)
+                elif response.status == 304 and cached is not None:
+                    request_log.info("revalidated", "Cached response revalidated: %s - %s", url, response.status)
+                    self.response_cache.touch(cached, url)
+                    CACHED_RESPONSES.inc(outcome="revalidated")
+                    self.one_page_response: str = await self._decode(cached.body)
+                    return self.one_page_response
+                elif response.status == 429 or response.status >= 500:
+                    request_log.warning("request_retryable", "Request throttled or failed: %s - %s", url, response.status)
+                    raise RetryableError(
+                        f"{response.status}, message='{response.reason}'",
+                        retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                        throttled=response.status == 429,
+                    )
                 else:
-                    logger.error(f"Request failed: {response.status}, message='{response.reason}', proxy_url={response.url}")
+                    request_log.error("request_failed", "Request failed: %s, message='%s', proxy_url=%s", response.status, response.reason, response.url)
                     return None
-        
-        # Handle proxy errors 
-        except ProxyError as e:
-            logger.error(f"Error {e}, retrying in {delay} seconds...")
-            await asyncio.sleep(delay)
-            delay *= 2
-        
-        # Handle other errors
-        except (aiohttp.ClientError, asyncio.TimeoutError, aiohttp.ClientPayloadError, aiohttp.ClientResponseError) as e:
-            logger.error(f"Response request failed: {e}")
+
+        # Handle proxy and connection errors, the backoff controller retries them. Through a proxy they
+        # are scored by the proxy pool and never open the circuit breaker of the host
+        except (ProxyError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._record_request(proxy, None, start_time)
+            request_log.error("request_error", "Response request failed: %r", e)
+            raise RetryableError(repr(e), proxy_failure=proxy is not None) from e
+
+        # Handle responses that are not valid JSON
+        except ValueError as e:
+            request_log.error("decode_error", "Response of %s could not be decoded: %s", url, e)
             return None
 
+    async def _decode(self, body: bytes) -> Dict[str, Any]:
+        """
+        Asynchronously decode a response body, in the parse pool if the scraper has one.
+
+        Args:
+            body (bytes): The response body.
+
+        Returns:
+            Dict[str, Any]: The decoded page.
+
+        Raises:
+            ValueError: If the body is not valid JSON or does not match the schema.
+        """
+        with PARSE_SECONDS.time(decoder="pool" if self.parse_pool else self.decoder.backend):
+            return await (self.parse_pool.parse(body) if self.parse_pool else self.decoder.decode_async(body))
+
+    def _record_request(self, proxy: Optional[str], status: Optional[int], start_time: float) -> None:
+        """
+        Record the outcome of a request in the request metrics, and in the proxy pool if the request was sent through a proxy.
+
+        Args:
+            proxy (str or None): The proxy the request was sent through.
+            status (int or None): The HTTP status code, or None if the request failed without a response.
+            start_time (float): The `perf_counter` value when the request was sent.
+
+        Returns:
+            None
+        """
+        latency: float = perf_counter() - start_time
+        REQUESTS.inc(status=status or "error", proxy=proxy or "direct")
+        REQUEST_SECONDS.observe(latency, status=status or "error")
+        if proxy is not None:
+            self.proxy_pool.record(proxy, status, latency)
+
+    @staticmethod
+    def _create_proxy_pool(working_proxies: List) -> Optional[ProxyPool]:
+        """
+        Create a proxy pool of the working proxies configured with the proxy settings.
+
+        Args:
+            working_proxies (List[str]): A list of working proxies.
+
+        Returns:
+            ProxyPool or None: The proxy pool, or None if there are no working proxies.
+        """
+        if not working_proxies:
+            return None
+        proxy_settings: ProxySettings = get_settings().proxy_settings
+        return ProxyPool(
+            working_proxies,
+            half_life=proxy_settings.pool_half_life,
+            max_failures=proxy_settings.pool_max_failures,
+            cooldown=proxy_settings.pool_cooldown,
+        )
+
+    @staticmethod
+    def _create_parse_pool() -> Optional[ParsePool]:
+        """
+        Create a pool of parse worker processes configured with the `parse_workers` and `parse_batch_pages` scraping settings.
+
+        Returns:
+            ParsePool or None: The parse pool, or None if `parse_workers` is 0 and pages are parsed on the event loop.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        if not scraping_settings.parse_workers:
+            return None
+        return ParsePool(scraping_settings.parse_workers, scraping_settings.json_decoder, scraping_settings.parse_batch_pages)
+
+    @staticmethod
+    def _create_response_cache() -> Optional[ResponseCache]:
+        """
+        Create the response cache configured with the `response_cache_path`, `response_cache_max_mb`, and
+        `response_cache_ttl` scraping settings.
+
+        Returns:
+            ResponseCache or None: The response cache, or None if `response_cache_path` is null.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        if not scraping_settings.response_cache_path:
+            return None
+        return ResponseCache(
+            DatabaseManagerSettings(f"sqlite:///{scraping_settings.response_cache_path}"),
+            max_bytes=scraping_settings.response_cache_max_mb * 1024 * 1024,
+            ttl=scraping_settings.response_cache_ttl,
+        )
+
+    @staticmethod
+    def _create_session() -> SessionManager:
+        """
+        Create the session manager of a crawl configured with the `connection_limit`, `keepalive_timeout`,
+        `dns_cache_ttl`, and `request_timeout` scraping settings. Proxies are selected per request, and
+        the manager keeps one pooled session per proxy.
+
+        Returns:
+            SessionManager: The session manager.
+        """
+        scraping_settings: ScrapingSettings = get_settings().scraping_settings
+        return SessionManager(
+            limit=scraping_settings.connection_limit,
+            keepalive_timeout=scraping_settings.keepalive_timeout,
+            dns_cache_ttl=scraping_settings.dns_cache_ttl,
+            timeout=scraping_settings.request_timeout,
+        )
 
     async def _fetch_all_pages(self, working_proxies: List) -> List[str]:
         """
-        Asynchronously fetches all pages from the given URLs using a random proxy from the working proxies list.
+        Asynchronously fetches all pages from the given URLs rotating the proxies from the working proxies list.
+
+        The pages are fetched by the crawl scheduler, which caps the number of requests in flight and
+        paces the requests per host with a token bucket. Each request is sent through a proxy selected
+        from a proxy pool of the working proxies, weighted toward the healthy ones.
 
         Args:
             working_proxies (List[str]): A list of working proxies to use for fetching the pages.
@@ -121,21 +385,188 @@ class ResponseScraper:
         Returns:
             List[str]: A list of HTML responses from all fetched pages.
         """
-        # List of tasks for each URL and gather the responses
-        task_responses: List[asyncio.Task] = []
-
-        if working_proxies:
-            # Create a ProxyConnector with random proxy from proxy_list
-            connector: ProxyConnector = ProxyConnector.from_url(random.choice(working_proxies))
-        else:
-            # ProxyConnector is None if there are no working proxies
-            connector = None
-        
-        async with aiohttp.ClientSession(connector=connector) as session: # connector=connector
-            # Create tasks for each URL and gather the responses
-            for index, url in enumerate(self.urls):
-                task_response_json_data: asyncio.Task = asyncio.create_task(self._fetch(url, session))
-                task_responses.append(task_response_json_data)
-            self.list_all_responses: List = await asyncio.gather(*task_responses)
+        # Rotate the working proxies per request
+        if self.proxy_pool is None:
+            self.proxy_pool = self._create_proxy_pool(working_proxies)
+
+        async with self._create_session() as session:
+            # Fetch the URLs with the scheduler's worker pool
+            self.list_all_responses: List = await self.scheduler.run(self.urls, lambda url: self._fetch(url, session))
         # Return the list of responses
         return self.list_all_responses
+
+    @staticmethod
+    def _last_page_from_metadata(json_page: Dict[str, Any]) -> Optional[int]:
+        """
+        Read the number of the last page from the pagination metadata of a search API response.
+
+        The metadata is looked up at the top level of the response and in a nested `meta` or
+        `pagination` object, either as a last page number or as a total item count.
+
+        Args:
+            json_page (Dict[str, Any]): The decoded response of one page.
+
+        Returns:
+            int or None: The number of the last page, or None if the response has no pagination metadata.
+        """
+        for metadata in (json_page, json_page.get('meta'), json_page.get('pagination')):
+            if not isinstance(metadata, dict):
+                continue
+
+            # The last page number is given directly
+            for key in LAST_PAGE_KEYS:
+                if isinstance(metadata.get(key), int):
+                    return metadata[key]
+
+            # The last page number is derived from the total item count
+            for key in TOTAL_COUNT_KEYS:
+                total = metadata.get(key)
+                per_page = next((metadata[key] for key in PER_PAGE_KEYS if metadata.get(key)), None) or len(json_page.get('data') or [])
+                if isinstance(total, int) and isinstance(per_page, int) and per_page > 0:
+                    return -(-total // per_page)
+        return None
+
+    async def _stream_pages(self, session: SessionManager, on_page: Callable[[Dict[str, Any]], Awaitable[None]]) -> int:
+        """
+        Asynchronously fetches the pages of the category and hands each page over as soon as it arrives.
+
+        With a fixed page range all pages are scheduled at once. Without an `end_page`, the first page
+        is fetched alone. If it carries pagination metadata, exactly the remaining pages are scheduled.
+        Otherwise the pages are fetched in a sliding window of `max_in_flight` pages: a new page is
+        requested whenever one completes, and as soon as an empty page is seen no further pages are
+        requested and the requests for pages after it are cancelled. The crawl of the category also
+        stops after a window of failed requests or `max_pages_per_category` pages.
+
+        Args:
+            session (SessionManager): The session manager shared by the whole crawl.
+            on_page (Callable[[Dict[str, Any]], Awaitable[None]]): The coroutine function called with every non-empty page.
+
+        Returns:
+            int: The number of non-empty pages.
+        """
+        pages_found: int = 0
+
+        async def fetch_and_handle(url: str) -> Optional[Dict[str, Any]]:
+            nonlocal pages_found
+            json_page: Optional[Dict[str, Any]] = await self._fetch(url, session)
+            if json_page and json_page.get('data'):
+                pages_found += 1
+                await on_page(json_page)
+            return json_page
+
+        # Fixed page range, schedule every page at once
+        if self.end_page is not None:
+            await self.scheduler.run(self.urls, fetch_and_handle)
+            return pages_found
+
+        # Fetch the first page alone to learn the number of pages
+        limit: int = self.start_page + self.max_pages
+        first_page: Optional[Dict[str, Any]] = await self.scheduler.fetch_one(self._build_url(self.start_page), fetch_and_handle)
+        if not first_page or not first_page.get('data'):
+            return pages_found
+
+        # The number of pages is known, schedule exactly the remaining pages
+        last_page: Optional[int] = self._last_page_from_metadata(first_page)
+        if last_page is not None:
+            urls: List[str] = [self._build_url(page) for page in range(self.start_page + 1, min(last_page + 1, limit))]
+            await self.scheduler.run(urls, fetch_and_handle)
+            return pages_found
+
+        # The number of pages is unknown, fetch a sliding window of pages until an empty page
+        await self._stream_sliding_window(self.start_page + 1, limit, lambda page: self.scheduler.fetch_one(self._build_url(page), fetch_and_handle))
+        return pages_found
+
+    async def _stream_new_pages(self, session: SessionManager, on_page: Callable[[Dict[str, Any]], Awaitable[None]],
+                                incremental: IncrementalCrawl) -> int:
+        """
+        Asynchronously fetches the pages of the category in a newest-first sort order until the first already-known page.
+
+        The pages are fetched in a sliding window of `max_in_flight` pages from `start_page` on. Each page
+        is checked by the incremental crawl before it is handed over, and as soon as a page ends the crawl
+        no further pages are requested and the requests for pages after it are cancelled. The crawl also
+        stops at `end_page`, or after `max_pages_per_category` pages without an `end_page`.
+
+        Args:
+            session (SessionManager): The session manager shared by the whole crawl.
+            on_page (Callable[[Dict[str, Any]], Awaitable[None]]): The coroutine function called with every non-empty page.
+            incremental (IncrementalCrawl): The stop condition of the crawl, see IncrementalCrawl.
+
+        Returns:
+            int: The number of non-empty pages.
+        """
+        pages_found: int = 0
+
+        async def fetch_and_handle(page: int, url: str) -> Optional[Dict[str, Any]]:
+            nonlocal pages_found
+            json_page: Optional[Dict[str, Any]] = await self._fetch(url, session)
+
+            # Check the page before its rows can reach the database
+            await incremental.check_page(page, json_page)
+            if json_page and json_page.get('data'):
+                pages_found += 1
+                await on_page(json_page)
+            return json_page
+
+        limit: int = self.end_page + 1 if self.end_page is not None else self.start_page + self.max_pages
+        await self._stream_sliding_window(
+            self.start_page, limit,
+            lambda page: self.scheduler.fetch_one(self._build_url(page), lambda url: fetch_and_handle(page, url)),
+            lambda page, json_page: incremental.last_page is not None and page >= incremental.last_page,
+        )
+        return pages_found
+
+    async def _stream_sliding_window(self, first_page: int, limit: int, fetch_page: Callable[[int], Awaitable[Any]],
+                                     is_last_page: Callable[[int, Dict[str, Any]], bool] = None) -> None:
+        """
+        Fetch pages from `first_page` on with at most `max_in_flight` pages outstanding until the last page.
+
+        Args:
+            first_page (int): The first page to fetch.
+            limit (int): The first page number that is never fetched.
+            fetch_page (Callable[[int], Awaitable[Any]]): The coroutine function fetching and handling one page number.
+            is_last_page (Callable[[int, Dict[str, Any]], bool], optional): Whether no page after a fetched page is needed.
+                Defaults to whether the page is empty.
+
+        Returns:
+            None
+        """
+        is_last_page = is_last_page or (lambda page, json_page: not json_page.get('data'))
+        window: int = self.scheduler.max_in_flight
+        next_page: int = first_page
+        last_page: Optional[int] = None
+        failures_in_row: int = 0
+        pending: Dict[asyncio.Task, int] = {}
+
+        try:
+            while True:
+                # Keep the window full until the end of the results is known
+                while last_page is None and failures_in_row < window and len(pending) < window and next_page < limit:
+                    task: asyncio.Task = asyncio.create_task(fetch_page(next_page))
+                    pending[task] = next_page
+                    next_page += 1
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page: int = pending.pop(task)
+                    json_page: Optional[Dict[str, Any]] = None if task.cancelled() else task.result()
+                    if json_page is None:
+                        failures_in_row += 1
+                        continue
+                    failures_in_row = 0
+                    if is_last_page(page, json_page):
+                        last_page = page if last_page is None else min(last_page, page)
+
+                # Cancel the requests for pages after the last page
+                if last_page is not None:
+                    cancelled: List[asyncio.Task] = [task for task, page in pending.items() if page > last_page]
+                    for task in cancelled:
+                        task.cancel()
+                        logger.info(f"Cancelled request for page {pending.pop(task)} after last page {last_page}")
+                    await asyncio.gather(*cancelled, return_exceptions=True)
+        finally:
+            # A page that raised, or the cancellation of the crawl, stops the pages still in flight
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
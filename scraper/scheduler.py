@@ -0,0 +1,168 @@
+from typing import Any, Awaitable, Callable, Dict, List
+from time import monotonic
+from urllib.parse import urlsplit
+import asyncio
+from scraper.backoff import BackoffController
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Initializes a new token bucket rate limiter.
+
+        Args:
+            rate (float): The number of tokens added per second.
+            capacity (float): The maximum number of tokens, i.e. the allowed burst of requests.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the rate or the capacity is not a positive number.
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("The parameters rate and capacity must be positive numbers")
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated_at: float = monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now: float = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """
+        Wait until a token is available and take it.
+
+        The waiting happens before a request is sent, so no connection is held open while pacing.
+
+        Returns:
+            None
+        """
+        # The lock makes waiting callers take tokens in arrival order
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class CrawlScheduler:
+    def __init__(self, workers: int, max_in_flight: int, rate_per_host: float, burst_per_host: float,
+                 backoff: BackoffController = None) -> None:
+        """
+        Initializes a new crawl scheduler.
+
+        The scheduler drains a work queue of URLs with a fixed number of worker coroutines. Every attempt
+        of a request, sent with `send`, is paced by a token bucket per host and counts against the cap of
+        requests in flight, so retries pay for the rate limit too and no slot is held while backing off.
+        Retries, backoff, and the adaptive limit of requests in flight per host are left to the backoff controller.
+
+        Args:
+            workers (int): The number of worker coroutines draining the queue.
+            max_in_flight (int): The maximum number of requests in flight across all workers.
+            rate_per_host (float): The number of requests per second allowed for one host.
+            burst_per_host (float): The number of requests one host may receive in a burst.
+            backoff (BackoffController, optional): The retry and backoff controller of the requests.
+                Defaults to a controller with the default retry policy and `max_in_flight` requests per host.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the number of workers or the maximum of requests in flight is not positive.
+        """
+        if workers < 1 or max_in_flight < 1:
+            raise ValueError("The parameters workers and max_in_flight must be positive numbers")
+        self.workers: int = workers
+        self.max_in_flight: int = max_in_flight
+        self.rate_per_host: float = rate_per_host
+        self.burst_per_host: float = burst_per_host
+        self.backoff: BackoffController = backoff or BackoffController(max_in_flight)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: asyncio.Semaphore = None
+
+    def _bucket(self, url: str) -> TokenBucket:
+        """Return the token bucket of the URL's host, creating it on first use."""
+        host: str = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst_per_host)
+        return self._buckets[host]
+
+    async def send(self, url: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Send one attempt of a request within the host's rate limit and the cap of requests in flight.
+
+        Args:
+            url (str): The requested URL, its host selects the token bucket.
+            attempt (Callable[[], Awaitable[Any]]): The coroutine function sending the request once.
+
+        Returns:
+            Any: The result of the attempt.
+        """
+        # The semaphore is created inside the running event loop and shared by concurrent runs
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        # Wait for the host's rate limit before taking a slot
+        await self._bucket(url).acquire()
+        async with self._in_flight:
+            return await attempt()
+
+    async def fetch_one(self, url: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        Fetch one URL, whose attempts are paced by `fetch` through `send`.
+
+        Args:
+            url (str): The URL to fetch.
+            fetch (Callable[[str], Awaitable[Any]]): The coroutine function fetching the URL.
+
+        Returns:
+            Any: The fetched result.
+        """
+        return await fetch(url)
+
+    async def _worker(self, queue: asyncio.Queue, fetch: Callable[[str], Awaitable[Any]], results: List) -> None:
+        """Take URLs from the queue until it is empty and store the fetched results at their index."""
+        while True:
+            try:
+                index, url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[index] = await self.fetch_one(url, fetch)
+            finally:
+                queue.task_done()
+
+    async def run(self, urls: List[str], fetch: Callable[[str], Awaitable[Any]]) -> List[Any]:
+        """
+        Fetch all URLs with the worker pool.
+
+        Args:
+            urls (List[str]): The URLs to fetch.
+            fetch (Callable[[str], Awaitable[Any]]): The coroutine function fetching one URL.
+
+        Returns:
+            List[Any]: The fetched results in the order of the URLs.
+        """
+        # Fill the work queue with the URLs and their position in the results
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, url in enumerate(urls):
+            queue.put_nowait((index, url))
+
+        # Start the workers and wait until the queue is drained
+        results: List[Any] = [None] * len(urls)
+        workers: List[asyncio.Task] = [
+            asyncio.create_task(self._worker(queue, fetch, results)) for _ in range(min(self.workers, len(urls)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        return results
@@ -0,0 +1,203 @@
+from typing import Any, Dict, List, Optional
+from time import perf_counter
+from types import SimpleNamespace
+import asyncio
+import aiohttp
+
+# Brotli is only decoded by aiohttp if one of the optional brotli packages is installed
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Content codings the crawl sessions accept, aiohttp decompresses them transparently
+ACCEPT_ENCODING: str = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        """
+        Initializes the connection statistics of one pooled session.
+
+        Returns:
+            None
+        """
+        self.requests: int = 0
+        self.new_connections: int = 0   # Connections opened, including the TCP, proxy, and TLS handshakes
+        self.reused_connections: int = 0   # Requests sent on a kept-alive connection
+        self.connect_time: float = 0.0   # Seconds spent opening connections
+        self.request_time: float = 0.0   # Seconds from sending requests to their response headers
+
+    @property
+    def reuse_ratio(self) -> float:
+        """The share of requests sent on a kept-alive connection."""
+        connections: int = self.new_connections + self.reused_connections
+        return self.reused_connections / connections if connections else 0.0
+
+    @property
+    def connect_share(self) -> float:
+        """The share of the request latency spent opening connections."""
+        return self.connect_time / self.request_time if self.request_time else 0.0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Create the trace configuration counting the requests and connections of a session.
+
+        Returns:
+            aiohttp.TraceConfig: The trace configuration.
+        """
+        async def on_request_start(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            context.request_start = perf_counter()
+
+        async def on_request_end(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            self.requests += 1
+            self.request_time += perf_counter() - context.request_start
+
+        async def on_connection_create_start(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            context.connect_start = perf_counter()
+
+        async def on_connection_create_end(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            self.new_connections += 1
+            self.connect_time += perf_counter() - context.connect_start
+
+        async def on_connection_reuseconn(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            self.reused_connections += 1
+
+        trace_config: aiohttp.TraceConfig = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+
+class SessionManager:
+    def __init__(self, limit: int = 8, keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300, timeout: float = 30.0) -> None:
+        """
+        Initializes the manager of the client sessions of a crawl, one pooled session per proxy.
+
+        The manager mirrors `aiohttp.ClientSession.get`: a request is sent through the session of its
+        proxy, which is created on first use and then reused across categories and runs, so kept-alive
+        connections save the TCP, proxy, and TLS handshakes. Every session has a tuned connector with
+        `limit` connections, a keep-alive timeout, and a DNS cache, a total request timeout, and
+        accepts compressed responses. HTTP proxies are passed per request, SOCKS proxies get a
+        connector tunnelling through them.
+
+        The sessions belong to the event loop they were created in. When the manager is used in a new
+        event loop, the sessions of the old one are dropped and new ones are created.
+
+        Args:
+            limit (int): The maximum number of connections of one session.
+            keepalive_timeout (float): The number of seconds an idle connection is kept open.
+            dns_cache_ttl (int): The number of seconds a resolved host name is cached.
+            timeout (float): The total timeout of a request in seconds.
+
+        Returns:
+            None
+        """
+        self.limit: int = limit
+        self.keepalive_timeout: float = keepalive_timeout
+        self.dns_cache_ttl: int = dns_cache_ttl
+        self.timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=timeout)
+        self.sessions: Dict[Optional[str], aiohttp.ClientSession] = {}
+        self.pool_stats: Dict[Optional[str], PoolStats] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __aenter__(self) -> "SessionManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _connector(self, proxy: Optional[str]) -> aiohttp.BaseConnector:
+        """Create the tuned connector of a proxy, tunnelling through it if it is a SOCKS proxy."""
+        options: Dict[str, Any] = dict(limit=self.limit, keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.dns_cache_ttl)
+        if proxy is not None and proxy.startswith("socks"):
+            from aiohttp_socks import ProxyConnector
+            return ProxyConnector.from_url(proxy, **options)
+        return aiohttp.TCPConnector(**options)
+
+    def session(self, proxy: Optional[str] = None) -> aiohttp.ClientSession:
+        """
+        Return the session of a proxy, creating it on first use in the running event loop.
+
+        Args:
+            proxy (str, optional): The proxy URL, None for direct requests.
+
+        Returns:
+            aiohttp.ClientSession: The pooled session.
+        """
+        # Sessions of a closed event loop cannot be reused
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self.sessions, self._loop = {}, loop
+
+        session: Optional[aiohttp.ClientSession] = self.sessions.get(proxy)
+        if session is None or session.closed:
+            stats: PoolStats = self.pool_stats.setdefault(proxy, PoolStats())
+            session = aiohttp.ClientSession(
+                connector=self._connector(proxy),
+                timeout=self.timeout,
+                headers={"Accept-Encoding": ACCEPT_ENCODING},
+                trace_configs=[stats.trace_config()],
+            )
+            self.sessions[proxy] = session
+        return session
+
+    def get(self, url: str, proxy: Optional[str] = None, **kwargs: Any) -> Any:
+        """
+        Send a GET request through the session of the proxy, like `aiohttp.ClientSession.get`.
+
+        Args:
+            url (str): The requested URL.
+            proxy (str, optional): The proxy URL, None for a direct request.
+            **kwargs: The other arguments of `aiohttp.ClientSession.get`.
+
+        Returns:
+            The request context manager of aiohttp.
+        """
+        session: aiohttp.ClientSession = self.session(proxy)
+        request_proxy: Optional[str] = proxy if proxy is not None and not proxy.startswith("socks") else None
+        return session.get(url, proxy=request_proxy, **kwargs)
+
+    def stats(self) -> List[Dict]:
+        """
+        Return the connection pool statistics of every session.
+
+        Returns:
+            List[Dict]: One dictionary per proxy with the open and idle connections, the requests,
+                the new and reused connections, the reuse ratio, and the share of the request
+                latency spent opening connections.
+        """
+        rows: List[Dict] = []
+        for proxy, stats in self.pool_stats.items():
+            session: Optional[aiohttp.ClientSession] = self.sessions.get(proxy)
+            connector: Optional[aiohttp.BaseConnector] = session.connector if session is not None and not session.closed else None
+            idle: int = sum(len(connections) for connections in getattr(connector, "_conns", {}).values())
+            rows.append({
+                "proxy": proxy,
+                "open": idle + len(getattr(connector, "_acquired", ())),
+                "idle": idle,
+                "requests": stats.requests,
+                "new_connections": stats.new_connections,
+                "reused_connections": stats.reused_connections,
+                "reuse_ratio": round(stats.reuse_ratio, 3),
+                "connect_share": round(stats.connect_share, 3),
+            })
+        return rows
+
+    async def close(self) -> None:
+        """
+        Close the sessions of the running event loop and their connections.
+
+        Returns:
+            None
+        """
+        # Sessions of another event loop cannot be closed from this one
+        sessions: List[aiohttp.ClientSession] = list(self.sessions.values()) if self._loop is asyncio.get_running_loop() else []
+        self.sessions = {}
+        await asyncio.gather(*(session.close() for session in sessions if not session.closed))
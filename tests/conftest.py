@@ -0,0 +1,56 @@
+import socket
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from benchmarks.standin import ForwardingProxy, SearchApiStandIn
+from database.models import DatabaseManagerSettings, MotionsElements
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """Database manager bound to an empty SQLite file with the MotionsElements table created."""
+    db_manager_settings = DatabaseManagerSettings(f"sqlite:///{tmp_path / 'test.db'}")
+    db_manager_settings.create_table(MotionsElements.__table__)
+    yield db_manager_settings
+    db_manager_settings.close_connection()
+    db_manager_settings.engine.dispose()
+
+
+@pytest.fixture
+def dead_proxy():
+    """Proxy URL of a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest_asyncio.fixture
+async def fake_proxy():
+    """Local HTTP proxy stand-in answering every proxied request with 200, except /limited with 429."""
+    async def handle(request):
+        return web.Response(status=429 if request.path.endswith("/limited") else 200, text='{"origin": "127.0.0.1"}')
+
+    app = web.Application()
+    app.router.add_route("GET", "/{tail:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    await runner.cleanup()
+
+
+@pytest_asyncio.fixture
+async def search_api():
+    """Offline stand-in of the search API with 3 pages of 5 items per category."""
+    async with SearchApiStandIn(pages=3, per_page=5) as api:
+        yield api
+
+
+@pytest_asyncio.fixture
+async def forwarding_proxy():
+    """Local HTTP proxy forwarding every request to its target, on two ports."""
+    proxy = ForwardingProxy()
+    await proxy.start(ports=[0, 0])
+    yield proxy
+    await proxy.close()
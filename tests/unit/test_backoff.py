@@ -0,0 +1,184 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from metrics import REGISTRY
+from scraper import ResponseScraper
+from scraper.backoff import AdaptiveLimit, BackoffController, CircuitBreaker, CircuitOpenError, RetryableError, parse_retry_after
+from scraper.scheduler import CrawlScheduler
+
+
+@pytest_asyncio.fixture
+async def throttling_api():
+    """Local stand-in for the search API answering the first requests of a path with 429 and Retry-After."""
+    state = {"requests": 0, "throttle": 2}
+
+    async def handle(request):
+        state["requests"] += 1
+        if state["requests"] <= state["throttle"]:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        return web.Response(text=json.dumps({"data": [{"name": "Clip"}]}), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/{path}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    state["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/search"
+    yield state
+    await runner.cleanup()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("Wed, 01 Jan 2020 00:00:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_adaptive_limit_cuts_once_per_round_and_ramps_up():
+    limit = AdaptiveLimit(8)
+    limit.on_throttled(sent_at=0.0)
+    # A 429 of a request sent before the cut was answered under the old limit
+    limit.on_throttled(sent_at=0.0)
+    assert limit.limit == 4
+
+    for _ in range(4):
+        limit.on_success()
+    assert 4.9 < limit.limit < 5
+
+
+def test_circuit_breaker_opens_and_lets_one_trial_through():
+    breaker = CircuitBreaker(max_failures=2, reset_timeout=0)
+    breaker.record(False)
+    assert not breaker.is_open
+    breaker.record(False)
+    assert breaker.is_open
+
+    # After the reset timeout only one trial request is sent
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(True)
+    assert not breaker.is_open and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_or_failed_trial_attempts_release_the_trial():
+    backoff = BackoffController(max_in_flight=4, max_attempts=1, breaker_failures=1, breaker_reset=0)
+    breaker = backoff.breakers[backoff._host("https://example.com/page=1")]
+    breaker.record(False)
+    started = asyncio.Event()
+
+    async def hanging():
+        started.set()
+        await asyncio.sleep(3600)
+
+    # The trial attempt is cancelled, the next request is let through as the trial
+    trial = asyncio.create_task(backoff.call("https://example.com/page=1", hanging))
+    await started.wait()
+    assert not breaker.allow()
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    assert breaker.is_open and not breaker._trial
+
+    async def unparsable():
+        raise ValueError("not JSON")
+
+    # A trial attempt failing with another error keeps the circuit open without blocking the next trial
+    with pytest.raises(ValueError):
+        await backoff.call("https://example.com/page=2", unparsable)
+    assert breaker.is_open and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_proxy_failures_do_not_open_the_circuit_of_the_host():
+    backoff = BackoffController(max_in_flight=4, max_attempts=3, base_delay=0.001, breaker_failures=2)
+
+    async def dead_proxy():
+        raise RetryableError("ProxyError()", proxy_failure=True)
+
+    for page in range(3):
+        with pytest.raises(RetryableError):
+            await backoff.call(f"https://example.com/page={page}", dead_proxy)
+
+    assert not backoff.breakers["example.com"].is_open
+    assert await backoff.call("https://example.com/page=3", lambda: asyncio.sleep(0, "page")) == "page"
+
+
+@pytest.mark.asyncio
+async def test_controller_retries_iteratively_until_success():
+    backoff = BackoffController(max_in_flight=4, max_attempts=3, base_delay=0.001)
+    attempts = []
+    retries_before = REGISTRY.metrics["scraper_retries_total"].values.get((), 0)
+    throttled_before = REGISTRY.metrics["scraper_throttled_responses_total"].values.get((), 0)
+
+    async def attempt():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise RetryableError("429", retry_after=0, throttled=True)
+        return "page"
+
+    assert await backoff.call("https://example.com/page=1", attempt) == "page"
+    assert backoff.retries == 2 and backoff.throttled == 2
+    assert backoff.limits["example.com"].limit < 4
+
+    # The retries are exported as counters of the process
+    assert REGISTRY.metrics["scraper_retries_total"].values[()] == retries_before + 2
+    assert REGISTRY.metrics["scraper_throttled_responses_total"].values[()] == throttled_before + 2
+    assert "# TYPE scraper_retries_total counter" in REGISTRY.to_prometheus()
+
+
+@pytest.mark.asyncio
+async def test_controller_gives_up_after_max_attempts_and_long_retry_after():
+    backoff = BackoffController(max_in_flight=4, max_attempts=3, base_delay=0.001, max_delay=10, breaker_failures=4)
+
+    async def attempt():
+        raise RetryableError("503")
+
+    with pytest.raises(RetryableError):
+        await backoff.call("https://example.com/page=1", attempt)
+    assert backoff.retries == 2
+
+    async def throttled():
+        raise RetryableError("429", retry_after=3600, throttled=True)
+
+    # The server asks to wait longer than max_delay, the request is not retried
+    with pytest.raises(RetryableError):
+        await backoff.call("https://example.com/page=2", throttled)
+    assert backoff.retries == 2
+
+    # Four failed attempts in a row opened the circuit of the host
+    with pytest.raises(CircuitOpenError):
+        await backoff.call("https://example.com/page=3", attempt)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limit_caps_concurrent_attempts():
+    backoff = BackoffController(max_in_flight=2)
+    in_flight, peak = 0, 0
+
+    async def attempt():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await asyncio.gather(*(backoff.call("https://example.com/", attempt) for _ in range(10)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_honours_retry_after(throttling_api):
+    scheduler = CrawlScheduler(1, 1, 1000, 1000, BackoffController(1, max_attempts=3, base_delay=0.001))
+    scraper = ResponseScraper(1, 1, 38, scheduler)
+
+    async with ResponseScraper._create_session() as session:
+        assert await scraper._fetch(throttling_api["url"], session) == {"data": [{"name": "Clip"}]}
+        throttling_api.update(requests=0, throttle=5)
+        assert await scraper._fetch(throttling_api["url"], session) is None
+
+    assert throttling_api["requests"] == 3
+    assert scheduler.backoff.throttled == 5
@@ -0,0 +1,94 @@
+import json
+import os
+from dataclasses import FrozenInstanceError
+import pytest
+import config
+from config import SettingsError, get_settings
+
+
+@pytest.fixture
+def settings_file(tmp_path, monkeypatch):
+    """Copy of the settings file named by SETTINGS_APK, with the memoized settings reset."""
+    with open(os.environ["SETTINGS_APK"], encoding="utf-8") as file:
+        data = json.load(file)
+    path = tmp_path / "config_file.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    monkeypatch.setenv("SETTINGS_APK", str(path))
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(config, "SETTINGS_CHECK_INTERVAL", 0)
+    return path, data
+
+
+def _rewrite(path, data, mtime_ns):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_settings_are_memoized_until_the_file_changes(settings_file):
+    path, data = settings_file
+    settings = get_settings()
+    assert get_settings() is settings
+    assert settings.scraping_settings.max_workers == settings["scraping_settings"]["max_workers"] == data["scraping_settings"]["max_workers"]
+
+    data["scraping_settings"]["max_workers"] = 3
+    _rewrite(path, data, settings.mtime_ns + 10**9)
+
+    assert get_settings().scraping_settings.max_workers == 3
+
+
+def test_settings_are_not_checked_within_the_interval(settings_file, monkeypatch):
+    path, data = settings_file
+    monkeypatch.setattr(config, "SETTINGS_CHECK_INTERVAL", 3600)
+    settings = get_settings()
+
+    data["scraping_settings"]["max_workers"] = 3
+    _rewrite(path, data, settings.mtime_ns + 10**9)
+
+    assert get_settings() is settings
+    assert get_settings(reload=True).scraping_settings.max_workers == 3
+
+
+def test_settings_are_immutable(settings_file):
+    settings = get_settings()
+    with pytest.raises(FrozenInstanceError):
+        settings.scraping_settings.max_workers = 1
+    with pytest.raises(TypeError):
+        settings.scraping_settings.category_id["Animals"] = 1
+    assert isinstance(settings.proxy_settings.checker_proxies, tuple)
+
+
+@pytest.mark.parametrize("section, key, value, message", [
+    ("scraping_settings", "max_workers", "8", "invalid value"),
+    ("scraping_settings", "max_workers", 0, "at least 1"),
+    ("scraping_settings", "rate_per_host", 0, "rate_per_host must be greater than 0"),
+    ("scraping_settings", "retry_limit_decrease", 0, "retry_limit_decrease must be greater than 0"),
+    ("scraping_settings", "retry_limit_decrease", 1.0, "retry_limit_decrease must be less than 1"),
+    ("proxy_settings", "pool_half_life", 0, "pool_half_life must be greater than 0"),
+    ("proxy_settings", "use_proxy", 1, "invalid value"),
+    ("proxy_settings", "checker_proxies", ["https://httpbin.org/ip", 1], "invalid value"),
+    ("scraping_settings", "max_worker", 8, "Unknown settings"),
+    ("scraping_settings", "json_decoder", "ujson", "json_decoder must be one of auto, msgspec, orjson, json"),
+    ("scraping_settings", "incremental_sort", "popular", "incremental_sort must be one of newest"),
+    ("scraping_settings", "crawl_plan", [{"start_page": 1}], r"Key category of scraping_settings.crawl_plan\[0\] is missing"),
+    ("scraping_settings", "crawl_plan", [{"category": "all", "end_page": "10"}], "Key end_page of .* has an invalid value"),
+    ("scraping_settings", "crawl_plan", [{"category": "all"}, {"category": "all", "pages": 3}], r"Unknown keys in scraping_settings.crawl_plan\[1\]: pages"),
+    ("scraping_settings", "crawl_plan", ["all"], "crawl_plan has an invalid value"),
+])
+def test_invalid_settings_are_rejected_at_load(settings_file, section, key, value, message):
+    path, data = settings_file
+    data[section][key] = value
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    with pytest.raises(SettingsError, match=message):
+        get_settings()
+
+
+def test_missing_setting_is_rejected_and_last_valid_settings_are_kept(settings_file):
+    path, data = settings_file
+    settings = get_settings()
+    del data["proxy_settings"]["use_proxy"]
+    _rewrite(path, data, settings.mtime_ns + 10**9)
+
+    with pytest.raises(SettingsError, match="proxy_settings.use_proxy is missing"):
+        get_settings()
+    assert config._settings is settings
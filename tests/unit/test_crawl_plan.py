@@ -0,0 +1,186 @@
+import asyncio
+import pytest
+from scraper import ResponseScraper
+from scraper.crawl_plan import CrawlTask, load_crawl_plan
+from scraper.scheduler import CrawlScheduler
+
+
+def _settings(plan: list) -> dict:
+    return {"scraping_settings": {"category_id": {"Animals": 28, "Countdown": 40}, "crawl_plan": plan}}
+
+
+def test_load_crawl_plan_resolves_categories():
+    plan = load_crawl_plan(_settings([
+        {"category": "Animals", "start_page": 2, "end_page": 5},
+        {"category": "all", "end_page": None},
+    ]))
+
+    assert plan == [CrawlTask(28, 2, 5), CrawlTask(40, 1, None)]
+
+
+def test_load_crawl_plan_rejects_invalid_entries():
+    with pytest.raises(ValueError):
+        load_crawl_plan(_settings([{"category": "Unknown"}]))
+    with pytest.raises(ValueError):
+        load_crawl_plan(_settings([{"category": "Animals", "start_page": 5, "end_page": 2}]))
+
+
+def _page_number(url: str) -> int:
+    return int(url.split("page=")[1].split("&")[0])
+
+
+@pytest.mark.asyncio
+async def test_stream_pages_until_empty_page(monkeypatch):
+    scraper = ResponseScraper(1, None, 38, CrawlScheduler(4, 4, 1000, 1000))
+    requested, received = [], []
+
+    async def fake_fetch(url, session):
+        requested.append(_page_number(url))
+        return {"data": [{"page": _page_number(url)}] if _page_number(url) <= 11 else []}
+
+    async def on_page(json_page):
+        received.append(json_page["data"][0]["page"])
+
+    monkeypatch.setattr(scraper, "_fetch", fake_fetch)
+    pages = await scraper._stream_pages(session=None, on_page=on_page)
+
+    assert pages == 11
+    assert sorted(received) == list(range(1, 12))
+    assert max(requested) < 12 + scraper.scheduler.max_in_flight
+
+
+@pytest.mark.asyncio
+async def test_stream_pages_uses_pagination_metadata(monkeypatch):
+    scraper = ResponseScraper(1, None, 38, CrawlScheduler(4, 4, 1000, 1000))
+    requested = []
+
+    async def fake_fetch(url, session):
+        requested.append(_page_number(url))
+        return {"data": [{"page": _page_number(url)}], "total": 250, "per_page": 50}
+
+    async def on_page(json_page):
+        pass
+
+    monkeypatch.setattr(scraper, "_fetch", fake_fetch)
+    pages = await scraper._stream_pages(session=None, on_page=on_page)
+
+    assert pages == 5
+    assert sorted(requested) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_cancels_pages_after_empty_page(monkeypatch):
+    import asyncio
+    scraper = ResponseScraper(1, None, 38, CrawlScheduler(4, 4, 1000, 1000))
+    completed = []
+
+    async def fake_fetch(url, session):
+        page = _page_number(url)
+        # Pages after the end of the results answer slowly
+        await asyncio.sleep(0.5 if page > 3 else 0)
+        completed.append(page)
+        return {"data": [{"page": page}] if page < 3 else []}
+
+    async def on_page(json_page):
+        pass
+
+    monkeypatch.setattr(scraper, "_fetch", fake_fetch)
+    pages = await scraper._stream_pages(session=None, on_page=on_page)
+
+    assert pages == 2
+    assert sorted(completed) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_cancels_pending_pages_when_a_page_fails(monkeypatch):
+    scraper = ResponseScraper(1, None, 38, CrawlScheduler(4, 4, 1000, 1000))
+    cancelled = []
+
+    async def fake_fetch(url, session):
+        page = _page_number(url)
+        try:
+            await asyncio.sleep(0 if page == 2 else 0.5)
+        except asyncio.CancelledError:
+            cancelled.append(page)
+            raise
+        return {"data": [{"page": page}]}
+
+    async def on_page(json_page):
+        if json_page["data"][0]["page"] == 2:
+            raise RuntimeError("pipeline failed")
+
+    monkeypatch.setattr(scraper, "_fetch", fake_fetch)
+    with pytest.raises(RuntimeError):
+        await scraper._stream_pages(session=None, on_page=on_page)
+
+    # The pages in flight when page 2 failed were cancelled and awaited
+    assert sorted(cancelled) == [3, 4, 5]
+
+
+def test_last_page_from_metadata():
+    assert ResponseScraper._last_page_from_metadata({"data": [1] * 50, "totalCount": 101}) == 3
+    assert ResponseScraper._last_page_from_metadata({"meta": {"last_page": 7}}) == 7
+    assert ResponseScraper._last_page_from_metadata({"data": [1]}) is None
+
+
+@pytest.mark.asyncio
+async def test_crawl_inserts_pages_of_all_categories(monkeypatch, tmp_path):
+    from app import RunApp
+    from database.models import DatabaseManagerSettings, MotionsElements
+
+    async def fake_fetch(self, url, session):
+        page, category = _page_number(url), int(url.rsplit("cat=", 1)[1])
+        items = [{
+            "previews": {"mp4": {"url": f"https://video.example.com/{category}/{page}/{i}.mp4"}, "webm": {}},
+            "categories": [{"id": category, "name": f"Category {category}"}],
+            "price": 10, "currency": "EUR", "name": f"Clip {i}",
+        } for i in range(3)]
+        return {"data": items if page <= 2 else []}
+
+    monkeypatch.setenv("DATABASE_URL_SQLITE", f"sqlite:///{tmp_path / 'crawl.db'}")
+    monkeypatch.setattr(ResponseScraper, "_fetch", fake_fetch)
+    monkeypatch.setattr(ResponseScraper, "_create_scheduler", staticmethod(lambda: CrawlScheduler(4, 4, 1000, 1000)))
+    monkeypatch.setattr(ResponseScraper, "_create_response_cache", staticmethod(lambda: None))
+    DatabaseManagerSettings().create_table(MotionsElements.__table__)
+
+    app = RunApp([CrawlTask(28, 1, None), CrawlTask(40, 1, 3)])
+    app.use_proxy = False
+    inserted = await app.crawl()
+
+    assert inserted == 12
+    assert await app.crawl() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_category_cancels_the_other_categories(monkeypatch, tmp_path):
+    from app import RunApp
+    from database.models import DatabaseManagerSettings, MotionsElements
+    fetched = []
+
+    async def fake_fetch(self, url, session):
+        page, category = _page_number(url), int(url.rsplit("cat=", 1)[1])
+        if category == 40:
+            raise RuntimeError("broken category")
+        fetched.append(page)
+        # The other category would keep streaming pages for a long time
+        await asyncio.sleep(0.01)
+        return {"data": [{
+            "previews": {"mp4": {"url": f"https://video.example.com/{page}/{i}.mp4"}, "webm": {}},
+            "categories": [{"id": category, "name": "Animals"}],
+            "price": 10, "currency": "EUR", "name": f"Clip {i}",
+        } for i in range(3)]}
+
+    monkeypatch.setenv("DATABASE_URL_SQLITE", f"sqlite:///{tmp_path / 'crawl.db'}")
+    monkeypatch.setattr(ResponseScraper, "_fetch", fake_fetch)
+    monkeypatch.setattr(ResponseScraper, "_create_scheduler", staticmethod(lambda: CrawlScheduler(1, 1, 1000, 1000)))
+    monkeypatch.setattr(ResponseScraper, "_create_response_cache", staticmethod(lambda: None))
+    DatabaseManagerSettings().create_table(MotionsElements.__table__)
+
+    app = RunApp([CrawlTask(28, 1, 10000), CrawlTask(40, 1, 3)])
+    app.use_proxy = False
+    await asyncio.wait_for(app.crawl(), timeout=5)
+    fetched_at_return = len(fetched)
+    await asyncio.sleep(0.1)
+
+    # No category keeps fetching after the crawl returned
+    assert len(fetched) == fetched_at_return < 100
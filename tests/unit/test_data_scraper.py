@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from database.models import MotionsElements
+from scraper.data_scraper import ITEM_FIELD_PATHS, CheckNewItems, DataScraper, _compile_row_extractor
+
+
+def _make_list_urls(count: int) -> dict:
+    return {
+        "mp4_url": [f"https://video.example.com/{i}.mp4" for i in range(count)],
+        "webm_url": [f"https://video.example.com/{i}.webm" for i in range(count)],
+        "category_id": [38] * count,
+        "category_name": ["Animated Backgrounds"] * count,
+        "price": [10 + i for i in range(count)],
+        "currency": ["EUR"] * count,
+        "name": [f"Clip {i}" for i in range(count)],
+    }
+
+
+def test_compare_details_with_db_matches_row_by_row(db_manager):
+    list_urls = _make_list_urls(30)
+    list_urls["mp4_url"][5] = np.nan
+    list_urls["mp4_url"][7] = list_urls["mp4_url"][8]
+    known = pd.DataFrame(_make_list_urls(30)).iloc[::3]
+    db_manager.insert_data(known, MotionsElements)
+
+    expected = CheckNewItems(db_manager)._compare_details_row_by_row(list_urls)
+    result = CheckNewItems(db_manager).compare_details_with_db(list_urls)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert not result["mp4_url"].isin(known["mp4_url"]).any()
+
+
+def test_compare_details_with_db_all_known(db_manager):
+    list_urls = _make_list_urls(5)
+    db_manager.insert_data(pd.DataFrame(list_urls), MotionsElements)
+
+    result = CheckNewItems(db_manager).compare_details_with_db(list_urls)
+
+    assert result.empty
+    assert list(result.columns) == list(list_urls)
+
+
+def test_read_existing_values_chunks(db_manager):
+    db_manager.insert_data(pd.DataFrame(_make_list_urls(20)), MotionsElements)
+    urls = [f"https://video.example.com/{i}.mp4" for i in range(10, 40)]
+
+    existing = db_manager.read_existing_values(MotionsElements.mp4_url, urls, chunk_size=7)
+
+    assert existing == set(urls[:10])
+
+
+def _search_page(start: int, count: int) -> dict:
+    return {"data": [{
+        "previews": {"mp4": {"url": f"https://video.example.com/{i}.mp4"}, "webm": {"url": f"https://video.example.com/{i}.webm"} if i % 2 else {}},
+        "categories": [{"id": 38, "name": "Animated Backgrounds"}],
+        "price": 10 + i, "currency": "EUR", "name": f"Clip {i}" if i % 3 else "",
+    } for i in range(start, start + count)]}
+
+
+def test_get_url_does_not_accumulate_across_calls():
+    data_scraper = DataScraper()
+
+    first = data_scraper._get_url([_search_page(0, 3)])
+    second = data_scraper._get_url([_search_page(3, 2), {"data": []}, _search_page(10, 5)])
+
+    assert first["mp4_url"] == [f"https://video.example.com/{i}.mp4" for i in range(3)]
+    assert second["mp4_url"] == ["https://video.example.com/3.mp4", "https://video.example.com/4.mp4"]
+    assert np.isnan(second["webm_url"][1]) and second["webm_url"][0] == "https://video.example.com/3.webm"
+    assert np.isnan(second["name"][0]) and second["name"][1] == "Clip 4"
+
+
+def test_get_frame_matches_get_url():
+    json_data = [_search_page(0, 50), _search_page(50, 20)]
+
+    frame = DataScraper()._get_frame(json_data)
+    expected = pd.DataFrame(DataScraper()._get_url(json_data)).astype(object)
+
+    pd.testing.assert_frame_equal(frame, expected)
+    assert list(frame.columns) == list(ITEM_FIELD_PATHS)
+    assert DataScraper()._get_frame([{"data": []}]).empty
+
+
+def test_row_extractor_tolerates_missing_fields():
+    extract_row = _compile_row_extractor({"url": ("previews", "mp4", "url"), "id": ("categories", 1, "id"), "price": ("price",)})
+
+    assert extract_row({"previews": {"mp4": {"url": "a.mp4"}}, "categories": [{"id": 1}, {"id": 2}], "price": 5}) == ("a.mp4", 2, 5)
+    assert all(np.isnan(value) for value in extract_row({"previews": None, "categories": [{"id": 1}], "price": 0}))
@@ -0,0 +1,149 @@
+import asyncio
+import pandas as pd
+import pytest
+from database.crawl_state import CrawlStateStore
+from database.models import DatabaseManagerSettings, MotionsElements
+from database.seen_urls import SeenUrlFilter
+from scraper import ResponseScraper
+from scraper.crawl_plan import CrawlTask
+from scraper.data_scraper import DataScraper
+from scraper.incremental import IncrementalCrawl
+from scraper.parse_pool import RowBatch
+from scraper.pipeline import ScrapePipeline
+from scraper.scheduler import CrawlScheduler
+
+
+def _page_number(url: str) -> int:
+    return int(url.split("page=")[1].split("&")[0])
+
+
+def _page(urls: list) -> dict:
+    return {"data": [{
+        "previews": {"mp4": {"url": url}, "webm": {}},
+        "categories": [{"id": 28, "name": "Animals"}],
+        "price": 10, "currency": "EUR", "name": "Clip",
+    } for url in urls]}
+
+
+def _insert_urls(db_manager, urls: list) -> None:
+    db_manager.bulk_insert_data(pd.DataFrame({"mp4_url": urls}), MotionsElements)
+    SeenUrlFilter._loaded.clear()
+
+
+@pytest.mark.asyncio
+async def test_check_page_stops_after_known_pages_in_row(db_manager):
+    _insert_urls(db_manager, [f"https://video.example.com/{i}.mp4" for i in range(10, 20)])
+    incremental = IncrementalCrawl(28, 1, db_manager, known_pages_to_stop=2)
+
+    assert not await incremental.check_page(1, _page(["https://video.example.com/1.mp4", "https://video.example.com/10.mp4"]))
+    assert not await incremental.check_page(3, _page(["https://video.example.com/12.mp4", "https://video.example.com/13.mp4"]))
+    assert not await incremental.check_page(5, _page(["https://video.example.com/16.mp4"]))
+    # Page 2 completes the run of known pages 2 and 3
+    assert await incremental.check_page(2, _page(["https://video.example.com/11.mp4"]))
+
+    assert incremental.last_page == 2
+    assert incremental.newest_url == "https://video.example.com/1.mp4"
+    assert incremental.complete
+
+
+@pytest.mark.asyncio
+async def test_checked_pages_are_parsed_once_for_the_pipeline(db_manager, monkeypatch):
+    incremental = IncrementalCrawl(28, 1, db_manager)
+    page = _page(["https://video.example.com/1.mp4", "https://video.example.com/2.mp4"])
+    await incremental.check_page(1, page)
+
+    # The pipeline takes the rows extracted by the check instead of parsing the page again
+    monkeypatch.setattr(DataScraper, "_get_rows", lambda self, json_data: pytest.fail("page parsed twice"))
+    pipeline = ScrapePipeline(db_manager, MotionsElements)
+    pipeline.start()
+    await pipeline.on_page(page)
+
+    assert isinstance(page["data"], RowBatch)
+    assert await pipeline.join() == 2
+
+
+@pytest.mark.asyncio
+async def test_check_page_stops_at_high_water_mark(db_manager):
+    incremental = IncrementalCrawl(28, 1, db_manager, high_water_url="https://video.example.com/7.mp4", known_pages_to_stop=5)
+
+    assert not await incremental.check_page(1, None)
+    assert await incremental.check_page(2, _page(["https://video.example.com/6.mp4", "https://video.example.com/7.mp4"]))
+
+    # The first page failed, so the high-water mark cannot move
+    assert incremental.last_page == 2
+    assert not incremental.complete
+
+
+def test_crawl_state_store(db_manager):
+    crawl_state = CrawlStateStore(db_manager)
+
+    assert crawl_state.high_water_mark(28, "newest") is None
+    crawl_state.set_high_water_mark(28, "newest", "https://video.example.com/1.mp4")
+    crawl_state.set_high_water_mark(28, "newest", "https://video.example.com/2.mp4")
+
+    assert crawl_state.high_water_mark(28, "newest") == "https://video.example.com/2.mp4"
+    assert crawl_state.high_water_mark(28, "popular") is None
+
+
+def test_sort_replaces_sort_order_of_url():
+    scraper = ResponseScraper(1, 2, 38, CrawlScheduler(4, 4, 1000, 1000), sort="newest")
+
+    assert all("sort=newest" in url and "sort=popular" not in url for url in scraper.urls)
+
+
+@pytest.mark.asyncio
+async def test_stream_new_pages_cancels_pages_after_known_pages(monkeypatch, db_manager):
+    _insert_urls(db_manager, [f"https://video.example.com/{page}.mp4" for page in range(3, 20)])
+    scraper = ResponseScraper(1, None, 38, CrawlScheduler(4, 4, 1000, 1000), sort="newest")
+    incremental = IncrementalCrawl(38, 1, db_manager, known_pages_to_stop=2)
+    completed, received = [], []
+
+    async def fake_fetch(url, session):
+        page = _page_number(url)
+        # Pages after the known pages answer slowly
+        await asyncio.sleep(0.5 if page > 4 else 0)
+        completed.append(page)
+        return _page([f"https://video.example.com/{page}.mp4"])
+
+    async def on_page(json_page):
+        received.append(json_page)
+
+    monkeypatch.setattr(scraper, "_fetch", fake_fetch)
+    pages = await scraper._stream_new_pages(session=None, on_page=on_page, incremental=incremental)
+
+    assert pages == 4
+    assert sorted(completed) == [1, 2, 3, 4]
+    assert incremental.last_page == 4
+
+
+@pytest.mark.asyncio
+async def test_incremental_crawl_fetches_only_new_items(monkeypatch, tmp_path):
+    from app import RunApp
+    clips = [f"https://video.example.com/{i}.mp4" for i in range(10)]
+    requested = []
+
+    async def fake_fetch(self, url, session):
+        # Newest first, two clips per page
+        page = _page_number(url)
+        requested.append(page)
+        return _page(clips[::-1][(page - 1) * 2:page * 2])
+
+    monkeypatch.setenv("DATABASE_URL_SQLITE", f"sqlite:///{tmp_path / 'crawl.db'}")
+    monkeypatch.setattr(ResponseScraper, "_fetch", fake_fetch)
+    monkeypatch.setattr(ResponseScraper, "_create_scheduler", staticmethod(lambda: CrawlScheduler(1, 1, 1000, 1000)))
+    monkeypatch.setattr(ResponseScraper, "_create_response_cache", staticmethod(lambda: None))
+    SeenUrlFilter._loaded.clear()
+    DatabaseManagerSettings().create_table(MotionsElements.__table__)
+    app = RunApp([CrawlTask(28, 1, None)])
+    app.use_proxy = False
+
+    # The first run crawls until the empty page and stores the newest clip as the high-water mark
+    assert await app.crawl(incremental=True) == 10
+    assert CrawlStateStore(DatabaseManagerSettings()).high_water_mark(28, "newest") == clips[-1]
+
+    # Three new clips, the next run stops at the page holding the high-water mark
+    clips += [f"https://video.example.com/{i}.mp4" for i in range(10, 13)]
+    requested.clear()
+    assert await app.crawl(incremental=True) == 3
+    assert sorted(requested) == [1, 2]
+    assert CrawlStateStore(DatabaseManagerSettings()).high_water_mark(28, "newest") == clips[-1]
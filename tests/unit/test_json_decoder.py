@@ -0,0 +1,48 @@
+import json
+import pytest
+from scraper.json_decoder import SEARCH_PAGE_FIELDS, JsonDecoder, _DECODERS, _decode_page, _project
+
+
+def _page_body() -> bytes:
+    return json.dumps({
+        "data": [{
+            "id": 1, "keywords": ["loop"],
+            "previews": {"jpg": {"url": "a.jpg"}, "mp4": {"url": "a.mp4"}, "webm": None},
+            "categories": [{"id": 38, "name": "Animated Backgrounds", "slug": "animated"}],
+            "price": 10, "currency": "EUR", "name": "Clip",
+        }],
+        "meta": {"per_page": 50}, "total": 250, "facets": {"large": list(range(100))},
+    }).encode()
+
+
+EXPECTED_PAGE = {
+    "data": [{
+        "previews": {"mp4": {"url": "a.mp4"}, "webm": None},
+        "categories": [{"id": 38, "name": "Animated Backgrounds"}],
+        "price": 10, "currency": "EUR", "name": "Clip",
+    }],
+    "meta": {"per_page": 50}, "total": 250,
+}
+
+
+@pytest.mark.parametrize("backend", sorted(_DECODERS))
+def test_backends_decode_the_schema_fields(backend):
+    page = JsonDecoder(backend).decode(_page_body())
+
+    assert _project(page, SEARCH_PAGE_FIELDS) == EXPECTED_PAGE
+    assert _decode_page(backend, _page_body()) == EXPECTED_PAGE
+
+
+def test_invalid_bodies_raise_value_error():
+    with pytest.raises(ValueError):
+        JsonDecoder().decode(b"<html>Too many requests</html>")
+    with pytest.raises(ValueError):
+        JsonDecoder("unknown")
+
+
+@pytest.mark.asyncio
+async def test_large_bodies_are_decoded_in_a_worker_process():
+    decoder = JsonDecoder("json", offload_bytes=100, workers=1)
+
+    assert await decoder.decode_async(_page_body()) == EXPECTED_PAGE
+    assert await decoder.decode_async(b'{"data": []}') == {"data": []}
@@ -0,0 +1,47 @@
+import json
+import logging
+from logs import LogSampler, flush, get_logger
+
+
+def test_get_logger_twice_does_not_duplicate_messages(tmp_path):
+    log_file = str(tmp_path / "app.log")
+    logger = get_logger(log_file, logging.INFO)
+    assert get_logger(log_file, logging.INFO) is logger
+
+    logger.info("Request successful")
+    flush()
+
+    assert len(logger.handlers) == 1
+    assert (tmp_path / "app.log").read_text().count("Request successful") == 1
+
+
+def test_json_lines_and_size_based_rotation(tmp_path):
+    log_file = str(tmp_path / "json.log")
+    logger = get_logger(log_file, logging.INFO, json_lines=True, max_bytes=400, backup_count=2)
+
+    for index in range(20):
+        logger.warning("Request throttled: %s", index)
+    flush()
+
+    entry = json.loads((tmp_path / "json.log").read_text().splitlines()[-1])
+    assert entry["level"] == "WARNING" and entry["message"] == "Request throttled: 19" and entry["logger"] == "json.log"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["json.log", "json.log.1", "json.log.2"]
+
+
+def test_sampler_logs_a_burst_and_summarizes_the_rest(tmp_path):
+    log_file = str(tmp_path / "sampled.log")
+    sampler = LogSampler(get_logger(log_file, logging.INFO), interval=3600, burst=2)
+
+    for index in range(10):
+        sampler.info("request_ok", "Request successful: %s", index)
+    sampler.error("request_failed", "Request failed: %s", 500)
+    sampler.flush()
+    flush()
+
+    lines = (tmp_path / "sampled.log").read_text().splitlines()
+    assert [line.split(" - ")[-1] for line in lines] == [
+        "Request successful: 0",
+        "Request successful: 1",
+        "Request failed: 500",
+        "Suppressed messages in the last 0 s: request_ok=8",
+    ]
@@ -0,0 +1,85 @@
+import json
+import aiohttp
+import pytest
+from aiohttp import web
+from metrics import REGISTRY, MetricsRegistry
+from scraper import ResponseScraper
+from scraper.scheduler import CrawlScheduler
+
+
+def test_prometheus_text_of_counters_and_histograms():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(status=200)
+    requests.inc(2, status=429)
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.to_prometheus()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 1' in text and 'requests_total{status="429"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text and "latency_seconds_sum 5.55" in text
+    assert registry.counter("requests_total", "Requests", ("status",)) is requests
+    with pytest.raises(ValueError):
+        requests.inc(proxy="direct")
+
+
+def test_summary_quantiles_and_custom_collectors(tmp_path):
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(1.0, 2.0))
+    for _ in range(10):
+        latency.observe(1.5, stage="parse")
+    registry.add_collector(lambda: [("queue_depth", {"queue": "pages"}, 3)])
+
+    registry.write(str(tmp_path / "metrics.prom"), str(tmp_path / "summary.json"))
+    summary = json.loads((tmp_path / "summary.json").read_text())
+
+    parse = summary["metrics"]["latency_seconds"]['{stage="parse"}']
+    assert parse["count"] == 10 and parse["mean"] == 1.5 and 1.0 < parse["p50"] <= 2.0
+    assert summary["metrics"]["queue_depth"] == {'{queue="pages"}': 3}
+    assert 'queue_depth{queue="pages"} 3' in (tmp_path / "metrics.prom").read_text()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    registry = MetricsRegistry()
+    registry.counter("pages_total", "Pages").inc(5)
+    runner = await registry.serve("127.0.0.1", 0)
+    port = runner.addresses[0][1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                assert "pages_total 5" in await response.text()
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_fetch_records_request_metrics():
+    async def handle(request):
+        return web.Response(text=json.dumps({"data": [{"name": "Clip"}]}), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/search", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/search"
+    requests = REGISTRY.metrics["scraper_requests_total"]
+    before = requests.values.get(("200", "direct"), 0)
+
+    try:
+        async with ResponseScraper._create_session() as session:
+            await ResponseScraper(1, 1, 38, CrawlScheduler(1, 1, 1000, 1000))._fetch(url, session)
+    finally:
+        await runner.cleanup()
+
+    assert requests.values[("200", "direct")] == before + 1
+    assert REGISTRY.metrics["scraper_response_bytes_total"].values[()] >= 28
+    assert ("json",) in REGISTRY.metrics["scraper_parse_seconds"].series or ("orjson",) in REGISTRY.metrics["scraper_parse_seconds"].series
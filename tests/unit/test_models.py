@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from database.models import SQLITE_PRAGMAS, DatabaseManagerSettings, MotionsElements
+
+
+def _make_df(count: int, offset: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({
+        "mp4_url": [f"https://video.example.com/{i}.mp4" for i in range(offset, offset + count)],
+        "webm_url": [f"https://video.example.com/{i}.webm" for i in range(offset, offset + count)],
+        "category_id": [38] * count,
+        "category_name": ["Animated Backgrounds"] * count,
+        "price": [10 + i for i in range(count)],
+        "currency": ["EUR"] * count,
+        "name": [f"Clip {i}" for i in range(count)],
+    })
+
+
+def test_bulk_insert_matches_orm_insert(db_manager):
+    df = _make_df(25)
+    df.loc[3, "webm_url"] = np.nan
+
+    inserted = db_manager.bulk_insert_data(df, MotionsElements, batch_size=4)
+    stored = db_manager.read_data(MotionsElements).drop(columns="id")
+
+    assert inserted == 25
+    assert stored["mp4_url"].tolist() == df["mp4_url"].tolist()
+    assert stored.loc[3, "webm_url"] is None
+    assert stored["category_id"].tolist() == [38] * 25
+
+
+def test_bulk_insert_rejects_invalid_batch_size(db_manager):
+    with pytest.raises(ValueError):
+        db_manager.bulk_insert_data(_make_df(1), MotionsElements, batch_size=0)
+
+
+def _query_plan(db_manager, sql: str, parameters: tuple) -> str:
+    with db_manager.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    return " ".join(str(row[-1]) for row in rows)
+
+
+def test_url_and_category_lookups_use_indexes(db_manager):
+    table = MotionsElements.__tablename__
+    db_manager.bulk_insert_data(_make_df(200), MotionsElements)
+
+    url_plan = _query_plan(db_manager, f"SELECT mp4_url FROM {table} WHERE mp4_url IN (?, ?)", ("a", "b"))
+    category_plan = _query_plan(db_manager, f"SELECT * FROM {table} WHERE category_id = ?", (38,))
+
+    assert f"ix_{table}_mp4_url" in url_plan and "SCAN" not in url_plan
+    assert f"ix_{table}_category_id" in category_plan and "SCAN" not in category_plan
+
+
+def test_bulk_insert_ignores_known_urls(db_manager):
+    db_manager.bulk_insert_data(_make_df(10), MotionsElements)
+
+    inserted = db_manager.bulk_insert_data(_make_df(10, offset=5), MotionsElements, ignore_duplicates=True)
+
+    assert inserted == 5
+    assert len(db_manager.read_data(MotionsElements)) == 15
+
+
+def test_create_indexes_migrates_legacy_table(tmp_path):
+    from database.models import DatabaseManagerSettings
+    db_manager = DatabaseManagerSettings(f"sqlite:///{tmp_path / 'legacy.db'}")
+    table = MotionsElements.__tablename__
+    with db_manager.engine.begin() as connection:
+        connection.exec_driver_sql(
+            f"CREATE TABLE {table} (id INTEGER NOT NULL, mp4_url VARCHAR, webm_url VARCHAR, category_id INTEGER, "
+            "category_name VARCHAR, price VARCHAR, currency VARCHAR, name VARCHAR, PRIMARY KEY (id))"
+        )
+        for mp4_url in ["a.mp4", "b.mp4", "a.mp4", None, None]:
+            connection.exec_driver_sql(f"INSERT INTO {table} (mp4_url) VALUES (?)", (mp4_url,))
+
+    db_manager.create_indexes(MotionsElements)
+    db_manager.create_indexes(MotionsElements)
+
+    stored = db_manager.read_data(MotionsElements)
+    assert stored["id"].tolist() == [1, 2, 4, 5]
+    assert f"ix_{table}_mp4_url" in _query_plan(db_manager, f"SELECT id FROM {table} WHERE mp4_url = ?", ("a.mp4",))
+    db_manager.close_connection()
+    db_manager.engine.dispose()
+
+
+def test_managers_of_one_database_share_a_tuned_engine(db_manager):
+    other = DatabaseManagerSettings(db_manager.engine.url.render_as_string(hide_password=False))
+
+    assert other.engine is db_manager.engine
+    with db_manager.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1   # NORMAL
+        assert connection.exec_driver_sql("PRAGMA mmap_size").scalar() == SQLITE_PRAGMAS["mmap_size"]
+    other.close_connection()
+
+
+@pytest.mark.asyncio
+async def test_every_thread_uses_a_session_of_its_own(db_manager):
+    session = db_manager.session
+    writer_session = await db_manager.run(lambda: db_manager.session)
+
+    assert db_manager.session is session
+    assert writer_session is not session
+    await db_manager.run(db_manager.close_session)
+    assert db_manager.session is session
+    assert await db_manager.run(lambda: db_manager.session) is not writer_session
+
+
+@pytest.mark.asyncio
+async def test_queued_bulk_inserts_are_group_committed(db_manager):
+    writer = db_manager.writer
+    release = threading.Event()
+    blocked = writer.call(release.wait)
+
+    # Inserts queued while the writer is busy share one transaction
+    inserts = [db_manager.queue_bulk_insert(_make_df(10, offset), MotionsElements, ignore_duplicates=True) for offset in (0, 10, 5)]
+    commits = writer.commits
+    release.set()
+
+    assert await asyncio.gather(*(asyncio.wrap_future(insert) for insert in inserts)) == [10, 10, 0]
+    assert blocked.result() is True and writer.commits == commits + 1
+    assert await db_manager.run(lambda: len(db_manager.read_data(MotionsElements))) == 20
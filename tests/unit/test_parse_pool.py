@@ -0,0 +1,64 @@
+import json
+import pytest
+import pandas as pd
+from database.models import MotionsElements
+from scraper.data_scraper import DataScraper
+from scraper.parse_pool import ParsePool, RowBatch
+from scraper.pipeline import ScrapePipeline
+
+
+def _page_body(start: int, count: int) -> bytes:
+    return json.dumps({"data": [{
+        "previews": {"mp4": {"url": f"https://video.example.com/{i}.mp4"}, "webm": {"url": f"https://video.example.com/{i}.webm"}},
+        "categories": [{"id": 38, "name": "Animated Backgrounds"}],
+        "price": 10, "currency": "EUR", "name": f"Clip {i}", "keywords": ["loop"],
+    } for i in range(start, start + count)], "total": 250, "meta": {"per_page": 50}}).encode()
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_returns_rows_and_metadata():
+    parse_pool = ParsePool(1, "json")
+    try:
+        page = await parse_pool.parse(_page_body(0, 20))
+        empty_page = await parse_pool.parse(b'{"data": []}')
+        with pytest.raises(ValueError):
+            await parse_pool.parse(b"<html></html>")
+    finally:
+        parse_pool.close()
+
+    assert isinstance(page["data"], RowBatch) and len(page["data"]) == 20
+    assert page["total"] == 250 and page["meta"] == {"per_page": 50}
+    pd.testing.assert_frame_equal(page["data"].to_frame(), DataScraper()._get_frame([json.loads(_page_body(0, 20))]))
+    assert not empty_page["data"]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_inserts_pages_parsed_in_workers(db_manager):
+    parse_pool = ParsePool(2, "json")
+    pipeline = ScrapePipeline(db_manager, MotionsElements, batch_size=30)
+    pipeline.start()
+    try:
+        for start in range(0, 100, 20):
+            await pipeline.on_page(await parse_pool.parse(_page_body(start, 20)))
+    finally:
+        parse_pool.close()
+
+    assert await pipeline.join() == 100
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_batches_concurrent_bodies():
+    import asyncio
+    parse_pool = ParsePool(1, "json", max_batch=8)
+    bodies = [_page_body(i * 5, 5) for i in range(40)]
+    bodies[17] = b"not json"
+    try:
+        results = await asyncio.gather(*(parse_pool.parse(body) for body in bodies), return_exceptions=True)
+    finally:
+        parse_pool.close()
+
+    assert isinstance(results[17], ValueError)
+    assert [result["data"].rows[0, 0] for i, result in enumerate(results) if i != 17] == [
+        f"https://video.example.com/{i * 5}.mp4" for i in range(40) if i != 17
+    ]
+    assert parse_pool.batches < len(bodies)
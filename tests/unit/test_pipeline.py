@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy import func, select
+from database.models import MotionsElements
+from scraper.pipeline import ScrapePipeline
+
+
+def _page(start, count, category=38):
+    return {"data": [{
+        "previews": {"mp4": {"url": f"https://video.example.com/{i}.mp4"}, "webm": {"url": f"https://video.example.com/{i}.webm"}},
+        "categories": [{"id": category, "name": "Animated Backgrounds"}],
+        "price": 10, "currency": "EUR", "name": f"Clip {i}",
+    } for i in range(start, start + count)]}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_inserts_pages_in_micro_batches(db_manager):
+    pipeline = ScrapePipeline(db_manager, MotionsElements, batch_size=25, queue_size=2)
+    pipeline.start()
+
+    for start in range(0, 100, 10):
+        await pipeline.on_page(_page(start, 10))
+    # A page overlapping the already inserted rows only adds its new rows
+    await pipeline.on_page(_page(95, 10))
+    inserted = await pipeline.join()
+
+    assert inserted == 105
+    assert pipeline.parsed_rows == 110
+    assert 1 <= pipeline.batches <= 11
+    assert db_manager.session.execute(select(func.count(MotionsElements.id))).scalar() == 105
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_share_one_commit(db_manager):
+    pipeline = ScrapePipeline(db_manager, MotionsElements, batch_size=10, queue_size=16)
+    writer = db_manager.writer
+    release = threading.Event()
+    writer.call(release.wait)
+    commits = writer.commits
+    pipeline.start()
+
+    # With the writer busy, the inserts of every batch wait in its queue and are committed together
+    for start in range(0, 50, 10):
+        await pipeline.on_page(_page(start, 10))
+    while len(pipeline._inserts) < 5:
+        await asyncio.sleep(0.01)
+    release.set()
+
+    assert await pipeline.join() == 50
+    assert pipeline.batches == 5
+    assert writer.commits - commits == 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_backpressure_bounds_waiting_pages(db_manager, monkeypatch):
+    pipeline = ScrapePipeline(db_manager, MotionsElements, batch_size=1, queue_size=1)
+    release = asyncio.Event()
+    write_stage = pipeline._write_stage
+
+    async def blocked_write_stage():
+        await release.wait()
+        await write_stage()
+
+    monkeypatch.setattr(pipeline, "_write_stage", blocked_write_stage)
+    pipeline.start()
+
+    async def produce():
+        for i in range(10):
+            await pipeline.on_page(_page(i * 10, 10))
+
+    # With the database stage blocked the producer waits after a bounded number of pages
+    producer = asyncio.create_task(produce())
+    await asyncio.sleep(0.05)
+    assert not producer.done()
+    assert pipeline.pages <= 4
+
+    release.set()
+    await producer
+    assert await pipeline.join() == 100
+
+
+@pytest.mark.asyncio
+async def test_pipeline_surfaces_stage_errors(db_manager, monkeypatch):
+    pipeline = ScrapePipeline(db_manager, MotionsElements)
+
+    def failing_write(batch):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(pipeline, "_write_batch", failing_write)
+    pipeline.start()
+    await pipeline.on_page(_page(0, 10))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        await pipeline.on_page(_page(10, 10))
+    with pytest.raises(RuntimeError):
+        await pipeline.join()
@@ -1,37 +1,43 @@
+from dataclasses import replace
 import pytest
+import proxy
 from proxy import _get_proxy, _test_proxy, _get_working_proxies
 
 
-def test_get_proxy():
-    proxy_list: list = _get_proxy()
+@pytest.fixture
+def proxy_settings(tmp_path, monkeypatch):
+    """Proxy settings with a proxy list of 20 local addresses, returned by the `get_settings` of the proxy module."""
+    proxy_list = tmp_path / "proxy_list.csv"
+    proxy_list.write_text("".join(f"127.0.0.1:{port}\n" for port in range(9000, 9020)))
+    settings = proxy.get_settings()
+    settings = replace(settings, proxy_settings=replace(settings.proxy_settings, proxy_list5=str(proxy_list)))
+    monkeypatch.setattr(proxy, "get_settings", lambda: settings)
+    return settings.proxy_settings
+
+
+def test_get_proxy(proxy_settings):
+    proxy_list: list = _get_proxy(10)
     assert len(proxy_list) == 10
     assert isinstance(proxy_list, list)
-    assert all(isinstance(proxy, str) for proxy in proxy_list)
+    assert all(isinstance(proxy, str) and proxy.startswith('http://127.0.0.1:') for proxy in proxy_list)
+    assert len(set(proxy_list)) == 10
 
-@pytest.fixture
-async def proxy():
-    return 'http://20.206.106.192:8123'
 
 @pytest.mark.asyncio
-async def test_test_proxy(proxy):
-    p = await proxy
-    proxy = await _test_proxy(p)
-    assert proxy is not None
+async def test_test_proxy(search_api, forwarding_proxy):
+    p = forwarding_proxy.proxies[0]
+    proxy = await _test_proxy(p, 0, [f"{search_api.url}/ip"])
+    assert proxy == p
     assert isinstance(proxy, str)
     assert 'http://' in proxy
+    assert forwarding_proxy.requests == 1
 
 
-@pytest.fixture
-def proxies():
-    return _get_proxy()
-
 @pytest.mark.asyncio
-async def test_get_working_proxies(proxies):
-    working_proxies = await _get_working_proxies(proxies)
+async def test_get_working_proxies(search_api, forwarding_proxy, dead_proxy):
+    proxies = forwarding_proxy.proxies + [dead_proxy]
+    working_proxies = await _get_working_proxies(proxies, [f"{search_api.url}/ip"], concurrency=3)
     assert working_proxies is not None
-    assert len(working_proxies) > 0
+    assert sorted(working_proxies) == sorted(forwarding_proxy.proxies)
     assert isinstance(working_proxies, list)
     assert all(isinstance(proxy, str) for proxy in working_proxies)
-    
-
-
@@ -0,0 +1,45 @@
+import asyncio
+from dataclasses import replace
+import pytest
+import database.proxy_cache
+import proxy
+from database.proxy_cache import ProxyHealthCache
+
+
+def test_cache_tracks_success_failure_and_ttl(db_manager, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(database.proxy_cache, "time", lambda: now[0])
+    cache = ProxyHealthCache(db_manager, ttl=60)
+
+    cache.record("http://slow:1", True, 0.9)
+    cache.record("http://fast:2", True, 0.1)
+    cache.record("http://dead:3", False, 3.0)
+    assert cache.flush() == 3
+    assert cache.fresh_proxies() == ["http://fast:2", "http://slow:1"]
+
+    cache.record("http://slow:1", False, 3.0)
+    cache.flush()
+    assert cache.fresh_proxies() == ["http://fast:2"]
+    assert cache.stale_proxies() == ["http://slow:1"]
+
+    now[0] += 61
+    assert cache.fresh_proxies() == []
+    assert sorted(cache.stale_proxies()) == ["http://fast:2", "http://slow:1"]
+
+
+@pytest.mark.asyncio
+async def test_test_proxies_reuses_fresh_proxies(db_manager, monkeypatch, fake_proxy, dead_proxy):
+    cache = ProxyHealthCache(db_manager, ttl=60)
+    settings = proxy.get_settings()
+    settings = replace(settings, proxy_settings=replace(settings.proxy_settings, checker_proxies=("http://checker.test/ip",)))
+    monkeypatch.setattr(proxy, "get_settings", lambda: settings)
+    monkeypatch.setattr(proxy, "_get_proxy", lambda num: [fake_proxy, dead_proxy])
+
+    # Cold run tests the proxies and caches the results
+    assert await proxy.test_proxies(2, min_working=1, cache=cache) == [fake_proxy]
+
+    # Warm run reuses the cached proxy without testing the proxy list
+    monkeypatch.setattr(proxy, "_get_proxy", lambda num: pytest.fail("proxy list must not be tested"))
+    assert await proxy.test_proxies(2, min_working=1, cache=cache) == [fake_proxy]
+    await asyncio.wait_for(cache.revalidation, 5)
+    await cache.stop_revalidation()
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from proxy_lists.get_proxy_list import _parse_freeproxy_world_page, read_proxy_csv_files, run_proxy_pipeline
+
+
+def freeproxy_world_html(proxies):
+    rows = "".join(
+        f'<tr><td class="show-ip-div">{proxy.split(":")[0]}</td><td><a href="/?port={proxy.split(":")[1]}">port</a></td></tr>'
+        for proxy in proxies
+    )
+    return f"<html><body><table><tr><th>IP</th></tr>{rows}</table></body></html>"
+
+
+@pytest_asyncio.fixture
+async def proxy_list_site(fake_proxy, dead_proxy):
+    """Local stand-in for freeproxy.world listing the working and the dead proxy on page 1 only."""
+    proxies = [fake_proxy.split("://")[1], dead_proxy.split("://")[1]]
+
+    async def handle(request):
+        page = int(request.query["page"])
+        return web.Response(text=freeproxy_world_html(proxies if page == 1 else []), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/?page={{page}}", proxies
+    await runner.cleanup()
+
+
+def test_parse_freeproxy_world_page():
+    assert _parse_freeproxy_world_page(freeproxy_world_html(["1.2.3.4:80", "5.6.7.8:3128"])) == ["1.2.3.4:80", "5.6.7.8:3128"]
+    assert _parse_freeproxy_world_page("<html></html>") == []
+
+
+def test_read_proxy_csv_files_merges_and_normalizes(tmp_path):
+    (tmp_path / "a.csv").write_text("1.2.3.4:80\nhttp://5.6.7.8:3128\n")
+    (tmp_path / "b.csv").write_text("proxy\n1.2.3.4:80\n\n9.9.9.9:8080\n")
+
+    proxies = read_proxy_csv_files([tmp_path / "a.csv", tmp_path / "b.csv", tmp_path / "missing.csv"])
+
+    assert proxies == ["1.2.3.4:80", "5.6.7.8:3128", "9.9.9.9:8080"]
+
+
+@pytest.mark.asyncio
+async def test_run_proxy_pipeline_validates_all_sources(tmp_path, proxy_list_site):
+    page_url, (working, dead) = proxy_list_site
+    (tmp_path / "list.csv").write_text(f"{working}\n{dead}\nhttp://{working}\n")
+    output = tmp_path / "available_proxy.csv"
+
+    proxies = await run_proxy_pipeline(
+        str(output), [tmp_path / "list.csv"], pages=3, page_url=page_url,
+        checker_url=["http://checker.test/ip"], concurrency=4,
+    )
+
+    assert proxies == [working]
+    assert output.read_text().split() == [working]
+    assert not (tmp_path / "available_proxy.csv.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_run_proxy_pipeline_raises_the_error_of_a_failed_source(tmp_path):
+    # A directory in place of a proxy list file cannot be read
+    (tmp_path / "list.csv").mkdir()
+
+    with pytest.raises(OSError):
+        await asyncio.wait_for(run_proxy_pipeline(
+            str(tmp_path / "available_proxy.csv"), [tmp_path / "list.csv"], pages=0,
+            checker_url=["http://checker.test/ip"], concurrency=4,
+        ), timeout=5)
+
+    # The validation workers finished instead of waiting for candidates forever
+    await asyncio.sleep(0.01)
+    assert asyncio.all_tasks() == {asyncio.current_task()}
@@ -0,0 +1,48 @@
+from collections import Counter
+import pytest
+from proxy_pool import ProxyPool
+
+
+def test_acquire_prefers_healthy_proxies():
+    pool = ProxyPool(["http://fast:1", "http://slow:2", "http://throttled:3"], max_failures=100)
+    for _ in range(5):
+        pool.record("http://fast:1", 200, 0.1)
+        pool.record("http://slow:2", 200, 2.0)
+        pool.record("http://throttled:3", 429, 0.1)
+
+    picks = Counter(pool.acquire() for _ in range(2000))
+
+    assert picks["http://fast:1"] > picks["http://slow:2"] > 0
+    assert picks["http://fast:1"] > 10 * picks["http://throttled:3"]
+
+
+def test_proxy_is_ejected_after_failures_and_retried_after_cooldown(monkeypatch):
+    import proxy_pool
+    now = [1000.0]
+    monkeypatch.setattr(proxy_pool, "monotonic", lambda: now[0])
+    pool = ProxyPool(["http://bad:1", "http://good:2"], max_failures=2, cooldown=30)
+
+    pool.record("http://bad:1", None, 1.0)
+    pool.record("http://bad:1", 503, 1.0)
+
+    assert {pool.acquire() for _ in range(50)} == {"http://good:2"}
+    now[0] += 31
+    assert [health.proxy for health in pool.available()] == ["http://bad:1", "http://good:2"]
+
+
+def test_error_counters_decay(monkeypatch):
+    import proxy_pool
+    now = [0.0]
+    monkeypatch.setattr(proxy_pool, "monotonic", lambda: now[0])
+    pool = ProxyPool(["http://proxy:1"], half_life=10)
+
+    pool.record("http://proxy:1", 429, 0.5)
+    now[0] += 10
+    pool.health["http://proxy:1"].decay(pool.half_life)
+
+    assert pool.health["http://proxy:1"].throttled == pytest.approx(0.5)
+
+
+def test_empty_pool_is_rejected():
+    with pytest.raises(ValueError):
+        ProxyPool([])
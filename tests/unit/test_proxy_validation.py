@@ -0,0 +1,23 @@
+import pytest
+from proxy import _get_working_proxies, _test_proxy
+
+
+@pytest.mark.asyncio
+async def test_test_proxy_first_success_wins(fake_proxy, dead_proxy):
+    checker_url = ["http://checker.test/limited", "http://checker.test/ip"]
+
+    assert await _test_proxy(fake_proxy, 0, checker_url) == fake_proxy
+    assert await _test_proxy(fake_proxy, 0, ["http://checker.test/limited"]) is None
+    assert await _test_proxy(dead_proxy, 1, checker_url) is None
+
+
+@pytest.mark.asyncio
+async def test_get_working_proxies_filters_and_stops_early(fake_proxy, dead_proxy):
+    dead = [dead_proxy] * 3
+    checker_url = ["http://checker.test/ip"]
+
+    working = await _get_working_proxies(dead + [fake_proxy] * 3, checker_url, concurrency=2)
+    first = await _get_working_proxies([fake_proxy] * 20 + dead, checker_url, concurrency=4, min_working=2)
+
+    assert working == [fake_proxy] * 3
+    assert first == [fake_proxy] * 2
@@ -0,0 +1,127 @@
+import json
+import threading
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from database.models import DatabaseManagerSettings
+from database import response_cache
+from database.response_cache import ResponseCache
+from scraper import ResponseScraper
+from scraper.scheduler import CrawlScheduler
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+@pytest_asyncio.fixture
+async def search_api():
+    """Local stand-in for the search API answering conditional GETs with 304."""
+    state = {"requests": [], "version": 1}
+
+    async def handle(request):
+        state["requests"].append(dict(request.headers))
+        etag = f'"v{state["version"]}"'
+        body = json.dumps({"data": [{"name": f"Clip v{state['version']}"}]})
+        headers = {"ETag": etag} if request.path == "/etag" else {"Last-Modified": LAST_MODIFIED}
+        if request.headers.get("If-None-Match") == etag or (
+            request.path == "/last-modified" and request.headers.get("If-Modified-Since") == LAST_MODIFIED and state["version"] == 1
+        ):
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, content_type="application/json", headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/{path}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    state["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    yield state
+    await runner.cleanup()
+
+
+def _cache(tmp_path, ttl=0, max_bytes=10 * 1024 * 1024):
+    return ResponseCache(DatabaseManagerSettings(f"sqlite:///{tmp_path / 'http_cache.db'}"), max_bytes, ttl)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, validator", [("etag", "If-None-Match"), ("last-modified", "If-Modified-Since")])
+async def test_stale_responses_are_revalidated(tmp_path, search_api, path, validator):
+    url = f"{search_api['url']}/{path}"
+    cache = _cache(tmp_path)
+    scraper = ResponseScraper(1, 1, 38, CrawlScheduler(1, 1, 1000, 1000), response_cache=cache)
+
+    async with ResponseScraper._create_session() as session:
+        first = await scraper._fetch(url, session)
+        cache.flush()
+        second = await scraper._fetch(url, session)
+
+    assert first == second == {"data": [{"name": "Clip v1"}]}
+    assert validator not in search_api["requests"][0] and validator in search_api["requests"][1]
+    assert cache.revalidated == 1
+
+
+@pytest.mark.asyncio
+async def test_changed_responses_replace_the_cached_body(tmp_path, search_api):
+    url = f"{search_api['url']}/etag"
+    cache = _cache(tmp_path)
+    scraper = ResponseScraper(1, 1, 38, CrawlScheduler(1, 1, 1000, 1000), response_cache=cache)
+
+    async with ResponseScraper._create_session() as session:
+        await scraper._fetch(url, session)
+        search_api["version"] = 2
+        changed = await scraper._fetch(url, session)
+    cache.close()
+
+    assert changed == {"data": [{"name": "Clip v2"}]}
+    assert (await _cache(tmp_path).get(url)).etag == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_fresh_responses_are_used_without_a_request(tmp_path, search_api):
+    url = f"{search_api['url']}/etag"
+    cache = _cache(tmp_path, ttl=3600)
+    scraper = ResponseScraper(1, 1, 38, CrawlScheduler(1, 1, 1000, 1000), response_cache=cache)
+
+    async with ResponseScraper._create_session() as session:
+        await scraper._fetch(url, session)
+        cache.close()
+        # A new run reads the response from disk
+        scraper.response_cache = _cache(tmp_path, ttl=3600)
+        cached = await scraper._fetch(url, session)
+
+    assert cached == {"data": [{"name": "Clip v1"}]}
+    assert len(search_api["requests"]) == 1
+    assert scraper.response_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.store(name, b"x" * 100, None, None)
+    cache.flush()
+    assert await cache.get("a") is None
+
+    await cache.get("b")
+    cache.store("d", b"x" * 100, None, None)
+    cache.flush()
+
+    assert await cache.get("b") is not None and await cache.get("d") is not None
+    assert await cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_full_buffers_are_written_by_the_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "FLUSH_BYTES", 150)
+    cache = _cache(tmp_path)
+    release = threading.Event()
+    cache.db_manager_settings.writer.call(release.wait)
+
+    # With the writer busy, a full buffer is queued instead of written on the event loop
+    cache.store("a", b"x" * 100, None, None)
+    cache.store("b", b"x" * 100, None, None)
+    assert len(cache._writes) == 1 and not cache._writes[0].done()
+
+    release.set()
+    assert (await cache.get("a")).body == b"x" * 100
+    assert await cache.flush_async() == 0
@@ -0,0 +1,69 @@
+import asyncio
+from time import monotonic
+import pytest
+from scraper.backoff import BackoffController, RetryableError
+from scraper.scheduler import CrawlScheduler, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = monotonic()
+    for _ in range(7):
+        await bucket.acquire()
+    assert monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_in_flight_and_keeps_order():
+    scheduler = CrawlScheduler(workers=10, max_in_flight=3, rate_per_host=1000, burst_per_host=1000)
+    in_flight, peak = 0, 0
+
+    async def attempt(url):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return url.upper()
+
+    async def fetch(url):
+        return await scheduler.send(url, lambda: attempt(url))
+
+    urls = [f"https://example.com/page={i}" for i in range(20)]
+    results = await scheduler.run(urls, fetch)
+
+    assert results == [url.upper() for url in urls]
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_retries_pay_for_the_rate_limit_and_release_the_slot_while_backing_off():
+    scheduler = CrawlScheduler(workers=2, max_in_flight=1, rate_per_host=20, burst_per_host=1,
+                               backoff=BackoffController(max_in_flight=4, max_attempts=3, base_delay=0.2, max_delay=0.2))
+    sent = []
+
+    async def attempt(url):
+        sent.append((url, monotonic()))
+        if url.endswith("1") and len(sent) < 3:
+            raise RetryableError("503")
+        return url
+
+    async def fetch(url):
+        return await scheduler.backoff.call(url, lambda: scheduler.send(url, lambda: attempt(url)))
+
+    start = monotonic()
+    results = await scheduler.run(["https://example.com/page=1", "https://example.com/page=2"], fetch)
+
+    assert results == ["https://example.com/page=1", "https://example.com/page=2"]
+    # Page 2 took the only slot while page 1 was backing off, and every attempt waited for a token
+    assert [url for url, _ in sent][:2] == ["https://example.com/page=1", "https://example.com/page=2"]
+    assert sent[1][1] - start < 0.2
+    assert all(later - earlier >= 0.04 for (_, earlier), (_, later) in zip(sent, sent[1:]))
+
+
+def test_scheduler_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        CrawlScheduler(workers=0, max_in_flight=1, rate_per_host=1, burst_per_host=1)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=1)
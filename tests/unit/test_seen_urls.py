@@ -0,0 +1,92 @@
+import threading
+import numpy as np
+import pandas as pd
+from database.models import DatabaseManagerSettings, MotionsElements
+from database import seen_urls
+from database.seen_urls import SeenUrlFilter
+from scraper.data_scraper import CheckNewItems
+
+
+def _make_df(urls: list) -> pd.DataFrame:
+    return pd.DataFrame({"mp4_url": urls, "category_id": [38] * len(urls)})
+
+
+def test_maybe_seen_has_no_false_negatives():
+    seen_filter = SeenUrlFilter()
+    seen_filter.add([f"https://video.example.com/{i}.mp4" for i in range(1000)])
+
+    known = seen_filter.maybe_seen([f"https://video.example.com/{i}.mp4" for i in range(1000)])
+    new = seen_filter.maybe_seen([f"https://video.example.com/new-{i}.mp4" for i in range(1000)])
+
+    assert known.all()
+    assert new.sum() == 0
+    assert not seen_filter.maybe_seen([np.nan, None]).any()
+
+
+def test_filter_is_saved_and_refreshed_incrementally(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'seen.db'}"
+    db_manager = DatabaseManagerSettings(database_url)
+    db_manager.create_table(MotionsElements.__table__)
+    db_manager.bulk_insert_data(_make_df(["a.mp4", "b.mp4"]), MotionsElements)
+
+    seen_filter = SeenUrlFilter.load(SeenUrlFilter.default_path(database_url))
+    seen_filter.refresh(db_manager, MotionsElements)
+    seen_filter.save()
+    db_manager.bulk_insert_data(_make_df(["c.mp4"]), MotionsElements)
+
+    reloaded = SeenUrlFilter.load(str(tmp_path / "seen.db.seen.npz"))
+    assert reloaded.max_id == 2
+    assert reloaded.maybe_seen(["a.mp4", "b.mp4", "c.mp4"]).tolist() == [True, True, False]
+    assert reloaded.refresh(db_manager, MotionsElements) == 1
+    assert reloaded.maybe_seen(["c.mp4"]).all()
+    db_manager.close_connection()
+    db_manager.engine.dispose()
+
+
+def test_inserts_update_the_loaded_filter(db_manager):
+    seen_filter = SeenUrlFilter.for_database(db_manager, MotionsElements)
+    assert not seen_filter.maybe_seen(["a.mp4"]).any()
+
+    db_manager.bulk_insert_data(_make_df(["a.mp4"]), MotionsElements)
+    db_manager.insert_data(_make_df(["b.mp4"]), MotionsElements)
+
+    assert seen_filter.maybe_seen(["a.mp4", "b.mp4"]).all()
+
+
+def test_filter_is_saved_at_shutdown_not_per_compare(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'shutdown.db'}"
+    db_manager = DatabaseManagerSettings(database_url)
+    db_manager.create_table(MotionsElements.__table__)
+    SeenUrlFilter.for_database(db_manager, MotionsElements)
+    db_manager.bulk_insert_data(_make_df(["a.mp4"]), MotionsElements)
+
+    CheckNewItems(db_manager).compare_details_with_db({"mp4_url": ["a.mp4", "b.mp4"], "category_id": [38, 38]})
+    assert not (tmp_path / "shutdown.db.seen.npz").exists()
+
+    db_manager.close_connection()
+    assert SeenUrlFilter.load(str(tmp_path / "shutdown.db.seen.npz")).maybe_seen(["a.mp4"]).all()
+    db_manager.engine.dispose()
+
+
+def test_lookups_during_merges_in_another_thread_never_miss_added_urls(monkeypatch):
+    monkeypatch.setattr(seen_urls, "PENDING_MERGE_SIZE", 8)
+    seen_filter = SeenUrlFilter()
+    added = []
+    missed = []
+
+    def add_urls():
+        for start in range(0, 4000, 4):
+            urls = [f"https://video.example.com/{i}.mp4" for i in range(start, start + 4)]
+            seen_filter.add(urls)
+            added.extend(urls)
+
+    # Every URL added before a lookup started is found, even while the pending hashes are merged
+    writer = threading.Thread(target=add_urls)
+    writer.start()
+    while writer.is_alive():
+        urls = added[-64:]
+        if urls and not seen_filter.maybe_seen(urls).all():
+            missed.append(urls)
+    writer.join()
+
+    assert not missed
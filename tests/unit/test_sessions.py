@@ -0,0 +1,57 @@
+import json
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from scraper import ResponseScraper
+from scraper.scheduler import CrawlScheduler
+from scraper.sessions import ACCEPT_ENCODING, SessionManager
+
+
+@pytest_asyncio.fixture
+async def search_api():
+    """Local stand-in for the search API recording the request headers."""
+    state = {"headers": []}
+
+    async def handle(request):
+        state["headers"].append(dict(request.headers))
+        return web.Response(text=json.dumps({"data": [{"name": "Clip"}]}), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/{path}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    state["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    yield state
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_session_manager_reuses_connections(search_api):
+    scraper = ResponseScraper(1, 1, 38, CrawlScheduler(1, 1, 1000, 1000))
+
+    async with SessionManager(limit=2) as sessions:
+        for page in range(5):
+            assert await scraper._fetch(f"{search_api['url']}/page{page}", sessions) == {"data": [{"name": "Clip"}]}
+        stats = sessions.stats()
+
+    assert stats == [{
+        "proxy": None, "open": 1, "idle": 1, "requests": 5,
+        "new_connections": 1, "reused_connections": 4, "reuse_ratio": 0.8, "connect_share": stats[0]["connect_share"],
+    }]
+    assert 0 < stats[0]["connect_share"] < 1
+    assert all(headers["Accept-Encoding"] == ACCEPT_ENCODING for headers in search_api["headers"])
+    assert sessions.sessions == {}
+
+
+@pytest.mark.asyncio
+async def test_session_manager_keeps_one_session_per_proxy(search_api, fake_proxy):
+    async with SessionManager() as sessions:
+        for proxy in (None, fake_proxy, fake_proxy):
+            async with sessions.get(f"{search_api['url']}/search", proxy=proxy) as response:
+                assert response.status == 200
+        assert set(sessions.sessions) == {None, fake_proxy}
+        assert sessions.session(fake_proxy) is sessions.session(fake_proxy)
+
+    assert {row["proxy"]: row["requests"] for row in sessions.stats()} == {None: 1, fake_proxy: 2}
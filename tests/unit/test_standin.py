@@ -0,0 +1,46 @@
+import aiohttp
+import pytest
+from benchmarks.standin import SearchApiStandIn
+from scraper.data_scraper import extract_item_row
+from scraper.response_scraper import ResponseScraper
+
+
+def test_page_has_the_shape_of_the_search_api():
+    api = SearchApiStandIn(pages=2, payload_bytes=100)
+
+    page = api.page(38, 2, 50)
+
+    assert len(page["data"]) == 50 and len(page["data"][0]["description"]) == 100
+    assert ResponseScraper._last_page_from_metadata(page) == 2
+    assert api.page(38, 3, 50)["data"] == []
+    mp4_url, webm_url, category_id, category_name, price, currency, name = extract_item_row(page["data"][1])
+    assert mp4_url.endswith(".mp4") and webm_url.endswith(".webm") and (category_id, currency) == (38, "EUR")
+
+
+@pytest.mark.asyncio
+async def test_search_api_serves_pages_and_injects_faults(search_api):
+    url = f"{search_api.url}/v2/search/video?currency=EUR&language=en&page=2&per_page=50&sort=popular&facetarray=1&cat=38"
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            page = await response.json()
+        assert response.status == 200 and len(page["data"]) == 5
+
+        search_api.throttle_rate, search_api.retry_after = 1.0, 7
+        async with session.get(url) as response:
+            assert response.status == 429 and response.headers["Retry-After"] == "7"
+
+        search_api.throttle_rate, search_api.error_rate = 0.0, 1.0
+        async with session.get(url) as response:
+            assert response.status == 503
+
+    assert (search_api.requests, search_api.throttled, search_api.errors) == (3, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_forwarding_proxy_relays_responses(search_api, forwarding_proxy):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{search_api.url}/v2/search/video?page=1&cat=7", proxy=forwarding_proxy.proxies[1]) as response:
+            page = await response.json()
+
+    assert response.status == 200 and page["data"][0]["categories"][0]["id"] == 7
+    assert forwarding_proxy.requests == search_api.requests == 1
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+from benchmarks.bench_importtime import LAZY_MODULES
+
+
+def test_importing_the_entry_point_keeps_heavy_modules_lazy():
+    code = f"import sys, app; print(','.join(module for module in {LAZY_MODULES!r} if module in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+
+def test_preloaded_modules_are_imported_in_the_background():
+    code = "import sys, app; app.RunApp._preload_modules(); import threading; [thread.join() for thread in threading.enumerate() if thread.name.startswith('preload-')]; print('pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "True"
@@ -0,0 +1,59 @@
+import threading
+import pytest
+from sqlalchemy import text
+from database.writer import DatabaseWriter
+
+
+@pytest.fixture
+def writer(db_manager):
+    with db_manager.engine.begin() as connection:
+        connection.execute(text("CREATE TABLE events (name TEXT UNIQUE)"))
+    writer = DatabaseWriter(db_manager.engine)
+    yield writer
+    writer.close()
+
+
+def _insert(name):
+    return lambda connection: connection.execute(text("INSERT INTO events VALUES (:name)"), {"name": name}).rowcount
+
+
+def test_writes_of_many_producers_share_one_commit(writer):
+    release = threading.Event()
+    writer.call(release.wait)
+
+    futures = []
+    producers = [threading.Thread(target=lambda i=i: futures.append(writer.submit(_insert(f"event-{i}")))) for i in range(8)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    release.set()
+
+    assert [future.result() for future in futures] == [1] * 8
+    assert (writer.commits, writer.jobs) == (1, 8)
+
+
+def test_failed_job_does_not_fail_its_group(writer):
+    release = threading.Event()
+    writer.call(release.wait)
+    committed = []
+
+    first = writer.submit(_insert("a"), on_commit=committed.append)
+    duplicate = writer.submit(_insert("a"))
+    last = writer.submit(_insert("b"), on_commit=committed.append)
+    release.set()
+
+    assert first.result() == last.result() == 1 and committed == [1, 1]
+    with pytest.raises(Exception, match="UNIQUE"):
+        duplicate.result()
+    with writer.engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM events")).scalar() == 2
+
+
+def test_close_runs_queued_jobs_and_rejects_new_ones(writer):
+    future = writer.submit(_insert("a"))
+    writer.close()
+
+    assert future.result() == 1
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(_insert("b"))